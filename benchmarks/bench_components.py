@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+组件级基准: ExcelLoader / Analyzer 提取与过滤 / LocalEngine 推理 / Reporter 写入
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from benchmarks import corpus
+from benchmarks.harness import Case
+
+# 规模档位: quick 用于日常与 CI，full 覆盖完整语料 (100k 家公司耗时较长)
+SIZES = {
+    "quick": {"companies": [1000], "assets": [10, 1000]},
+    "full": {"companies": [1000, 10000, 100000], "assets": [10, 100, 1000, 10000]},
+}
+
+
+def cases(profile):
+    from fofa_finder.modules.excel_loader import ExcelLoader
+    from fofa_finder.modules.analyzer import Analyzer
+    from fofa_finder.modules.local_engine import LocalEngine
+    from fofa_finder.modules.reporter import Reporter
+
+    corpus.use_corpus_models()
+    sizes = SIZES[profile]
+    analyzer = Analyzer()
+    engine = LocalEngine()
+    reporter = Reporter()
+    result = []
+
+    for count in sizes["companies"]:
+        loader = ExcelLoader(corpus.company_list(count))
+        # 100k 行的 Excel 解析本身就要数十秒，只跑一轮
+        repeat = 1 if count >= 100000 else None
+        result.append(Case(f"excel_loader.load_companies[companies={count}]", loader.load_companies, count, repeat))
+
+    for count in sizes["assets"]:
+        raw = corpus.fofa_response(count)
+        assets = corpus.assets(count)
+        clean = analyzer.filter_junk_assets(assets)
+        cnvd = clean[::3]
+        analysis = {"summary": "benchmark", "cnvd_strategy": "benchmark"}
+
+        result.append(Case(f"analyzer.extract_assets[assets={count}]",
+                           lambda raw=raw: analyzer.extract_assets(raw), count))
+        result.append(Case(f"analyzer.filter_junk_assets[assets={count}]",
+                           lambda assets=assets: analyzer.filter_junk_assets(assets), count))
+        result.append(Case(f"local_engine.predict_assets[assets={count}]",
+                           lambda assets=assets: engine.predict_assets(assets), count))
+        result.append(Case(f"reporter.save_raw_data[assets={count}]",
+                           lambda assets=assets, count=count: reporter.save_raw_data(f"bench_{count}", assets), count))
+        result.append(Case(f"reporter.save_ai_report[assets={count}]",
+                           lambda assets=assets, clean=clean, cnvd=cnvd, count=count, analysis=analysis:
+                           reporter.save_ai_report(f"bench_{count}", clean, cnvd, analysis, assets), count))
+    return result
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准: import fofa_finder.main 与 --help 的冷启动时间 (子进程计时)
+并检查入口模块没有在 import 时加载重量级依赖
+"""
+import os
+import sys
+import json
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from benchmarks.harness import Case
+
+# 只允许在具体阶段首次需要时导入的依赖
+HEAVY_MODULES = ("pandas", "numpy", "sklearn", "scipy", "joblib", "openpyxl", "requests", "pyarrow")
+
+# 这些模块被 import 时不应带入 HEAVY_MODULES
+LIGHT_ENTRY_POINTS = (
+    "fofa_finder.main",
+    "fofa_finder.config",
+    "fofa_finder.modules.manifest",
+    "fofa_finder.modules.metrics",
+    "fofa_finder.modules.local_engine",
+)
+
+
+def _python(*args):
+    return subprocess.run([sys.executable, *args], cwd=BASE_DIR, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, check=True)
+
+
+def heavy_imports(module):
+    """
+    在全新解释器中 import module，返回被带入的重量级依赖
+    """
+    code = ("import sys, json, importlib; importlib.import_module(%r); "
+            "print(json.dumps(sorted(m for m in %r if m in sys.modules)))") % (module, HEAVY_MODULES)
+    return json.loads(_python("-c", code).stdout.decode().strip().splitlines()[-1])
+
+
+def check():
+    """
+    返回 {入口模块: [被提前导入的依赖]}，为空表示全部符合
+    """
+    violations = {}
+    for module in LIGHT_ENTRY_POINTS:
+        loaded = heavy_imports(module)
+        if loaded:
+            violations[module] = loaded
+    return violations
+
+
+def cases(profile):
+    return [
+        Case("startup.import_main", lambda: _python("-c", "import fofa_finder.main")),
+        Case("startup.cli_help", lambda: _python("-m", "fofa_finder.main", "--help")),
+    ]
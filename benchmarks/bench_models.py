@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+模型基准: forest (TF-IDF + RandomForest) 与 linear (特征哈希 + 逻辑回归，float32 稀疏权重) 对比
+
+- 计时用例: joblib.load 加载时间、批量预测 (1000 条) 与逐条预测 (100 次，LocalEngine 的调用方式)，
+  以及同一模型导出为内存映射格式 (learning/mmap_model.py，用例名带 +mmap) 后的对应耗时
+- stats(): 模型文件大小、合成语料留出集准确率、learning/verify_*.py 人工基准用例通过率
+
+两种模型在同一份合成语料的 80% 上训练，缓存在 benchmarks/.corpus/models/
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from benchmarks import corpus
+from benchmarks.harness import Case
+
+MODELS_DIR = os.path.join(corpus.CORPUS_DIR, "models")
+FAMILIES = ("forest", "linear")
+BATCH_SIZE = 1000
+SINGLE_CALLS = 100
+
+# 与 learning/train_*.py --model linear 相同的参数
+LINEAR_ARGS = {
+    "model": {"ngram_range": (1, 3)},
+    "company_model": {"ngram_range": (2, 4)},
+    "cnvd_model": {"ngram_range": (2, 5), "class_weight": "balanced"},
+}
+
+
+def verify_cases(name):
+    """
+    learning/verify_*.py 中的人工基准用例 (CNVD 模型没有)
+    """
+    if name == "model":
+        from fofa_finder.learning.verify_model import BENCHMARK_CASES
+        return BENCHMARK_CASES
+    if name == "company_model":
+        from fofa_finder.learning.verify_company_model import BENCHMARK_CASES
+        return BENCHMARK_CASES
+    return []
+
+
+def _split(name):
+    from sklearn.model_selection import train_test_split
+
+    texts, labels = corpus.training_data()[name]
+    return train_test_split(texts, labels, test_size=0.2, random_state=42)
+
+
+def artifacts():
+    """
+    返回 {(模型名, family): 模型文件路径}，不存在时训练并发布
+    """
+    from fofa_finder.learning.model_io import publish
+    from fofa_finder.learning.linear_model import LinearTextModel
+
+    if not os.path.exists(MODELS_DIR):
+        os.makedirs(MODELS_DIR)
+    paths = {}
+    for name in LINEAR_ARGS:
+        split = None
+        for family in FAMILIES:
+            path = os.path.join(MODELS_DIR, f"{name}_{family}.pkl")
+            if not os.path.exists(path):
+                split = split or _split(name)
+                X_train, _, y_train, _ = split
+                model = corpus.forest_pipeline(name) if family == "forest" else LinearTextModel(**LINEAR_ARGS[name])
+                publish(model.fit(X_train, y_train), path)
+            paths[(name, family)] = path
+    return paths
+
+
+def cases(profile):
+    import joblib
+    from fofa_finder.learning import mmap_model
+
+    result = []
+    for (name, family), path in sorted(artifacts().items()):
+        holdout = _split(name)[1]
+        batch = (holdout * (BATCH_SIZE // len(holdout) + 1))[:BATCH_SIZE]
+        single = batch[:SINGLE_CALLS]
+        mmap_dir = mmap_model.export_file(path)
+
+        for label, loader, source in ((family, joblib.load, path), (f"{family}+mmap", mmap_model.load, mmap_dir)):
+            model = loader(source)
+            result.append(Case(f"models.load[{name},{label}]", lambda loader=loader, source=source: loader(source)))
+            result.append(Case(f"models.predict_batch[{name},{label},n={BATCH_SIZE}]",
+                               lambda model=model, batch=batch: model.predict(batch), BATCH_SIZE))
+            result.append(Case(f"models.predict_single[{name},{label},n={SINGLE_CALLS}]",
+                               lambda model=model, single=single: [model.predict([t]) for t in single], SINGLE_CALLS))
+    return result
+
+
+def stats():
+    """
+    返回 {"<模型名>.<family>": {size_kb, holdout_accuracy, verify_passed, verify_total}}
+    """
+    import joblib
+
+    result = {}
+    for (name, family), path in sorted(artifacts().items()):
+        model = joblib.load(path)
+        _, X_test, _, y_test = _split(name)
+        predictions = model.predict(X_test)
+        cases = verify_cases(name)
+        passed = sum(int(model.predict([text])[0] == expected) for text, expected in cases)
+        result[f"{name}.{family}"] = {
+            "size_kb": round(os.path.getsize(path) / 1024, 1),
+            "holdout_accuracy": round(sum(int(p == y) for p, y in zip(predictions, y_test)) / len(y_test), 4),
+            "verify_passed": passed,
+            "verify_total": len(cases),
+        }
+    return result
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+端到端基准: 本地模拟服务 (fofa_finder.mock) + 完整 fofa_finder.main.main()
+限速等待按 Config.SLEEP_SCALE=0 跳过，计时只反映本地处理与 HTTP 往返
+"""
+import os
+import sys
+import shutil
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from benchmarks import corpus
+from benchmarks.harness import Case
+
+# (公司数, 每次 FOFA 查询返回的资产数范围)
+SIZES = {
+    "quick": [(5, (10, 1000))],
+    "full": [(20, (10, 1000)), (50, (10, 10000))],
+}
+
+
+def cases(profile, work_dir):
+    from fofa_finder.config import Config
+    from fofa_finder.mock.server import MockServer
+    from fofa_finder.modules import payload_store
+    from fofa_finder import main as app
+
+    corpus.use_corpus_models()
+    result = []
+
+    for companies, result_size in SIZES[profile]:
+        input_file = corpus.company_list(companies)
+        run_dir = os.path.join(work_dir, f"pipeline_{companies}")
+
+        def setup(run_dir=run_dir):
+            # 每轮使用全新的输出目录，避免断点续传跳过已处理公司、载荷去重命中上一轮
+            if os.path.exists(run_dir):
+                shutil.rmtree(run_dir)
+            Config.OUTPUT_DIR = run_dir
+            Config.PAYLOAD_DIR = os.path.join(run_dir, "payloads")
+            payload_store.reset_store()
+
+        def run(input_file=input_file, result_size=result_size):
+            server = MockServer(result_size=result_size, seed=corpus.SEED).start().configure()
+            Config.INPUT_FILE = input_file
+            Config.SLEEP_SCALE = 0
+            try:
+                app.main(["--skip-learning"])
+            finally:
+                server.stop()
+
+        result.append(Case(f"pipeline.main[companies={companies},assets={result_size[0]}-{result_size[1]}]",
+                           run, companies, repeat=3, setup=setup))
+    return result
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试用的固定合成语料 (基于 fofa_finder.mock.synthetic，seed 固定)
+
+- 公司列表 Excel: 1k / 10k / 100k 家
+- FOFA 响应: 每家 10 ~ 10000 条资产
+- 本地模型: 与 learning/train_*.py 结构相同 (TF-IDF + 随机森林)，用合成标签训练
+
+生成结果缓存在 benchmarks/.corpus/，删除该目录即可重新生成
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.mock import synthetic
+
+CORPUS_DIR = os.path.join(BASE_DIR, "benchmarks", ".corpus")
+SEED = 20240501
+FIELDS = "host,ip,port,title,protocol,country_name,region_name,city_name".split(",")
+
+
+def _ensure_dir():
+    if not os.path.exists(CORPUS_DIR):
+        os.makedirs(CORPUS_DIR)
+
+
+def company_list(count):
+    """
+    返回 count 家公司的 Excel 路径 (不存在时生成)
+    """
+    _ensure_dir()
+    path = os.path.join(CORPUS_DIR, f"companies_{count}.xlsx")
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp.xlsx"
+        synthetic.write_company_list(tmp_path, count, SEED)
+        os.replace(tmp_path, path)
+    return path
+
+
+def fofa_response(asset_count):
+    """
+    返回一次 API 模式 FOFA 响应 (与 FofaClient.search_official 的返回结构一致)
+    """
+    query = f'(title="云图" || body="云图") && country="CN"#{asset_count}'
+    results = synthetic.fofa_results(query, FIELDS, asset_count, asset_count, SEED)
+    return {"error": False, "mode": "extended", "page": 1, "query": query, "size": len(results), "results": results}
+
+
+def assets(asset_count):
+    """
+    返回已提取的资产列表 (与 Analyzer.extract_assets 的输出一致)
+    """
+    return [{"link": r[0], "ip": r[1], "port": r[2], "title": r[3]} for r in fofa_response(asset_count)["results"]]
+
+
+def training_data():
+    """
+    合成标注数据: {模型名: (文本, 标签)}，标签规则与 mock.synthetic 的生成规则一致
+    """
+    titles = [a["title"] or "N/A" for a in assets(2000)]
+    names = [row["企业名称"] for row in synthetic.company_rows(500, SEED)]
+    return {
+        "model": (titles, [0 if t == "N/A" or any(w in t for w in synthetic.JUNK_WORDS) else 1 for t in titles]),
+        "company_model": (names, [0 if any(s in n for s in synthetic.TRADITIONAL_SUFFIXES) else 1 for n in names]),
+        "cnvd_model": (titles, [1 if any(w in t for w in synthetic.CNVD_WORDS) else 0 for t in titles]),
+    }
+
+
+def forest_pipeline(name):
+    """
+    与 learning/train_*.py 相同结构的 TF-IDF + 随机森林
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+
+    ngram_range, max_features, clf_args = {
+        "model": ((1, 3), 10000, {}),
+        "company_model": ((2, 4), 5000, {}),
+        "cnvd_model": ((2, 5), 5000, {"class_weight": "balanced"}),
+    }[name]
+    return Pipeline([
+        ('tfidf', TfidfVectorizer(analyzer='char', ngram_range=ngram_range, max_features=max_features)),
+        ('clf', RandomForestClassifier(n_estimators=100, random_state=42, **clf_args)),
+    ])
+
+
+def _train_models():
+    return {name: forest_pipeline(name).fit(texts, labels) for name, (texts, labels) in training_data().items()}
+
+
+def use_corpus_models():
+    """
+    让 LocalEngine 加载语料模型 (首次调用时训练并缓存)，不依赖 learning/ 下的真实模型文件
+    """
+    import joblib
+    from fofa_finder.modules import local_engine
+
+    _ensure_dir()
+    paths = {name: os.path.join(CORPUS_DIR, f"{name}.pkl") for name in ("model", "company_model", "cnvd_model")}
+    if not all(os.path.exists(p) for p in paths.values()):
+        for name, model in _train_models().items():
+            joblib.dump(model, paths[name])
+
+    local_engine.MODEL_PATH = paths["model"]
+    local_engine.COMPANY_MODEL_PATH = paths["company_model"]
+    local_engine.CNVD_MODEL_PATH = paths["cnvd_model"]
+    local_engine.REGISTRY_DIR = os.path.join(CORPUS_DIR, "registry") # 不存在，跳过真实注册表中的版本
+    return paths
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+计时与基线对比
+"""
+import gc
+import time
+import statistics
+
+DEFAULT_REPEAT = 5
+LONG_CASE_SECONDS = 2.0 # 单轮超过该时长的用例最多跑 2 轮
+
+
+class Case:
+    """
+    一个基准用例: func 为单次被测操作，items 为该操作处理的条数 (用于计算单条耗时)
+    """
+    def __init__(self, name, func, items=1, repeat=None, setup=None):
+        self.name = name
+        self.func = func
+        self.items = items
+        self.repeat = repeat
+        self.setup = setup
+
+
+def measure(case, repeat=DEFAULT_REPEAT, warmup=True):
+    """
+    运行用例 repeat 次，返回 {median, min, max, repeat, items, per_item_us}
+    每轮前执行 setup (不计时) 并做一次 gc，避免上一轮的垃圾回收落到本轮
+    """
+    repeat = case.repeat or repeat
+    if warmup and repeat > 1:
+        if case.setup:
+            case.setup()
+        started = time.perf_counter()
+        case.func()
+        if time.perf_counter() - started > LONG_CASE_SECONDS:
+            repeat = min(repeat, 2)
+
+    timings = []
+    for _ in range(repeat):
+        if case.setup:
+            case.setup()
+        gc.collect()
+        started = time.perf_counter()
+        case.func()
+        timings.append(time.perf_counter() - started)
+
+    median = statistics.median(timings)
+    return {
+        "median": round(median, 6),
+        "min": round(min(timings), 6),
+        "max": round(max(timings), 6),
+        "repeat": repeat,
+        "items": case.items,
+        "per_item_us": round(median / case.items * 1e6, 3) if case.items else None,
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """
+    与基线对比中位数耗时
+    判定为变慢: current > baseline * (1 + tolerance) 且绝对差值 > min_delta 秒 (过滤毫秒级抖动)
+    返回: [(name, baseline, current, ratio, status)]，status 为 'slower' / 'faster' / 'ok' / 'new'
+    """
+    rows = []
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, current["median"], None, "new"))
+            continue
+        ratio = current["median"] / base["median"] if base["median"] else float("inf")
+        delta = current["median"] - base["median"]
+        if ratio > 1 + tolerance and delta > min_delta:
+            status = "slower"
+        elif ratio < 1 - tolerance and -delta > min_delta:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, base["median"], current["median"], ratio, status))
+    return rows
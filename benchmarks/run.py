@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试入口: 运行组件 / 端到端基准，结果写入 JSON 并与基线对比
+
+    python benchmarks/run.py                          # quick 档位，全部用例
+    python benchmarks/run.py --profile full --suite components
+    python benchmarks/run.py --save-baseline          # 将本次结果保存为基线
+    python benchmarks/run.py --baseline benchmarks/baseline.json --tolerance 0.2
+    python benchmarks/run.py --suite models              # forest / linear 模型的加载、推理速度与准确率
+
+存在变慢的用例，或入口模块在 import 时加载了重量级依赖 (pandas / scikit-learn 等) 时退出码为 1 (可直接用于 CI)
+--check (环境变量 CI 非空时默认开启) 下缺少基线也返回 1，避免回归检查因没有基线而静默通过
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.mock.sandbox import redirect_output
+
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+BASELINE_FILE = os.path.join(BASE_DIR, "benchmarks", "baseline.json")
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run fofa_finder benchmarks and compare against a baseline")
+    parser.add_argument("--suite", choices=["import", "components", "models", "pipeline", "all"], default="all")
+    parser.add_argument("--profile", choices=["quick", "full"], default="quick", help="Corpus sizes to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (median is compared)")
+    parser.add_argument("--filter", help="Only run cases whose name contains this substring")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown (0.15 = 15%%)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore differences below this many seconds")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results to --baseline")
+    parser.add_argument("--check", action="store_true", default=bool(os.environ.get("CI")),
+                        help="Fail when the baseline is missing (default on when $CI is set)")
+    parser.add_argument("--verbose", action="store_true", help="Keep INFO logs on the console")
+    args = parser.parse_args(argv)
+
+    # 所有输出写入临时目录，不污染 fofa_finder/output (须在导入其它 fofa_finder 模块之前)
+    work_dir = redirect_output(tempfile.mkdtemp(prefix="fofa_bench_"))
+
+    from fofa_finder.modules.logger import set_console_level
+    from benchmarks.harness import measure, compare
+    from benchmarks import bench_import, bench_components, bench_models, bench_pipeline
+
+    if not args.verbose:
+        set_console_level(logging.WARNING)
+
+    cases = []
+    violations = {}
+    model_stats = {}
+    try:
+        if args.suite in ("import", "all"):
+            violations = bench_import.check()
+            cases += bench_import.cases(args.profile)
+        if args.suite in ("components", "all"):
+            cases += bench_components.cases(args.profile)
+        if args.suite in ("models", "all"):
+            cases += bench_models.cases(args.profile)
+            model_stats = bench_models.stats()
+        if args.suite in ("pipeline", "all"):
+            cases += bench_pipeline.cases(args.profile, work_dir)
+        if args.filter:
+            cases = [c for c in cases if args.filter in c.name]
+
+        results = {}
+        for case in cases:
+            print(f"[bench] {case.name} ...", end=" ", flush=True)
+            results[case.name] = measure(case, args.repeat)
+            r = results[case.name]
+            print(f"median {r['median'] * 1000:.2f} ms | min {r['min'] * 1000:.2f} ms | {r['per_item_us']} us/item")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": _git_commit(),
+            "profile": args.profile,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if model_stats:
+        report["models"] = model_stats
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d_%H%M%S") + ".json")
+    if not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {output}")
+
+    if model_stats:
+        print(f"\n  {'MODEL':28} {'SIZE':>12} {'HOLDOUT ACC':>12} {'VERIFY':>8}")
+        for name, row in sorted(model_stats.items()):
+            verify = f"{row['verify_passed']}/{row['verify_total']}" if row["verify_total"] else "-"
+            print(f"  {name:28} {row['size_kb']:>9.1f} KB {row['holdout_accuracy']:>12.4f} {verify:>8}")
+
+    for module, loaded in sorted(violations.items()):
+        print(f"IMPORT  {module} loads {', '.join(loaded)} at import time")
+
+    if args.save_baseline:
+        baseline = {"meta": report["meta"], "results": results}
+        if os.path.exists(args.baseline):
+            # 只覆盖本次运行过的用例，保留其它档位/用例的基线
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline["results"] = dict(json.load(f).get("results", {}), **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if violations else 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline to create one.")
+        if args.check:
+            print("--check: a baseline is required, failing.")
+            return 1
+        return 1 if violations else 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline.get("results", {}), args.tolerance, args.min_delta)
+
+    print(f"\nBaseline: {args.baseline} (commit {baseline.get('meta', {}).get('commit')}, tolerance {args.tolerance:.0%})")
+    for name, base, current, ratio, status in rows:
+        base_text = f"{base * 1000:10.2f} ms" if base is not None else f"{'-':>13}"
+        ratio_text = f"{ratio:6.2f}x" if ratio is not None else f"{'':>7}"
+        print(f"  {status.upper():7} {name:60} {base_text} -> {current * 1000:10.2f} ms {ratio_text}")
+
+    slower = [row for row in rows if row[4] == "slower"]
+    if slower:
+        print(f"\n{len(slower)} case(s) slower than baseline")
+    return 1 if slower or violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
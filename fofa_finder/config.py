@@ -5,10 +5,7 @@ class Config:
     # 基础路径
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     OUTPUT_DIR = os.path.join(BASE_DIR, "output")
-    
-    # 确保输出目录存在
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+    # 输出目录不在 import 时创建，由入口在启动时调用 Config.ensure_dirs()
         
     # 输入文件 (请根据实际情况修改)
     # 推荐使用绝对路径，或将文件放在项目根目录下
@@ -53,6 +50,9 @@ class Config:
     RATE_LIMIT_MIN = 2
     RATE_LIMIT_MAX = 5
     
+    # 所有限速等待 (metrics.pause) 的缩放系数，1 为正常；对接本地模拟服务 (fofa_finder.mock) 时可设为 0
+    SLEEP_SCALE = 1.0
+    
     # 排除关键词 (博彩、体育、色情等)
     EXCLUDED_KEYWORDS = [
         "博彩", "赌博", "投注", "彩票", "casino", "betting", "lottery",
@@ -62,7 +62,103 @@ class Config:
         "小说", "novel", "电影", "movie"
     ]
     
+    # 输出存储格式
+    # 'jsonl': gzip 压缩的 JSON Lines (默认，无额外依赖)
+    # 'parquet': 列式存储 (需要 pip install pyarrow)
+    # 'xlsx': 旧版 Excel 格式 (慢，约 100 万行上限)
+    STORAGE_FORMAT = 'jsonl'
+    JSONL_COMPRESS_LEVEL = 6
+
+    # 是否在写入 jsonl/parquet 的同时立即生成 Excel 副本
+    # 关闭时可通过 tools/export_excel.py 按需生成
+    EXCEL_EXPORT = False
+
+    # 输出布局
+    # 'per_company': 每家公司单独生成 raw/analysis/report 文件 (默认)
+    # 'dataset': 整个会话追加写入一个合并数据集 (少量分片 + 公司索引)，
+    #            单个公司的 Excel/Markdown 通过 tools/render_report.py 按需生成
+    OUTPUT_LAYOUT = 'per_company'
+    DATASET_PART_MB = 64 # 单个分片文件大小上限
+
+    # 历史数据重分析 (--reanalyze)
+    REANALYSIS_HOURS = 48              # 仅重分析最近 N 小时内的原始数据 (0 表示全部历史)
+    REANALYSIS_WORKERS = 4             # 并行解析原始数据的进程数
+    REANALYSIS_AI_CONCURRENCY = 4      # 同时进行的 AI 审计数量 (1 表示串行模式)
+    REANALYSIS_BUDGET_CNY = None       # 本次重分析花费上限 (元)，None 表示不限制
+    REANALYSIS_INCREMENTAL = False     # 增量模式: 按 link 比对上次分析，仅审计新增/标题变化的资产
+
+    # HTTP 载荷捕获: FOFA / DeepSeek 的请求与响应体写入压缩分段文件，日志中只记录引用 id
+    # 查看: python -m fofa_finder.modules.payload_store <id>
+    PAYLOAD_CAPTURE = True
+    PAYLOAD_DIR = os.path.join(OUTPUT_DIR, "payloads")
+    PAYLOAD_COMPRESSION = 'auto'   # 'auto' / 'zstd' (需要 pip install zstandard) / 'gzip'
+    PAYLOAD_COMPRESS_LEVEL = 6
+    PAYLOAD_SEGMENT_MB = 256       # 单个分段文件大小上限
+    PAYLOAD_MAX_SEGMENTS = 0       # 最多保留的分段数量 (0 表示不清理)
+
+    # 结构化事件流 (每行一个 JSON: 资质预判、关键词拆分、批次审计结果、Token 用量与耗时)
+    # learning/extract_company_data.py 直接读取该文件生成训练集
+    EVENTS_ENABLED = True
+    EVENTS_FILE = os.path.join(OUTPUT_DIR, "events.jsonl")
+
+    # Prometheus 指标导出 (可选，长时间扫描的实时监控)
+    # METRICS_PORT: 启动 http://METRICS_HOST:PORT/metrics 端点 (None 表示关闭)
+    # METRICS_FILE: 定期原子写入 .prom 文件，供 node_exporter textfile collector 采集
+    METRICS_PORT = None
+    METRICS_HOST = '127.0.0.1'
+    METRICS_FILE = None
+    METRICS_INTERVAL = 15 # 秒
+
+    # 按公司采样剖析 (cProfile + tracemalloc)，由 --profile-every / --profile-min-assets 开启
+    # 结果写入会话目录 profile_data/
+    PROFILE_EVERY = 0        # 每 N 家公司剖析一家，0 表示关闭
+    PROFILE_MIN_ASSETS = 0   # 资产数 >= M 的公司一律剖析，0 表示关闭
+    PROFILE_TOP = 40         # 摘要中列出的函数/分配点数量
+    PROFILE_TRACEMALLOC_FRAMES = 10
+
+    # 本地模型热加载: LocalEngine 每隔 N 秒检查一次模型文件 mtime，
+    # 后台自动学习发布新的 company_model.pkl 后无需重启即可生效，0 表示关闭
+    MODEL_RELOAD_INTERVAL = 30 # 秒
+
+    # 本地模型实现: 'forest' (TF-IDF + RandomForest，默认) / 'linear' (特征哈希 + 线性模型，加载与推理更快)
+    # 'linear' 需先用 train_*.py --model linear 生成 *_linear.pkl，文件不存在时回退到 forest
+    LOCAL_MODEL_FAMILY = 'forest'
+    # 优先加载内存映射格式 (<model>_mmap/，由 learning/mmap_model.py 导出): 加载几乎不耗时，多进程共享页缓存
+    LOCAL_MODEL_MMAP = False
+
+    # 模型注册表 (learning/registry/): 每次训练发布一个版本，CURRENT 指针指向当前版本，可回滚
+    LOCAL_MODEL_PINS = {}      # 固定版本，例如 {'company': 'v0003'} (kind: local / company / cnvd)；未设置的模型跟随 CURRENT
+    MODEL_REGISTRY_KEEP = 10   # 每种模型保留的版本数，当前版本与固定版本不会被清理
+
+    # 自动学习 / 数据增强 (learning/augment_data.py): DeepSeek 并发标注
+    AUGMENT_CONCURRENCY = 4  # 同时进行的标注请求数
+    AUGMENT_MAX_RETRIES = 3  # 429 / 5xx / 网络异常时的最大尝试次数
+    AUGMENT_BACKOFF = 2      # 退避基数 (秒)，第 n 次重试等待约 BACKOFF * 2^n
+    AUGMENT_STRATEGY = 'entropy' # 选样策略: 'entropy' / 'margin' (按公司模型不确定性) 或 'keyword' (关键词 + 随机)
+
+    # 增量学习 (learning/online_model.py): 字符哈希特征 + SGD，新标签到达时 partial_fit 更新 *_online.pkl
+    # 开启后 LocalEngine 优先加载在线模型，自动学习不再每次全量重训练 RandomForest
+    ONLINE_LEARNING = False
+    ONLINE_REBUILD_EVERY = 500 # 增量更新累计 N 条样本后由自动学习从样本库全量重建一次，0 表示仅手动重建
+    ONLINE_UPDATE_BATCH = 20     # 扫描中 DeepSeek 资质结论攒够 N 条再更新一次在线模型 (每次更新都会重写并 fsync 模型文件)
+    ONLINE_UPDATE_INTERVAL = 60  # 或距上次更新超过 N 秒
+
+    # 模型训练 (learning/train_*.py，--search 时使用 learning/training.py 的交叉验证超参数搜索)
+    TRAIN_N_JOBS = -1            # 随机森林与超参数搜索的并行度，-1 表示全部核心
+    TRAIN_SCORING = 'f1_macro'   # 超参数搜索的评分指标 (类别不均衡，不用 accuracy)
+    FEATURE_CACHE_KEEP = 3       # 每种模型保留的特征矩阵缓存数 (learning/.feature_cache/)
+    # 从历史报告提取训练集 (extract_cnvd_data.py / prepare_data.py) 的解析进程数，1 表示串行
+    # 单个报告的提取结果按文件 mtime 缓存在 learning/.extract_cache/，重跑时只解析新报告
+    EXTRACT_WORKERS = 4
+
     # 日志格式
     LOG_FORMAT = '[%(asctime)s] %(levelname)-8s | %(name)-12s | %(message)s'
     LOG_FILE = os.path.join(OUTPUT_DIR, "fofa_finder.log")
 
+    @classmethod
+    def ensure_dirs(cls):
+        """
+        确保输出目录存在
+        """
+        if not os.path.exists(cls.OUTPUT_DIR):
+            os.makedirs(cls.OUTPUT_DIR)
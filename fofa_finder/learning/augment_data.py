@@ -7,6 +7,8 @@ import time
 import logging
 import sys
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add project root to sys.path to import config
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -15,15 +17,56 @@ sys.path.append(BASE_DIR)
 from fofa_finder.config import Config
 # Import shared logger setup
 from fofa_finder.modules.logger import setup_logger
+from fofa_finder.modules.metrics import pause
+from fofa_finder.learning import sample_store
 
 logger = setup_logger("Augment")
 
 EXCEL_FILE = os.path.join(BASE_DIR, "company_list.xlsx")
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "company_dataset.csv")
 
-def call_deepseek(company_name):
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(pool_size=None):
+    """
+    所有标注线程共享的 requests.Session (复用 TCP/TLS 连接)
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = pool_size or Config.AUGMENT_CONCURRENCY
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def _backoff(attempt):
+    # 指数退避 + 随机抖动，避免多个线程在同一时刻重试
+    delay = Config.AUGMENT_BACKOFF * (2 ** attempt)
+    pause(delay + random.uniform(0, delay / 2))
+
+class DatasetAppender:
+    """
+    逐条写入样本库 (learning/sample_store.py，每条一个事务)，中途中断也不会丢失已完成的标注
+    同一公司出现多次时以最后一条为准
+    """
+    def __init__(self, source="augment"):
+        self.source = source
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, company, label, reason):
+        sample_store.add("company", company, label, self.source, reason)
+        with self._lock:
+            self.count += 1
+
+def call_deepseek(company_name, session=None):
     """
     Call DeepSeek API to judge company eligibility
+    429 / 5xx / 网络异常 / 非 JSON 回复时按指数退避重试 (Config.AUGMENT_MAX_RETRIES 次)
     """
     api_key = Config.DEEPSEEK_API_KEY
     base_url = Config.DEEPSEEK_BASE_URL
@@ -50,28 +93,100 @@ def call_deepseek(company_name):
     }}
     """
     
+    session = session or get_session()
+    max_retries = Config.AUGMENT_MAX_RETRIES
+    for attempt in range(max_retries):
+        try:
+            response = session.post(
+                url,
+                headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+                json={"model": "deepseek-chat", "messages": [{"role": "user", "content": prompt}], "temperature": 0.1},
+                timeout=30
+            )
+
+            if response.status_code == 200:
+                content = response.json()['choices'][0]['message']['content']
+                content = content.replace("```json", "").replace("```", "").strip()
+                data = json.loads(content)
+                return data.get('eligible', False), data.get('reason', 'No reason')
+            elif response.status_code in RETRY_STATUS:
+                logger.warning(f"{company_name}: API Error {response.status_code} (尝试 {attempt + 1}/{max_retries})")
+            else:
+                logger.error(f"{company_name}: API Error {response.status_code}")
+                return None, None
+
+        except Exception as e:
+            logger.warning(f"{company_name}: Request failed: {e} (尝试 {attempt + 1}/{max_retries})")
+
+        if attempt < max_retries - 1:
+            _backoff(attempt)
+
+    return None, None
+
+KEYWORDS = ["科技", "网络", "信息", "软件", "数据", "系统", "智能", "云", "通信", "电子"]
+
+def select_by_keywords(unlabeled, batch_size):
+    """
+    旧策略: 优先选择包含科技类关键词的公司，不足时随机补齐 (保证有负样本)
+    """
+    candidates = [comp for comp in unlabeled if any(kw in comp for kw in KEYWORDS)]
+    logger.info(f"Filtered {len(candidates)} high-potential candidates (containing keywords).")
+    
+    if len(candidates) < batch_size:
+        chosen = set(candidates)
+        others = [c for c in unlabeled if c not in chosen]
+        random.shuffle(others)
+        candidates.extend(others[:batch_size - len(candidates)])
+    
+    random.shuffle(candidates)
+    return candidates[:batch_size]
+
+def _entropy(probs):
+    import numpy as np
+    p = np.clip(probs, 1e-12, 1.0)
+    return -(p * np.log(p)).sum(axis=1)
+
+def _margin(probs):
+    import numpy as np
+    # 最高与次高概率之差越小越不确定，取负值使分数越大越值得标注
+    top2 = np.sort(probs, axis=1)[:, -2:]
+    return -(top2[:, 1] - top2[:, 0])
+
+UNCERTAINTY_SCORES = {"entropy": _entropy, "margin": _margin}
+
+def select_uncertain(unlabeled, batch_size, strategy="entropy"):
+    """
+    主动学习 (不确定性采样): 用当前公司模型一次性对所有未标注公司 predict_proba，
+    按熵 / 间隔排序，只把模型最没把握的公司交给 DeepSeek 标注
+    没有可用模型时返回 None (由调用方回退到关键词策略)
+    """
+    if not unlabeled or batch_size <= 0:
+        return []
+
+    from fofa_finder.modules.local_engine import LocalEngine
+    model = LocalEngine().company_model
+    if model is None or not hasattr(model, "predict_proba"):
+        logger.warning("公司模型不可用，回退到关键词选样策略")
+        return None
+
+    import numpy as np
     try:
-        response = requests.post(
-            url,
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={"model": "deepseek-chat", "messages": [{"role": "user", "content": prompt}], "temperature": 0.1},
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            content = response.json()['choices'][0]['message']['content']
-            content = content.replace("```json", "").replace("```", "").strip()
-            data = json.loads(content)
-            return data.get('eligible', False), data.get('reason', 'No reason')
-        else:
-            print(f"API Error: {response.status_code}")
-            return None, None
-            
+        probs = np.asarray(model.predict_proba(unlabeled))
     except Exception as e:
-        print(f"Request failed: {e}")
-        return None, None
+        logger.warning(f"批量推理失败，回退到关键词选样策略: {e}")
+        return None
+    if probs.ndim != 2 or probs.shape[1] < 2:
+        # 训练集只有一个类别时无法衡量不确定性
+        logger.warning("公司模型只有单一类别，回退到关键词选样策略")
+        return None
 
-def augment(batch_size=20):
+    scores = UNCERTAINTY_SCORES[strategy](probs)
+    order = np.argsort(-scores, kind="stable")[:batch_size]
+    logger.info(f"按 {strategy} 从 {len(unlabeled)} 家未标注公司中选出 {len(order)} 家 "
+                f"(分数区间 {scores[order[-1]]:.4f} ~ {scores[order[0]]:.4f})")
+    return [unlabeled[i] for i in order]
+
+def augment(batch_size=20, concurrency=None, strategy=None):
     logger.info("=== 开始数据增强流程 ===")
     
     # 1. Load Excel
@@ -105,85 +220,68 @@ def augment(batch_size=20):
         return 0
 
     # 2. Load Existing Dataset
-    existing_companies = set()
-    if os.path.exists(DATASET_FILE):
-        df_dataset = pd.read_csv(DATASET_FILE)
-        existing_companies = set(df_dataset['company'].astype(str).tolist())
-        logger.info(f"Existing dataset has {len(existing_companies)} samples.")
-        
-    # 3. Filter Candidates
-    # Strategy: Prioritize "Tech" keywords to balance dataset
-    keywords = ["科技", "网络", "信息", "软件", "数据", "系统", "智能", "云", "通信", "电子"]
-    
-    candidates = []
-    for comp in all_companies:
-        if comp in existing_companies:
-            continue
+    existing_companies = sample_store.labeled("company")
+    logger.info(f"Existing dataset has {len(existing_companies)} samples.")
         
-        # Check if it contains any keyword
-        if any(kw in comp for kw in keywords):
-            candidates.append(comp)
-            
-    logger.info(f"Filtered {len(candidates)} high-potential candidates (containing keywords).")
-    
-    # If not enough candidates, add some random ones (to have negative samples too)
-    if len(candidates) < batch_size:
-        others = [c for c in all_companies if c not in existing_companies and c not in candidates]
-        random.shuffle(others)
-        candidates.extend(others[:batch_size - len(candidates)])
-    
-    # Shuffle and pick batch
-    random.shuffle(candidates)
-    target_batch = candidates[:batch_size]
+    # 3. Select Candidates
+    unlabeled = [c for c in all_companies if c not in existing_companies]
+    strategy = strategy or Config.AUGMENT_STRATEGY
+    target_batch = None
+    if strategy in UNCERTAINTY_SCORES:
+        target_batch = select_uncertain(unlabeled, batch_size, strategy)
+    if target_batch is None:
+        target_batch = select_by_keywords(unlabeled, batch_size)
     
     logger.info(f"\nSelected {len(target_batch)} companies for labeling:")
     for i, c in enumerate(target_batch):
         logger.info(f"  {i+1}. {c}")
         
-    # 4. Query API
-    new_data = []
-    logger.info("Starting API labeling...")
-    
-    for i, company in enumerate(target_batch):
-        # Using print for progress bar effect without newline
-        # sys.stdout.write(f"[{i+1}/{len(target_batch)}] Analyzing: {company} ...")
-        # sys.stdout.flush()
-        
-        eligible, reason = call_deepseek(company)
-        
-        if eligible is not None:
-            status = "Eligible" if eligible else "Ineligible"
-            # sys.stdout.write(f" -> {status}\n")
-            logger.info(f"[{i+1}/{len(target_batch)}] {company} -> {status} ({reason})")
-            new_data.append({
-                "company": company,
-                "label": 1 if eligible else 0,
-                "reason": reason
-            })
-        else:
-            # sys.stdout.write(" -> Failed\n")
-            logger.error(f"[{i+1}/{len(target_batch)}] {company} -> Failed")
-            
-        # Rate limit
-        time.sleep(1)
-        
-    # 5. Save
-    if new_data:
-        df_new = pd.DataFrame(new_data)
-        
-        if os.path.exists(DATASET_FILE):
-            df_old = pd.read_csv(DATASET_FILE)
-            df_combined = pd.concat([df_old, df_new], ignore_index=True)
-            df_combined.drop_duplicates(subset=['company'], keep='last', inplace=True)
-            df_combined.to_csv(DATASET_FILE, index=False, encoding='utf-8-sig')
-        else:
-            df_new.to_csv(DATASET_FILE, index=False, encoding='utf-8-sig')
-            
-        logger.info(f"\nSuccessfully added {len(new_data)} new samples to {DATASET_FILE}")
-        return len(new_data)
+    # 4. Query API (bounded worker pool, results appended as they arrive)
+    concurrency = max(1, min(concurrency or Config.AUGMENT_CONCURRENCY, len(target_batch) or 1))
+    session = get_session(concurrency)
+    appender = DatasetAppender()
+    labeled = []
+    failed = 0
+    logger.info(f"Starting API labeling (并发: {concurrency})...")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(call_deepseek, company, session): company for company in target_batch}
+        for done, future in enumerate(as_completed(futures), 1):
+            company = futures[future]
+            eligible, reason = future.result()
+            if eligible is not None:
+                status = "Eligible" if eligible else "Ineligible"
+                logger.info(f"[{done}/{len(target_batch)}] {company} -> {status} ({reason})")
+                try:
+                    appender.append(company, 1 if eligible else 0, reason)
+                    labeled.append((company, 1 if eligible else 0))
+                except Exception as e:
+                    logger.error(f"保存训练数据失败: {e}")
+            else:
+                failed += 1
+                logger.error(f"[{done}/{len(target_batch)}] {company} -> Failed")
+
+    # 5. Incremental update (整批一次 partial_fit)
+    if Config.ONLINE_LEARNING and labeled:
+        try:
+            from fofa_finder.learning import online_model
+            online_model.update("company", [c for c, _ in labeled], [l for _, l in labeled])
+        except Exception as e:
+            logger.error(f"在线模型增量更新失败: {e}")
+
+    # 6. Summary
+    if appender.count:
+        logger.info(f"\nSuccessfully added {appender.count} new samples to {sample_store.STORE_FILE} ({failed} failed)")
     else:
         logger.info("\nNo data added.")
-        return 0
+    return appender.count
 
 if __name__ == "__main__":
-    augment(batch_size=20)
+    import argparse
+    parser = argparse.ArgumentParser(description="Label companies from the input Excel with DeepSeek")
+    parser.add_argument("--batch-size", type=int, default=20, help="Companies to label in this run")
+    parser.add_argument("--concurrency", type=int, default=Config.AUGMENT_CONCURRENCY, help="Concurrent DeepSeek requests")
+    parser.add_argument("--strategy", choices=sorted(UNCERTAINTY_SCORES) + ["keyword"], default=Config.AUGMENT_STRATEGY,
+                        help="Candidate selection: model uncertainty (entropy/margin) or keyword match")
+    args = parser.parse_args()
+    augment(batch_size=args.batch_size, concurrency=args.concurrency, strategy=args.strategy)
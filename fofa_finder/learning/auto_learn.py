@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+自动学习 (数据增强 + 公司模型重训练) 后台任务
+
+main() 启动时不再同步执行 augment + train，而是交给独立进程:
+    1. augment(batch_size): 调用 DeepSeek 为新公司打标签，写入样本库 (sample_store.py)
+    2. 有新样本时重新训练公司模型，发布为模型注册表的新版本并原子切换 CURRENT (model_registry.py)
+       (Config.ONLINE_LEARNING 开启时 augment 已增量更新在线模型，仅在累计样本达到阈值时全量重建)
+    3. 扫描进程中的 LocalEngine 检测到模型文件 mtime 变化后自动热加载
+
+也可单独运行: python fofa_finder/learning/auto_learn.py --batch-size 20
+"""
+import os
+import sys
+import argparse
+import multiprocessing
+
+# Add project root to sys.path to import config
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.config import Config
+from fofa_finder.modules.logger import setup_logger
+
+logger = setup_logger("AutoLearn")
+
+
+def run(batch_size=10, overrides=None, full_retrain=False):
+    """
+    执行一轮自动学习，返回新增样本数
+    overrides: 父进程的 Config 设置 (命令行参数或测试中修改过的值)
+    full_retrain: 在线学习模式下也强制全量重训练 RandomForest 公司模型
+    """
+    for key, value in (overrides or {}).items():
+        setattr(Config, key, value)
+
+    from fofa_finder.learning.augment_data import augment
+
+    try:
+        added_count = augment(batch_size=batch_size)
+        if added_count > 0 and Config.ONLINE_LEARNING and not full_retrain:
+            from fofa_finder.learning import online_model
+            if online_model.needs_rebuild("company"):
+                logger.info("在线模型增量样本已达阈值，从数据集全量重建...")
+                online_model.rebuild("company")
+            else:
+                logger.info(f"成功获取 {added_count} 条新样本，在线模型已增量更新")
+        elif added_count > 0:
+            from fofa_finder.learning.train_company_model import train as train_company_model
+            logger.info(f"成功获取 {added_count} 条新样本，正在后台重新训练本地模型...")
+            # LOCAL_MODEL_MMAP 开启时注册表会同时导出内存映射格式
+            train_company_model(Config.LOCAL_MODEL_FAMILY)
+            logger.info("本地公司模型已发布，扫描进程将自动热加载")
+        else:
+            logger.info("本次未发现新样本或未进行增强。")
+        return added_count
+    except Exception as e:
+        logger.warning(f"自动学习过程中出现异常 (非阻断性): {e}")
+        return 0
+
+
+def _config_snapshot():
+    return {key: value for key, value in vars(Config).items() if key.isupper()}
+
+
+def start_background(batch_size=10):
+    """
+    在独立进程中运行自动学习，立即返回 Process (spawn 启动，不继承父进程的线程与锁)
+    非守护进程: 扫描先结束时，主进程退出前会等待其完成训练与发布
+    """
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(target=run, args=(batch_size, _config_snapshot()), name="AutoLearn")
+    process.start()
+    return process
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label new companies with DeepSeek and retrain the company model")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--full-retrain", action="store_true", help="Retrain the RandomForest company model even in online-learning mode")
+    args = parser.parse_args()
+    run(args.batch_size, full_retrain=args.full_retrain)
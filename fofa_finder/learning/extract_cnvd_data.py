@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
 import pandas as pd
-import glob
 import logging
 import sys
 
@@ -15,114 +14,92 @@ if not logger.handlers:
     logger.setLevel(logging.INFO)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.modules.storage import read_table, table_names
+from fofa_finder.modules.manifest import OutputManifest
+from fofa_finder.config import Config
+from fofa_finder.learning import parallel_extract, sample_store
+
 # Update report directory to search all timestamped folders
 REPORT_DIR = os.path.join(BASE_DIR, "fofa_finder", "output")
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "cnvd_dataset.csv")
 
-def extract():
+def is_title_column(column):
+    return 'title' in str(column).lower() or '标题' in str(column)
+
+def extract_file(file_path):
+    """
+    从一份分析报告中提取 [(title, label)] (在进程池中执行，须为模块级函数)
+    Positives (Label 1): Assets in "CNVD候选"
+    Negatives (Label 0): Assets in "资产分析" but NOT in "CNVD候选"
+    只读取标题列；报告中没有可用的表 / 标题列时返回空列表
+    """
+    sheet_names = table_names(file_path)
+    sheet_map = {name.strip(): name for name in sheet_names}
+    
+    # Find '资产分析' (Asset Analysis) sheet
+    valid_sheet_name = None
+    for key in ['资产分析', 'Valid Assets', 'Sheet1']:
+        if key in sheet_map:
+            valid_sheet_name = sheet_map[key]
+            break
+    
+    if not valid_sheet_name:
+        return []
+        
+    df_all_valid = read_table(file_path, valid_sheet_name, columns=is_title_column)
+    if df_all_valid.columns.empty:
+        return []
+    
+    cnvd_titles = set()
+    # reporter.py uses "CNVD候选" / "CNVD Candidates"
+    cnvd_sheet = next((s for s in sheet_names if "CNVD" in s), None)
+    if cnvd_sheet:
+        df_cnvd = read_table(file_path, cnvd_sheet, columns=is_title_column)
+        if not df_cnvd.columns.empty:
+            cnvd_titles = set(df_cnvd.iloc[:, 0].dropna().astype(str).tolist())
+    
+    rows = {}
+    for title in df_all_valid.iloc[:, 0].dropna().astype(str):
+        title = title.strip()
+        if not title or title.lower() == 'nan':
+            continue
+        rows[title] = 1 if title in cnvd_titles else 0
+    return list(rows.items())
+
+def extract(workers=None):
     logger.info("=== 开始提取 CNVD 训练数据 ===")
     
     if not os.path.exists(REPORT_DIR):
         logger.error(f"Report directory not found: {REPORT_DIR}")
         return
 
-    # Find all _analysis.xlsx files in all subdirectories of output
-    # Pattern: output/YYYYMMDD_HHMMSS/ai_reports/*_analysis.xlsx
-    search_pattern = os.path.join(REPORT_DIR, "**", "*_analysis.xlsx")
-    files = glob.glob(search_pattern, recursive=True)
+    # Find all analysis reports (xlsx / jsonl.gz / parquet / dataset records) via the output manifest
+    manifest = OutputManifest(REPORT_DIR).ensure()
+    files = [entry["path"] for entry in manifest.query(kind="analysis")]
     
     logger.info(f"Found {len(files)} analysis reports.")
     
-    data = []
-    
-    for file_path in files:
-        try:
-            # Read '资产分析' sheet (contains DeepSeek's judgment)
-            # Or 'CNVD候选' sheet (contains positives)
-            
-            # Let's read '资产分析' first, it should have all valid assets and their status
-            # Actually, reporter.py saves:
-            # Sheet "资产分析": Valid assets with analysis
-            # Sheet "CNVD候选": Subset of above
-            
-            # We want:
-            # Positives (Label 1): Assets in "CNVD候选"
-            # Negatives (Label 0): Assets in "资产分析" but NOT in "CNVD候选"
-            
-            # Read both sheets
-            xls = pd.ExcelFile(file_path)
-            
-            # Debug print sheet names
-            # logger.info(f"{os.path.basename(file_path)} sheets: {xls.sheet_names}")
-            
-            # Check for various sheet names
-            sheet_map = {name.strip(): name for name in xls.sheet_names}
-            
-            # Find '资产分析' (Asset Analysis) sheet
-            valid_sheet_name = None
-            for key in ['资产分析', 'Valid Assets', 'Sheet1']:
-                if key in sheet_map:
-                    valid_sheet_name = sheet_map[key]
-                    break
-            
-            if not valid_sheet_name:
-                continue
-                
-            df_all_valid = pd.read_excel(xls, valid_sheet_name)
-            
-            cnvd_titles = set()
-            # Try matching exact sheet name "CNVD候选" or "CNVD 候选"
-            # reporter.py uses "CNVD候选"
-            cnvd_sheet = next((s for s in xls.sheet_names if "CNVD" in s), None)
-            
-            if cnvd_sheet:
-                df_cnvd = pd.read_excel(xls, cnvd_sheet)
-                # Look for 'title' column, or maybe '标题'?
-                # Assuming 'title' as per reporter.py
-                title_col = next((c for c in df_cnvd.columns if 'title' in str(c).lower() or '标题' in str(c)), None)
-                if title_col:
-                    cnvd_titles = set(df_cnvd[title_col].dropna().astype(str).tolist())
-            
-            # Find title column in valid sheet
-            title_col_valid = next((c for c in df_all_valid.columns if 'title' in str(c).lower() or '标题' in str(c)), None)
-            
-            if not title_col_valid:
-                # Try finding column by content? No, risky.
-                continue
-                
-            for _, row in df_all_valid.iterrows():
-                title = str(row.get(title_col_valid, '')).strip()
-                if not title or title.lower() == 'nan':
-                    continue
-                    
-                label = 1 if title in cnvd_titles else 0
-                
-                data.append({
-                    'title': title,
-                    'label': label,
-                    'source': os.path.basename(file_path)
-                })
-                
-        except Exception as e:
-            logger.warning(f"Error reading {os.path.basename(file_path)}: {e}")
+    # 进程池并行解析 + 按文件 mtime 缓存，同一标题以较新的报告为准
+    merged = parallel_extract.run("cnvd", [(f, [f]) for f in files], extract_file, workers, keep="last")
 
-    if not data:
+    if not merged:
         logger.warning("No data extracted.")
         return
 
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
-    # Deduplicate
-    df.drop_duplicates(subset=['title'], keep='last', inplace=True)
-    
-    # Save
-    df.to_csv(DATASET_FILE, index=False, encoding='utf-8-sig')
+    # Append to the sample store (reason 记录来源报告)
+    added = sample_store.add_many("cnvd", ((title, label, os.path.basename(key)) for title, (label, key) in merged.items()),
+                                  "extract_cnvd")
+    positives = sum(1 for label, _ in merged.values() if label == 1)
     
-    logger.info(f"Extracted {len(df)} unique samples.")
-    logger.info(f"Positives (CNVD): {len(df[df.label==1])}")
-    logger.info(f"Negatives (Normal): {len(df[df.label==0])}")
-    logger.info(f"Dataset saved to {DATASET_FILE}")
+    logger.info(f"Extracted {len(merged)} unique samples.")
+    logger.info(f"Positives (CNVD): {positives}")
+    logger.info(f"Negatives (Normal): {len(merged) - positives}")
+    logger.info(f"Added {added} new or changed samples to {sample_store.STORE_FILE}")
 
 if __name__ == "__main__":
-    extract()
+    import argparse
+    parser = argparse.ArgumentParser(description="Extract the CNVD priority dataset from historical analysis reports")
+    parser.add_argument("--workers", type=int, default=Config.EXTRACT_WORKERS, help="Parser processes (1 = serial)")
+    args = parser.parse_args()
+    extract(workers=args.workers)
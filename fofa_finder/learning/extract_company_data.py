@@ -1,88 +1,177 @@
 # -*- coding: utf-8 -*-
+"""
+从运行日志与事件流中挖掘公司资质预判结果，追加到样本库
+
+日志与事件文件只会增长: 每个来源分别记录已处理到的字节偏移 (learning/.extract_cache/company_checkpoints.json)，
+重跑时只读取新增的尾部。inode 变化 (日志被轮转) 或文件变小 (被截断) 时从头重新读取；
+末尾写了一半的行留到下次处理。检查点在样本写入样本库之后才更新，中途中断时重读的部分由样本库去重。
+"""
 import re
 import os
-import pandas as pd
-import html
+import sys
+import json
+import argparse
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.modules.events import ELIGIBILITY
+from fofa_finder.learning import sample_store
 LOG_FILE = os.path.join(BASE_DIR, "fofa_finder", "output", "fofa_finder.log")
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "company_dataset.csv")
+EVENTS_FILE = os.path.join(BASE_DIR, "fofa_finder", "output", "events.jsonl")
+CHECKPOINT_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", ".extract_cache", "company_checkpoints.json")
 
-def extract():
-    if not os.path.exists(LOG_FILE):
-        print(f"Log file not found: {LOG_FILE}")
-        return
+# Patterns
+# [2026-02-13 17:37:13] INFO | Analyzer | 正在进行公司资质预判: 北京出行汽车服务有限公司
+START_PATTERN = re.compile(r"正在进行公司资质预判:\s*(.+)")
 
-    print(f"Scanning log file: {LOG_FILE}...")
-    
-    data = []
-    
-    # Patterns
-    # [2026-02-13 17:37:13] INFO | Analyzer | 正在进行公司资质预判: 北京出行汽车服务有限公司
-    start_pattern = re.compile(r"正在进行公司资质预判:\s*(.+)")
-    
-    # [2026-02-13 17:37:16] INFO | Analyzer | 资质预判结果: False - 公司名称为汽车服务公司...
-    result_pattern = re.compile(r"资质预判结果:\s*(True|False)\s*-\s*(.+)")
-    
-    current_company = None
-    
-    # Read with error ignoring for encoding safety
-    with open(LOG_FILE, 'r', encoding='utf-8', errors='ignore') as f:
+# [2026-02-13 17:37:16] INFO | Analyzer | 资质预判结果: False - 公司名称为汽车服务公司...
+RESULT_PATTERN = re.compile(r"资质预判结果:\s*(True|False)\s*-\s*(.+)")
+
+
+def load_checkpoints():
+    if not os.path.exists(CHECKPOINT_FILE):
+        return {}
+    try:
+        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {} # 检查点损坏时从头读取 (样本库去重，结果不变)
+
+
+def save_checkpoints(checkpoints):
+    os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
+    tmp_path = f"{CHECKPOINT_FILE}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoints, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, CHECKPOINT_FILE)
+
+
+def read_tail(path, checkpoint):
+    """
+    从检查点偏移处逐行读取新增内容 (str，已去除首尾空白)，读完后更新 checkpoint 中的 inode / size / offset
+    """
+    stat = os.stat(path)
+    offset = checkpoint.get("offset", 0)
+    if checkpoint.get("inode") != stat.st_ino or stat.st_size < offset:
+        if offset:
+            print(f"{os.path.basename(path)} was rotated or truncated, reading from the start")
+        offset = 0
+        checkpoint.pop("pending", None)
+    checkpoint["inode"] = stat.st_ino
+
+    with open(path, "rb") as f:
+        f.seek(offset)
         for line in f:
-            line = line.strip()
-            
-            # Check for start
-            start_match = start_pattern.search(line)
-            if start_match:
-                current_company = start_match.group(1).strip()
-                continue
-                
-            # Check for result (must have a current company pending)
-            if current_company:
-                result_match = result_pattern.search(line)
-                if result_match:
-                    eligible_str = result_match.group(1)
-                    reason = result_match.group(2).strip()
-                    
-                    label = 1 if eligible_str == 'True' else 0
-                    
-                    data.append({
-                        "company": current_company,
-                        "label": label,
-                        "reason": reason
-                    })
-                    
-                    # Reset
-                    current_company = None
-
-    if not data:
-        print("No company eligibility data found in logs.")
-        return
-
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
-    
-    # Remove duplicates (same company might be checked multiple times)
-    # Keep the last judgment
-    df.drop_duplicates(subset=['company'], keep='last', inplace=True)
-    
-    print(f"Extracted {len(df)} unique samples.")
-    
-    # Save/Append
-    if os.path.exists(DATASET_FILE):
-        print("Appending to existing dataset...")
-        existing_df = pd.read_csv(DATASET_FILE)
-        combined_df = pd.concat([existing_df, df], ignore_index=True)
-        combined_df.drop_duplicates(subset=['company'], keep='last', inplace=True)
-        combined_df.to_csv(DATASET_FILE, index=False, encoding='utf-8-sig')
+            if not line.endswith(b"\n"):
+                break # 正在写入的半行
+            offset += len(line)
+            # Decode with error ignoring for encoding safety
+            yield line.decode("utf-8", errors="ignore").strip()
+        checkpoint["offset"] = offset
+        checkpoint["size"] = os.fstat(f.fileno()).st_size
+
+
+def extract_from_events(checkpoint):
+    """
+    从结构化事件流读取 DeepSeek 资质预判结果 (逐行 JSON，无需正则与上下文配对)
+    本地模型 / 解析失败 / API 错误产生的结果不作为训练标签
+    """
+    print(f"Reading event stream: {EVENTS_FILE} (from byte {checkpoint.get('offset', 0)})...")
+    data = []
+    for line in read_tail(EVENTS_FILE, checkpoint):
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("event") != ELIGIBILITY or record.get("source") != "deepseek":
+            continue
+        data.append((record["company"], 1 if record.get("eligible") else 0, record.get("reason", "")))
+    return data
+
+
+def extract_from_log(checkpoint):
+    """
+    正则扫描文本日志 (事件流出现之前、或关闭 EVENTS_ENABLED 后的结果只在日志中)
+    尾部停在 "正在预判" 与 "预判结果" 之间时，待配对的公司记在检查点 (pending) 中
+    """
+    print(f"Scanning log file: {LOG_FILE} (from byte {checkpoint.get('offset', 0)})...")
+    data = []
+    current_company = checkpoint.get("pending")
+    for line in read_tail(LOG_FILE, checkpoint):
+        # Check for start
+        start_match = START_PATTERN.search(line)
+        if start_match:
+            current_company = start_match.group(1).strip()
+            continue
+
+        # Check for result (must have a current company pending)
+        if current_company:
+            result_match = RESULT_PATTERN.search(line)
+            if result_match:
+                label = 1 if result_match.group(1) == 'True' else 0
+                data.append((current_company, label, result_match.group(2).strip()))
+                # Reset
+                current_company = None
+    checkpoint["pending"] = current_company
+    return data
+
+
+def extract_source(source, path, mine, checkpoints, full=False):
+    """
+    挖掘一个来源新增的尾部并写入样本库，返回新增样本数
+    """
+    if full:
+        checkpoints[source] = {}
+    checkpoint = checkpoints.setdefault(source, {})
+    data = mine(checkpoint)
+
+    added = 0
+    if data:
+        # 同一公司在本段中被多次预判时以最后一次为准
+        latest = {}
+        for company, label, reason in data:
+            latest.pop(company, None)
+            latest[company] = (company, label, reason)
+        print(f"Extracted {len(latest)} unique samples from {len(data)} new results.")
+
+        # Append to the sample store (标签与库中当前一致的公司不重复写入)
+        added = sample_store.add_many("company", latest.values(), source)
+        print(f"Added {added} new or changed samples to {sample_store.STORE_FILE}")
+        print("\nSample Data:")
+        for company, label, reason in list(latest.values())[:5]:
+            print(f"  [{label}] {company} - {reason}")
     else:
-        print("Creating new dataset...")
-        df.to_csv(DATASET_FILE, index=False, encoding='utf-8-sig')
-        
-    print(f"Dataset saved to {DATASET_FILE}")
-    print("\nSample Data:")
-    print(df.head())
+        print(f"No new company eligibility data found in {os.path.basename(path)}.")
+
+    # 样本写入后才推进检查点
+    save_checkpoints(checkpoints)
+    print(f"Checkpoint: {source} offset {checkpoint['offset']} / {checkpoint['size']} bytes")
+    return added
+
+
+def extract(full=False):
+    """
+    只处理上次运行之后新增的日志行与事件；full=True 时忽略检查点从头挖掘
+    文本日志与事件流各自记录检查点，都会挖掘 (事件流出现之前、或关闭 EVENTS_ENABLED 后的结果只在日志中)
+    """
+    checkpoints = load_checkpoints()
+    found = False
+    # 先日志后事件流: 同一公司两处都有记录时以事件流 (无需上下文配对) 的结论为准
+    for source, path, mine in (("log", LOG_FILE, extract_from_log), ("events", EVENTS_FILE, extract_from_events)):
+        if not os.path.exists(path):
+            continue
+        found = True
+        extract_source(source, path, mine, checkpoints, full)
+    if not found:
+        print(f"Log file not found: {LOG_FILE}")
+
 
 if __name__ == "__main__":
-    extract()
+    parser = argparse.ArgumentParser(description="Mine DeepSeek eligibility results from the event stream / log into the sample store")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and re-read the whole file")
+    args = parser.parse_args()
+    extract(full=args.full)
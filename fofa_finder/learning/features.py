@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+文本特征 (在线模型与线性模型共用)
+
+字符 n-gram 特征哈希: 不需要词表，任意新文本都能直接映射到固定维度，
+模型文件只保存权重，增量更新 / 加载都不依赖训练时的语料
+"""
+import re
+import html
+
+
+def clean_text(text):
+    """
+    解码 HTML 实体 (例如 &#20013; -> 中) 并合并多余空白
+    """
+    if not isinstance(text, str):
+        return ""
+    return re.sub(r'\s+', ' ', html.unescape(text)).strip()
+
+
+def char_hashing_vectorizer(n_features=2 ** 18, ngram_range=(2, 4)):
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    return HashingVectorizer(analyzer='char', ngram_range=ngram_range, n_features=n_features,
+                             alternate_sign=False, norm='l2', preprocessor=clean_text)
@@ -1,16 +1,18 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "dataset.csv")
+sys.path.append(BASE_DIR)
+from fofa_finder.learning import sample_store
 
 def inspect():
-    if not os.path.exists(DATASET_FILE):
+    df = sample_store.frame("local")
+    if df.empty:
         print("Dataset not found")
         return
         
-    df = pd.read_csv(DATASET_FILE)
     print(f"Total samples: {len(df)}")
     
     keywords = ["404", "nginx", "VPN", "后台", "管理"]
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑的线性推理模型 (RandomForest 的替代方案)
+
+字符 n-gram 特征哈希 + 逻辑回归 / 线性 SVM，训练后只保留 float32 稀疏权重向量:
+    - 模型文件通常只有几百 KB (100 棵树的随机森林为数十 MB)，joblib.load 几乎不耗时
+    - 推理是一次稀疏矩阵乘法，单条与批量预测都远快于遍历 100 棵树
+
+训练脚本通过 --model linear 生成 <model>_linear.pkl，Config.LOCAL_MODEL_FAMILY = 'linear' 时由 LocalEngine 加载
+"""
+import numpy as np
+
+from fofa_finder.learning.features import char_hashing_vectorizer
+
+FAMILIES = ("forest", "linear")
+
+
+class LinearTextModel:
+    """
+    二分类线性文本模型，接口与 sklearn Pipeline 一致 (fit / predict / predict_proba / classes_)
+    loss: 'logistic' (LogisticRegression，概率可直接使用) 或 'hinge' (LinearSVC，概率为 sigmoid 近似)
+    """
+    def __init__(self, n_features=2 ** 20, ngram_range=(2, 4), loss='logistic', C=1.0, class_weight=None):
+        self.vectorizer = char_hashing_vectorizer(n_features, ngram_range)
+        self.loss = loss
+        self.C = C
+        self.class_weight = class_weight
+        self.classes_ = np.array([0, 1])
+        self.weights = None # scipy.sparse csc (n_features x 1, float32)，只存非零权重
+        self.intercept = np.float32(0.0)
+
+    def _estimator(self):
+        if self.loss == 'hinge':
+            from sklearn.svm import LinearSVC
+            return LinearSVC(C=self.C, class_weight=self.class_weight)
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(C=self.C, class_weight=self.class_weight, solver='liblinear', max_iter=1000)
+
+    def fit(self, texts, labels):
+        return self.fit_matrix(self.vectorizer.transform([str(t) for t in texts]), labels)
+
+    def fit_matrix(self, X, labels):
+        """
+        在已向量化的特征矩阵上训练 (X 须由 self.vectorizer 生成，learning/training.py 的特征缓存使用)
+        """
+        from scipy import sparse
+
+        estimator = self._estimator().fit(X, np.asarray(labels, dtype=int))
+        coef = estimator.coef_.ravel().astype(np.float32)
+        self.weights = sparse.csc_matrix(coef.reshape(-1, 1))
+        self.intercept = np.float32(estimator.intercept_[0])
+        return self
+
+    def decision_function(self, texts):
+        X = self.vectorizer.transform([str(t) for t in texts]).astype(np.float32)
+        return (X @ self.weights).toarray().ravel() + self.intercept
+
+    def predict(self, texts):
+        return self.classes_[(self.decision_function(texts) > 0).astype(int)]
+
+    def predict_proba(self, texts):
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(texts)))
+        return np.column_stack([1.0 - positive, positive])
+
+    @property
+    def nnz(self):
+        return 0 if self.weights is None else int(self.weights.nnz)
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+内存映射模型格式 (<model>_mmap/ 目录)
+
+joblib.load 会把整个模型反序列化到每个进程的私有内存中；本格式把大数组
+(TF-IDF 词表与 idf、随机森林的全部树节点、线性模型权重) 存为未压缩的 .npy，
+加载时用 np.load(mmap_mode='r') 打开:
+    - 加载几乎不耗时 (只读取 meta.json 并建立映射)
+    - 多个进程 / fork 出的 worker 通过操作系统页缓存共享同一份只读内存
+
+目录结构:
+    meta.json                 模型类型、向量化参数、类别等小字段
+    *.npy                     大数组
+
+支持: TF-IDF + RandomForest Pipeline (train_*.py 默认)、LinearTextModel、OnlineClassifier
+导出: python fofa_finder/learning/mmap_model.py fofa_finder/learning/company_model.pkl
+      python fofa_finder/learning/mmap_model.py --all
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.modules.local_engine import mmap_path
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+CHUNK_SIZE = 256 # 随机森林推理时每次展开为稠密矩阵的样本数
+
+# 导出时保留的 TfidfVectorizer 参数 (均为 JSON 可序列化的简单值)
+TFIDF_PARAMS = ("analyzer", "ngram_range", "lowercase", "strip_accents", "token_pattern",
+                "binary", "norm", "use_idf", "smooth_idf", "sublinear_tf")
+
+
+# ------------------------------------------------------------------ 导出
+
+def _forest_arrays(pipeline):
+    tfidf = pipeline.steps[0][1]
+    forest = pipeline.steps[-1][1]
+    params = tfidf.get_params()
+    if params["analyzer"] not in ("char", "char_wb", "word") or params["preprocessor"] or params["tokenizer"]:
+        raise ValueError("仅支持内置 analyzer 且未自定义 preprocessor / tokenizer 的 TfidfVectorizer")
+
+    terms = sorted(tfidf.vocabulary_)
+    arrays = {
+        "vocab_terms": np.array(terms),
+        "vocab_index": np.array([tfidf.vocabulary_[t] for t in terms], dtype=np.int32),
+    }
+    if tfidf.use_idf:
+        arrays["idf"] = tfidf.idf_.astype(np.float64)
+
+    # 所有树的节点拼接为一组数组，子节点编号加上所在树的偏移量
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        roots.append(offset)
+        is_leaf = tree.children_left == -1
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        feature.append(tree.feature)
+        threshold.append(tree.threshold)
+        proba = tree.value[:, 0, :]
+        value.append(proba / np.maximum(proba.sum(axis=1, keepdims=True), 1e-12))
+        offset += tree.node_count
+
+    arrays.update({
+        "children_left": np.concatenate(left).astype(np.int32),
+        "children_right": np.concatenate(right).astype(np.int32),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "value": np.concatenate(value).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+    })
+    meta = {
+        "type": "forest",
+        "classes": [int(c) for c in forest.classes_],
+        "n_features": len(tfidf.vocabulary_),
+        "vectorizer": {k: (list(params[k]) if k == "ngram_range" else params[k]) for k in TFIDF_PARAMS},
+    }
+    return meta, arrays
+
+
+def _linear_arrays(model):
+    vectorizer = model.vectorizer
+    if hasattr(model, "weights"): # LinearTextModel
+        weights = model.weights.toarray().ravel()
+        intercept = float(model.intercept)
+    else: # OnlineClassifier (SGDClassifier)
+        weights = model.clf.coef_.ravel()
+        intercept = float(model.clf.intercept_[0])
+    meta = {
+        "type": "linear",
+        "classes": [int(c) for c in model.classes_],
+        "n_features": int(vectorizer.n_features),
+        "ngram_range": list(vectorizer.ngram_range),
+        "intercept": intercept,
+    }
+    return meta, {"weights": weights.astype(np.float32)}
+
+
+def export(model, out_dir):
+    """
+    导出为内存映射目录 (先写临时目录再整体替换，加载方不会读到写了一半的文件)，返回 out_dir
+    """
+    if hasattr(model, "steps"):
+        meta, arrays = _forest_arrays(model)
+    elif hasattr(model, "vectorizer"):
+        meta, arrays = _linear_arrays(model)
+    else:
+        raise ValueError(f"不支持的模型类型: {type(model).__name__}")
+    meta["format"] = FORMAT_VERSION
+    meta["arrays"] = sorted(arrays)
+
+    out_dir = out_dir.rstrip(os.sep)
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    old_dir = f"{out_dir}.old-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, name + ".npy"), np.ascontiguousarray(array), allow_pickle=False)
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        # 目录不能原子覆盖: 旧目录先改名，新目录就位后再删除 (中间失败时 LocalEngine 保留已加载的模型)
+        if os.path.exists(out_dir):
+            os.replace(out_dir, old_dir)
+        os.replace(tmp_dir, out_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return out_dir
+
+
+# ------------------------------------------------------------------ 加载与推理
+
+class _MmapModel:
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.classes_ = np.array(meta["classes"])
+        for name in meta["arrays"]:
+            setattr(self, name, np.load(os.path.join(path, name + ".npy"), mmap_mode='r', allow_pickle=False))
+
+    def predict(self, texts):
+        return self.classes_[np.argmax(self.predict_proba(texts), axis=1)]
+
+
+class MmapForest(_MmapModel):
+    """
+    TF-IDF + 随机森林的内存映射实现，预测结果与原 Pipeline 一致
+    """
+    def __init__(self, path, meta):
+        super().__init__(path, meta)
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        params = dict(meta["vectorizer"], ngram_range=tuple(meta["vectorizer"]["ngram_range"]))
+        self._analyze = TfidfVectorizer(**params).build_analyzer()
+        self._params = params
+
+    def transform(self, texts):
+        from scipy import sparse
+        from sklearn.preprocessing import normalize
+
+        # 所有文本的 n-gram 一次性在有序词表中二分查找，重复 (行, 列) 在构造 csr 时自动累加为词频
+        grams, rows = [], []
+        for i, text in enumerate(texts):
+            found = self._analyze(str(text))
+            grams.extend(found)
+            rows.extend([i] * len(found))
+
+        shape = (len(texts), self.meta["n_features"])
+        X = sparse.csr_matrix(shape, dtype=np.float64)
+        if grams:
+            grams, rows = np.array(grams), np.array(rows)
+            pos = np.minimum(np.searchsorted(self.vocab_terms, grams), len(self.vocab_terms) - 1)
+            hit = self.vocab_terms[pos] == grams
+            if hit.any():
+                X = sparse.csr_matrix((np.ones(int(hit.sum())), (rows[hit], self.vocab_index[pos[hit]])), shape=shape)
+                X.sum_duplicates()
+        if self._params["binary"]:
+            X.data[:] = 1
+        if self._params["sublinear_tf"]:
+            np.log(X.data, X.data)
+            X.data += 1
+        if self._params["use_idf"]:
+            X = X.multiply(np.asarray(self.idf)).tocsr()
+        if self._params["norm"]:
+            X = normalize(X, norm=self._params["norm"], copy=False)
+        return X
+
+    def predict_proba(self, texts):
+        X = self.transform(texts)
+        n_trees = len(self.roots)
+        result = np.empty((X.shape[0], len(self.classes_)))
+        for start in range(0, X.shape[0], CHUNK_SIZE):
+            # 与 sklearn 一致: 按 float32 比较分裂阈值
+            dense = X[start:start + CHUNK_SIZE].toarray().astype(np.float32)
+            n = dense.shape[0]
+            # 所有 (样本, 树) 组合同时沿树下降，循环次数等于最大树深
+            node = np.tile(np.asarray(self.roots), n)
+            sample = np.repeat(np.arange(n), n_trees)
+            active = np.arange(node.size)
+            while active.size:
+                current = node[active]
+                left = self.children_left[current]
+                inner = left != -1
+                active, current, left = active[inner], current[inner], left[inner]
+                if not active.size:
+                    break
+                go_left = dense[sample[active], self.feature[current]] <= self.threshold[current]
+                node[active] = np.where(go_left, left, self.children_right[current])
+            result[start:start + n] = self.value[node].reshape(n, n_trees, -1).mean(axis=1)
+        return result
+
+
+class MmapLinear(_MmapModel):
+    """
+    特征哈希 + 线性模型 (LinearTextModel / OnlineClassifier) 的内存映射实现
+    """
+    def __init__(self, path, meta):
+        super().__init__(path, meta)
+        from fofa_finder.learning.features import char_hashing_vectorizer
+
+        self.vectorizer = char_hashing_vectorizer(meta["n_features"], tuple(meta["ngram_range"]))
+        self.intercept = meta["intercept"]
+
+    def decision_function(self, texts):
+        X = self.vectorizer.transform([str(t) for t in texts])
+        return X.dot(self.weights) + self.intercept
+
+    def predict(self, texts):
+        return self.classes_[(self.decision_function(texts) > 0).astype(int)]
+
+    def predict_proba(self, texts):
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(texts)))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def load(path):
+    """
+    打开内存映射模型目录
+    """
+    with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"不支持的模型格式版本: {meta.get('format')}")
+    return {"forest": MmapForest, "linear": MmapLinear}[meta["type"]](path, meta)
+
+
+def export_file(model_file):
+    """
+    把已发布的 .pkl 模型导出到同目录的 <model>_mmap/
+    """
+    import joblib
+
+    return export(joblib.load(model_file), mmap_path(model_file))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export pickled models to the memory-mapped format")
+    parser.add_argument("models", nargs="*", help="Model .pkl files to export")
+    parser.add_argument("--all", action="store_true", help="Export every local model found under fofa_finder/learning")
+    args = parser.parse_args()
+
+    # 通过包路径导入，保证类路径一致
+    from fofa_finder.learning import mmap_model
+    from fofa_finder.modules import local_engine
+
+    files = list(args.models)
+    if args.all:
+        for base in (local_engine.MODEL_PATH, local_engine.COMPANY_MODEL_PATH, local_engine.CNVD_MODEL_PATH):
+            for family in ("forest", "linear", "online"):
+                candidate = local_engine.family_path(base, family)
+                if os.path.exists(candidate):
+                    files.append(candidate)
+    if not files:
+        parser.error("no model files given (pass paths or --all)")
+    for model_file in files:
+        print(f"{model_file} -> {mmap_model.export_file(model_file)}")
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+模型文件的原子发布
+
+训练脚本写入 <model>.pkl.tmp-<pid> 后 os.replace 到正式路径:
+正在运行的 LocalEngine 只会看到旧文件或完整的新文件，不会读到写了一半的 pkl
+"""
+import os
+
+
+def publish(model, path):
+    """
+    原子写入模型文件 (同目录临时文件 + os.replace)，返回 path
+    """
+    import joblib
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        joblib.dump(model, tmp_path)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
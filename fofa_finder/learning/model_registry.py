@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+模型注册表 (learning/registry/)
+
+目录结构:
+    runs.jsonl                          每次训练一行 (含未进入注册表的在线模型等)
+    <kind>/<family>/CURRENT             当前版本号 (临时文件 + os.replace 原子切换)
+    <kind>/<family>/v0003/model.pkl     版本化的模型文件，发布后不再修改
+    <kind>/<family>/v0003/meta.json     元数据: 版本、创建时间、数据集哈希、指标、模型大小
+    <kind>/<family>/v0003/model_mmap/   内存映射导出 (Config.LOCAL_MODEL_MMAP 开启时)
+
+kind: local (资产有效性) / company (公司资质) / cnvd (CNVD 重点)
+register() 写完版本目录后才切换 CURRENT，并把模型硬链接到旧路径 (company_model.pkl 等) 以兼容 verify_*.py；
+LocalEngine 跟随 CURRENT (或 Config.LOCAL_MODEL_PINS 固定的版本)，推理结论中记录所用版本。
+在线模型 (online_model.py) 毫秒级频繁更新，不进入注册表。
+
+    python fofa_finder/learning/model_registry.py versions --kind company
+    python fofa_finder/learning/model_registry.py rollback --kind company [--to v0002]
+    python fofa_finder/learning/model_registry.py runs --kind company
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.config import Config
+from fofa_finder.modules import local_engine
+from fofa_finder.modules.logger import setup_logger
+from fofa_finder.learning.model_io import publish
+
+logger = setup_logger("Registry")
+
+KINDS = ("local", "company", "cnvd")
+ARTIFACT = "model.pkl"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+
+
+def _root():
+    # 每次调用时读取 LocalEngine 的模块变量 (基准测试会替换注册表目录)
+    return local_engine.REGISTRY_DIR
+
+
+def _family_dir(kind, family):
+    return os.path.join(_root(), kind, family)
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def artifact_size(path):
+    """
+    模型文件大小 (内存映射导出目录为目录内文件之和)
+    """
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+# ------------------------------------------------------------------ 训练记录
+
+def record(kind, family, path, **metrics):
+    """
+    向 runs.jsonl 追加一条训练记录，返回该记录
+    """
+    entry = {
+        "kind": kind,
+        "family": family,
+        "path": os.path.relpath(path, BASE_DIR),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "size_bytes": artifact_size(path),
+    }
+    entry.update(metrics)
+    os.makedirs(_root(), exist_ok=True)
+    with open(os.path.join(_root(), "runs.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return entry
+
+
+def history(kind=None, family=None):
+    """
+    按时间顺序返回训练记录
+    """
+    runs_file = os.path.join(_root(), "runs.jsonl")
+    if not os.path.exists(runs_file):
+        return []
+    entries = []
+    with open(runs_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue # 写入中断留下的半行
+            if (kind is None or entry.get("kind") == kind) and (family is None or entry.get("family") == family):
+                entries.append(entry)
+    return entries
+
+
+# ------------------------------------------------------------------ 版本
+
+def versions(kind, family):
+    """
+    已发布的版本号 (由旧到新)，不含写了一半的版本目录
+    """
+    family_dir = _family_dir(kind, family)
+    if not os.path.isdir(family_dir):
+        return []
+    return sorted(name for name in os.listdir(family_dir)
+                  if name.startswith("v") and name[1:].isdigit()
+                  and os.path.exists(os.path.join(family_dir, name, META_FILE)))
+
+
+def current(kind, family):
+    """
+    CURRENT 指向的版本号，尚无版本时返回 None
+    """
+    path = local_engine.registry_artifact(kind, family)
+    return os.path.basename(os.path.dirname(path)) if path else None
+
+
+def manifest(kind, family, version=None):
+    """
+    某个版本 (默认当前版本) 的元数据
+    """
+    version = version or current(kind, family)
+    if not version:
+        return None
+    try:
+        with open(os.path.join(_family_dir(kind, family), version, META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _allocate(family_dir):
+    # os.mkdir 在目录已存在时失败，两个训练进程同时发布也不会拿到同一个版本号
+    os.makedirs(family_dir, exist_ok=True)
+    existing = [int(name[1:]) for name in os.listdir(family_dir) if name.startswith("v") and name[1:].isdigit()]
+    number = max(existing, default=0) + 1
+    while True:
+        version = f"v{number:04d}"
+        try:
+            os.mkdir(os.path.join(family_dir, version))
+            return version
+        except FileExistsError:
+            number += 1
+
+
+def _mirror(source, target):
+    """
+    把版本文件原子地链接 (不支持硬链接时复制) 到旧路径
+    """
+    tmp_path = f"{target}.tmp-{os.getpid()}"
+    try:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def set_current(kind, family, version):
+    """
+    原子切换 CURRENT 指针 (新版本发布 / 回滚)，并同步旧路径上的模型文件
+    """
+    meta = manifest(kind, family, version)
+    artifact = os.path.join(_family_dir(kind, family), version, ARTIFACT)
+    if not meta or not os.path.exists(artifact):
+        raise ValueError(f"版本不存在: {kind}/{family}@{version}")
+    _write_atomic(os.path.join(_family_dir(kind, family), CURRENT_FILE), version + "\n")
+    if meta.get("legacy_path"):
+        try:
+            _mirror(artifact, os.path.join(BASE_DIR, meta["legacy_path"]))
+        except OSError as e:
+            logger.warning(f"同步旧路径模型文件失败: {e}")
+    logger.info(f"{kind}/{family} 当前版本 -> {version}")
+    return meta
+
+
+def register(kind, family, model, legacy_path=None, **metrics):
+    """
+    发布新版本: 写入版本目录 (模型 + 可选的内存映射导出 + meta.json) 后切换 CURRENT，返回元数据
+    metrics: dataset_hash / samples / accuracy / cv_score / train_seconds 等，同时追加到 runs.jsonl
+    """
+    family_dir = _family_dir(kind, family)
+    version = _allocate(family_dir)
+    version_dir = os.path.join(family_dir, version)
+    try:
+        artifact = publish(model, os.path.join(version_dir, ARTIFACT))
+        if Config.LOCAL_MODEL_MMAP:
+            from fofa_finder.learning.mmap_model import export
+            try:
+                export(model, local_engine.mmap_path(artifact))
+            except ValueError as e:
+                logger.warning(f"内存映射导出跳过: {e}")
+        meta = {
+            "version": version,
+            "kind": kind,
+            "family": family,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "size_bytes": artifact_size(artifact),
+            "legacy_path": os.path.relpath(legacy_path, BASE_DIR) if legacy_path else None,
+        }
+        meta.update(metrics)
+        # meta.json 最后写入: versions() 只列出有 meta.json 的完整版本
+        _write_atomic(os.path.join(version_dir, META_FILE), json.dumps(meta, ensure_ascii=False, indent=2))
+    except Exception:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    set_current(kind, family, version)
+    record(kind, family, artifact, version=version, **metrics)
+    prune(kind, family)
+    return meta
+
+
+def rollback(kind, family, to=None):
+    """
+    回滚到指定版本，未指定时回到当前版本的上一个版本
+    """
+    available = versions(kind, family)
+    if to is None:
+        now = current(kind, family)
+        older = [v for v in available if now is None or v < now]
+        if not older:
+            raise ValueError(f"{kind}/{family} 没有可回滚的旧版本")
+        to = older[-1]
+    elif to not in available:
+        raise ValueError(f"版本不存在: {kind}/{family}@{to}")
+    return set_current(kind, family, to)
+
+
+def prune(kind, family, keep=None):
+    """
+    只保留最新的 keep 个版本 (Config.MODEL_REGISTRY_KEEP)，当前版本与固定版本不删除
+    """
+    keep = Config.MODEL_REGISTRY_KEEP if keep is None else keep
+    if not keep:
+        return []
+    protected = {current(kind, family), Config.LOCAL_MODEL_PINS.get(kind)}
+    removed = [v for v in versions(kind, family)[:-keep] if v not in protected]
+    for version in removed:
+        shutil.rmtree(os.path.join(_family_dir(kind, family), version), ignore_errors=True)
+    return removed
+
+
+def _format(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
+
+
+def _print_table(columns, rows):
+    print("  ".join(columns))
+    for row in rows:
+        print("  ".join(_format(row.get(c)) for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the model registry, switch or roll back versions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("versions", "rollback", "promote", "runs"):
+        p = sub.add_parser(name)
+        p.add_argument("--kind", choices=KINDS, required=name != "runs")
+        p.add_argument("--family", default=None if name == "runs" else Config.LOCAL_MODEL_FAMILY)
+        if name == "rollback":
+            p.add_argument("--to", help="Target version (default: the one before CURRENT)")
+        if name == "promote":
+            p.add_argument("version")
+        if name == "runs":
+            p.add_argument("--last", type=int, default=20, help="Show the N most recent runs")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "versions":
+            now = current(args.kind, args.family)
+            rows = []
+            for version in versions(args.kind, args.family):
+                meta = manifest(args.kind, args.family, version)
+                meta["current"] = "*" if version == now else ""
+                rows.append(meta)
+            _print_table(("current", "version", "created", "samples", "cv_score", "accuracy", "train_seconds", "size_bytes"), rows)
+        elif args.command == "rollback":
+            print(rollback(args.kind, args.family, args.to)["version"])
+        elif args.command == "promote":
+            print(set_current(args.kind, args.family, args.version)["version"])
+        else:
+            _print_table(("created", "kind", "family", "version", "samples", "cv_score", "accuracy", "train_seconds", "size_bytes", "search"),
+                         history(args.kind, args.family)[-args.last:])
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+增量 (在线) 学习: 字符 n-gram HashingVectorizer + SGDClassifier (log_loss)
+
+与 TF-IDF + RandomForest 全量重训练不同，特征哈希不需要词表，新标注到达时直接 partial_fit，
+毫秒级更新后原子发布到 <model>_online.pkl (例如 company_model_online.pkl)。
+Config.ONLINE_LEARNING 开启时:
+    - augment (每批一次) / Analyzer (按 Config.ONLINE_UPDATE_BATCH 攒批) 写入新标签后调用 update("company", ...)
+    - 扫描进程与后台学习进程可能同时更新同一个模型: 读取 -> partial_fit -> 发布 在 <model>_online.pkl.lock 文件锁内完成
+    - LocalEngine 优先加载 *_online.pkl，并通过 mtime 检查热加载
+    - 增量更新累计 Config.ONLINE_REBUILD_EVERY 条后，自动学习会从样本库全量重建一次 (纠正 SGD 漂移)
+
+手动全量重建: python fofa_finder/learning/online_model.py --kind company
+"""
+import os
+import sys
+import time
+import threading
+import argparse
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+# Add project root to sys.path to import config
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.modules.logger import setup_logger
+from fofa_finder.modules import local_engine
+from fofa_finder.modules.filelock import FileLock
+from fofa_finder.learning.model_io import publish
+from fofa_finder.learning.features import char_hashing_vectorizer
+from fofa_finder.learning import sample_store
+
+logger = setup_logger("OnlineModel")
+
+# kind -> LocalEngine 中对应的模型路径变量 (训练数据来自样本库 sample_store.py)
+KINDS = {
+    "local": "MODEL_PATH",
+    "company": "COMPANY_MODEL_PATH",
+    "cnvd": "CNVD_MODEL_PATH",
+}
+
+CLASSES = np.array([0, 1])
+
+_locks = {} # 模型路径 -> FileLock (跨进程，同时也是线程锁)
+_locks_guard = threading.Lock()
+_cache = {} # kind -> (st_mtime_ns, model)，同一进程内连续更新时免去重复反序列化
+
+
+class OnlineClassifier:
+    """
+    可增量更新的二分类器，接口与 sklearn Pipeline 一致 (predict / predict_proba / classes_)
+    """
+    def __init__(self, n_features=2 ** 18, ngram_range=(2, 4), alpha=1e-5):
+        self.vectorizer = char_hashing_vectorizer(n_features, ngram_range)
+        self.alpha = alpha
+        self.clf = self._new_clf()
+        self.samples = 0                # 累计参与训练的样本数
+        self.samples_since_rebuild = 0  # 上次全量重建后增量更新的样本数
+
+    def _new_clf(self):
+        return SGDClassifier(loss='log_loss', alpha=self.alpha, random_state=42)
+
+    @property
+    def classes_(self):
+        return self.clf.classes_
+
+    def transform(self, texts):
+        return self.vectorizer.transform([str(t) for t in texts])
+
+    def partial_fit(self, texts, labels, sample_weight=None):
+        self.clf.partial_fit(self.transform(texts), np.asarray(labels, dtype=int), classes=CLASSES,
+                             sample_weight=sample_weight)
+        self.samples += len(labels)
+        self.samples_since_rebuild += len(labels)
+        return self
+
+    def fit(self, texts, labels, epochs=5):
+        """
+        全量重建: 新的 SGD 模型按类别均衡权重多轮打乱训练
+        """
+        texts, labels = list(texts), np.asarray(labels, dtype=int)
+        X = self.transform(texts)
+        counts = np.bincount(labels, minlength=2)
+        weights = np.where(labels == 1, len(labels) / (2.0 * max(counts[1], 1)), len(labels) / (2.0 * max(counts[0], 1)))
+
+        self.clf = self._new_clf()
+        order = np.arange(len(labels))
+        rng = np.random.RandomState(42)
+        for _ in range(epochs):
+            rng.shuffle(order)
+            self.clf.partial_fit(X[order], labels[order], classes=CLASSES, sample_weight=weights[order])
+        self.samples = len(labels)
+        self.samples_since_rebuild = 0
+        return self
+
+    def predict(self, texts):
+        return self.clf.predict(self.transform(texts))
+
+    def predict_proba(self, texts):
+        return self.clf.predict_proba(self.transform(texts))
+
+
+def model_path(kind):
+    # 每次调用时读取 LocalEngine 的模块变量 (基准测试会替换模型路径)
+    return local_engine.online_path(getattr(local_engine, KINDS[kind]))
+
+
+def _lock_for(kind):
+    path = model_path(kind) + ".lock"
+    with _locks_guard:
+        if path not in _locks:
+            _locks[path] = FileLock(path)
+        return _locks[path]
+
+
+def load(kind):
+    """
+    读取已发布的在线模型，不存在时返回 None
+    """
+    import joblib
+
+    path = model_path(kind)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _cache.get(kind)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    model = joblib.load(path)
+    _cache[kind] = (mtime, model)
+    return model
+
+
+def _publish(kind, model):
+    path = publish(model, model_path(kind))
+    _cache[kind] = (os.stat(path).st_mtime_ns, model)
+
+
+def load_dataset(kind):
+    """
+    从样本库读取训练数据 (同一文本以最后一条标签为准)，返回 (texts, labels)
+    """
+    return sample_store.load(kind)
+
+
+def rebuild(kind, epochs=5):
+    """
+    从样本库全量重建在线模型并发布，返回模型 (数据不足时返回 None)
+    """
+    texts, labels = load_dataset(kind)
+    if len(set(labels)) < 2:
+        logger.warning(f"[{kind}] 数据集样本不足或只有单一类别 ({len(labels)} 条)，跳过重建")
+        return None
+
+    started = time.time()
+    with _lock_for(kind):
+        model = OnlineClassifier().fit(texts, labels, epochs=epochs)
+        _publish(kind, model)
+    logger.info(f"[{kind}] 在线模型已全量重建: {len(labels)} 条样本，耗时 {time.time() - started:.2f}s -> {model_path(kind)}")
+    return model
+
+
+def update(kind, texts, labels):
+    """
+    用一批新标签增量更新在线模型并原子发布
+    尚无在线模型时从样本库全量重建 (调用方应先把新标签写入样本库)
+    """
+    if not labels:
+        return None
+    with _lock_for(kind):
+        # 锁内重新读取: 另一个进程可能刚发布过新版本 (load 按 mtime 判断是否需要重新反序列化)
+        model = load(kind)
+        if model is not None:
+            started = time.time()
+            model.partial_fit(texts, labels)
+            _publish(kind, model)
+            logger.info(f"[{kind}] 在线模型增量更新 {len(labels)} 条样本 ({(time.time() - started) * 1000:.1f} ms)")
+            return model
+    return rebuild(kind)
+
+
+def needs_rebuild(kind, every=None):
+    """
+    增量更新累计样本数达到阈值时返回 True
+    """
+    from fofa_finder.config import Config
+
+    every = Config.ONLINE_REBUILD_EVERY if every is None else every
+    if not every:
+        return False
+    model = load(kind)
+    return model is None or model.samples_since_rebuild >= every
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the incremental (hashing + SGD) models from the sample store")
+    parser.add_argument("--kind", choices=sorted(KINDS) + ["all"], default="all")
+    parser.add_argument("--epochs", type=int, default=5)
+    args = parser.parse_args()
+
+    # 通过包路径导入，保证 pickle 中记录的是 fofa_finder.learning.online_model.OnlineClassifier 而不是 __main__
+    from fofa_finder.learning import online_model
+    for name in (sorted(KINDS) if args.kind == "all" else [args.kind]):
+        online_model.rebuild(name, epochs=args.epochs)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+历史报告的并行提取 (extract_cnvd_data.py / prepare_data.py 共用)
+
+- 每个任务 (一个分析报告，或成对的原始数据 + 分析报告) 在进程池中解析，只读取 title 列
+- 单个任务的提取结果按文件 (mtime, size) 缓存在 learning/.extract_cache/<name>.jsonl，
+  重跑时只解析新增或修改过的报告；数据集分片引用写入后不再变化，按引用本身缓存
+- 结果按完成顺序流式合并到 {文本: 标签} 中，按任务顺序决定重复文本以哪一份报告为准
+"""
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from fofa_finder.config import Config
+from fofa_finder.modules.logger import setup_logger
+from fofa_finder.modules.storage import parse_member_ref
+
+logger = setup_logger("Extract")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CACHE_DIR = os.path.join(BASE_DIR, "fofa_finder", "learning", ".extract_cache")
+
+
+def file_stamp(path):
+    """
+    缓存校验值: 普通文件为 [mtime_ns, size]，数据集分片引用为 [0, 长度] (内容不可变)，文件不存在时为 None
+    """
+    member = parse_member_ref(path)
+    if member:
+        return [0, member[2]]
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class ExtractCache:
+    """
+    单文件提取结果缓存 (JSONL，每行 {"key", "stamp", "rows"})
+    新结果逐行追加，中途中断也保留已完成的部分；同一 key 以最后一行为准，compact() 时整体重写
+    """
+    def __init__(self, name):
+        self.path = os.path.join(CACHE_DIR, f"{name}.jsonl")
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # 中断时留下的半行
+                    self.entries[entry["key"]] = entry
+
+    def get(self, key, stamp):
+        entry = self.entries.get(key)
+        if entry is not None and stamp is not None and entry["stamp"] == stamp:
+            return entry["rows"]
+        return None
+
+    def put(self, key, stamp, rows):
+        entry = {"key": key, "stamp": stamp, "rows": rows}
+        self.entries[key] = entry
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def compact(self, keys):
+        """
+        只保留本次仍存在的报告 (临时文件 + os.replace)
+        """
+        if not os.path.exists(self.path):
+            return
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key in keys:
+                if key in self.entries:
+                    f.write(json.dumps(self.entries[key], ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+def run(name, jobs, worker, workers=None, keep="last"):
+    """
+    jobs: [(key, paths)]，按报告顺序排列; worker(*paths) 返回 [(文本, 标签), ...] (须为模块级函数)，
+          返回 None 表示该报告无法提取 (不缓存，下次重试)
+    keep: 重复文本以 'last' (最后) 或 'first' (最先) 的报告为准
+    返回: {文本: (标签, key)}
+    """
+    workers = workers or Config.EXTRACT_WORKERS
+    cache = ExtractCache(name)
+    merged = {}
+    order = {}
+    stats = {"cached": 0, "parsed": 0, "failed": 0}
+
+    def merge(index, key, rows):
+        for text, label in rows:
+            previous = order.get(text)
+            if previous is None or (index >= previous if keep == "last" else index < previous):
+                order[text] = index
+                merged[text] = (label, key)
+
+    pending = []
+    for index, (key, paths) in enumerate(jobs):
+        stamp = [file_stamp(p) for p in paths]
+        rows = cache.get(key, stamp)
+        if rows is not None:
+            stats["cached"] += 1
+            merge(index, key, rows)
+        else:
+            pending.append((index, key, paths, stamp))
+    logger.info(f"[{name}] {len(jobs)} 个报告，缓存命中 {stats['cached']}，待解析 {len(pending)} (进程数: {workers})")
+
+    def collect(index, key, stamp, rows):
+        if rows is None:
+            stats["failed"] += 1
+            return
+        stats["parsed"] += 1
+        cache.put(key, stamp, rows)
+        merge(index, key, rows)
+        done = stats["parsed"] + stats["failed"]
+        if done % 500 == 0:
+            logger.info(f"[{name}] 已解析 {done}/{len(pending)}")
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(worker, *paths): (index, key, stamp) for index, key, paths, stamp in pending}
+            for future in as_completed(futures):
+                index, key, stamp = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    logger.warning(f"解析失败 {key}: {e}")
+                    rows = None
+                collect(index, key, stamp, rows)
+    else:
+        for index, key, paths, stamp in pending:
+            try:
+                rows = worker(*paths)
+            except Exception as e:
+                logger.warning(f"解析失败 {key}: {e}")
+                rows = None
+            collect(index, key, stamp, rows)
+
+    try:
+        cache.compact([key for key, _ in jobs])
+    except OSError as e:
+        logger.warning(f"整理提取缓存失败: {e}")
+    logger.info(f"[{name}] 解析 {stats['parsed']} 个，失败 {stats['failed']} 个，合并后 {len(merged)} 条不重复样本")
+    return merged
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
+import sys
 import pandas as pd
 import json
 import random
@@ -8,101 +9,77 @@ from collections import Counter
 # Configuration
 # Dynamic path resolution to support WSL/Linux/Windows
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.modules.storage import read_table, VALID_TABLE
+from fofa_finder.modules.manifest import OutputManifest
+from fofa_finder.config import Config
+from fofa_finder.learning import parallel_extract, sample_store
 OUTPUT_DIR = os.path.join(BASE_DIR, "fofa_finder", "output")
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "dataset.csv")
 
-def scan_reports():
+def pair_raw_entry(analysis_entry, raw_entries):
     """
-    扫描 output 目录，寻找成对的 _raw.xlsx 和 _analysis.xlsx
+    为分析报告选择对应的原始数据: 优先同一会话，其次报告生成前最近的一份
+    """
+    same_session = [e for e in raw_entries if e.get("session") and e.get("session") == analysis_entry.get("session")]
+    if same_session:
+        return same_session[-1]
+    before = [e for e in raw_entries if e.get("mtime", 0) <= analysis_entry.get("mtime", 0)]
+    if before:
+        return before[-1]
+    return raw_entries[-1] if raw_entries else None
+
+def scan_reports(workers=None):
+    """
+    根据输出清单 (manifest.jsonl) 寻找成对的原始数据与分析报告，进程池并行提取 (按文件 mtime 缓存)
     """
-    dataset = []
-    
     if not os.path.exists(OUTPUT_DIR):
         print(f"Error: Output directory not found: {OUTPUT_DIR}")
         return []
         
-    print(f"Scanning {OUTPUT_DIR} for training data...")
+    print(f"Reading output manifest of {OUTPUT_DIR} for training data...")
+    manifest = OutputManifest(OUTPUT_DIR).ensure()
+    
+    raw_by_company = {}
+    for entry in sorted(manifest.query(kind="raw"), key=lambda e: e.get("mtime", 0)):
+        raw_by_company.setdefault(entry["company"], []).append(entry)
     
-    # Walk through all timestamped directories
-    for root, dirs, files in os.walk(OUTPUT_DIR):
-        if "ai_reports" in root: # We look into ai_reports folder for analyzed files
-            # Check for _analysis.xlsx files
-            for file in files:
-                if file.endswith("_analysis.xlsx"):
-                    analysis_path = os.path.join(root, file)
-                    company_name = file.replace("_analysis.xlsx", "")
-                    
-                    # Try to find corresponding raw file
-                    # Usually raw file is in the parent folder of ai_reports, or grandparent?
-                    # Structure: output/TIMESTAMP/ai_reports/Company_analysis.xlsx
-                    # Raw file: output/TIMESTAMP/Company_raw.xlsx (Maybe? Let's check logic in reporter.py)
-                    # Actually Reporter saves raw data to session_dir directly.
-                    # So raw path should be: root/../Company_raw.xlsx
-                    
-                    session_dir = os.path.dirname(root) # Go up one level
-                    raw_filename = f"{company_name}_raw.xlsx"
-                    raw_path = os.path.join(session_dir, raw_filename)
-                    
-                    if not os.path.exists(raw_path):
-                        # Try to find anywhere in session_dir
-                        possible_raw = os.path.join(session_dir, raw_filename)
-                        if not os.path.exists(possible_raw):
-                             # Maybe name sanitization changed something?
-                             # Let's just look for any *_raw.xlsx in session_dir that matches start
-                             pass
-                    
-                    if os.path.exists(raw_path):
-                        process_pair(raw_path, analysis_path, dataset)
-                    else:
-                        # print(f"Missing raw file for {company_name}")
-                        pass
-                        
-    return dataset
+    jobs = []
+    for analysis_entry in manifest.query(kind="analysis"):
+        raw_entry = pair_raw_entry(analysis_entry, raw_by_company.get(analysis_entry["company"], []))
+        if raw_entry:
+            paths = [raw_entry["path"], analysis_entry["path"]]
+            jobs.append(("|".join(paths), paths))
+    
+    # 同一标题以最先出现的报告为准
+    merged = parallel_extract.run("local", jobs, process_pair, workers, keep="first")
+    return [{"text": text, "label": label} for text, (label, _) in merged.items()]
 
-def process_pair(raw_path, analysis_path, dataset):
-    try:
-        # Read Raw Data (All Candidates)
-        df_raw = pd.read_excel(raw_path)
-        raw_titles = set()
-        if 'title' in df_raw.columns:
-            raw_titles = {str(t).strip() for t in df_raw['title'].dropna() if str(t).strip()}
-            
-        # Read Analysis Data (Valid Assets)
-        # Sheet 'Valid Assets' contains the positives
-        try:
-            df_valid = pd.read_excel(analysis_path, sheet_name='Valid Assets')
-            valid_titles = set()
-            if 'title' in df_valid.columns:
-                valid_titles = {str(t).strip() for t in df_valid['title'].dropna() if str(t).strip()}
-        except ValueError:
-            # Maybe old format or sheet missing
-            return
+def _titles(df):
+    if 'title' not in df.columns:
+        return set()
+    return {str(t).strip() for t in df['title'].dropna() if str(t).strip()}
 
-        # Labeling
-        # Positive: In Valid Assets
-        # Negative: In Raw but NOT in Valid Assets
-        
-        pos_count = 0
-        neg_count = 0
-        
-        for title in raw_titles:
-            # Simple cleaning
-            if len(title) < 2: continue
-            
-            if title in valid_titles:
-                dataset.append({"text": title, "label": 1})
-                pos_count += 1
-            else:
-                dataset.append({"text": title, "label": 0})
-                neg_count += 1
-                
-        # print(f"Processed {os.path.basename(raw_path)}: +{pos_count} / -{neg_count}")
+def process_pair(raw_path, analysis_path):
+    """
+    从一对原始数据 / 分析报告中提取 [(title, label)] (在进程池中执行，须为模块级函数)
+    Positive: In Valid Assets; Negative: In Raw but NOT in Valid Assets
+    """
+    # Read Raw Data (All Candidates), title column only
+    raw_titles = _titles(read_table(raw_path, columns=['title']))
         
-    except Exception as e:
-        print(f"Error processing {raw_path}: {e}")
+    # Read Analysis Data (Valid Assets)
+    try:
+        valid_titles = _titles(read_table(analysis_path, VALID_TABLE, columns=['title']))
+    except ValueError:
+        # Maybe old format or sheet missing
+        return []
+
+    # Simple cleaning: skip titles shorter than 2 characters
+    return [(title, 1 if title in valid_titles else 0) for title in sorted(raw_titles) if len(title) >= 2]
 
-def main():
-    dataset = scan_reports()
+def main(workers=None):
+    dataset = scan_reports(workers)
     
     if not dataset:
         print("No training data found! Please run some AI analysis tasks first.")
@@ -118,10 +95,14 @@ def main():
     print("\nDataset Balance:")
     print(counts)
     
-    # Save
-    df.to_csv(DATASET_FILE, index=False, encoding='utf-8')
-    print(f"\nSaved {len(df)} samples to {DATASET_FILE}")
+    # Append to the sample store
+    added = sample_store.add_many("local", zip(df['text'], df['label']), "prepare_data")
+    print(f"\nAdded {added} new or changed samples ({len(df)} extracted) to {sample_store.STORE_FILE}")
     print("Ready for training!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the asset validity dataset from paired raw / analysis reports")
+    parser.add_argument("--workers", type=int, default=Config.EXTRACT_WORKERS, help="Parser processes (1 = serial)")
+    args = parser.parse_args()
+    main(workers=args.workers)
\ No newline at end of file
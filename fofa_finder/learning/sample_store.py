@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+统一的标注样本库 (learning/samples.db，SQLite)
+
+三个模型的训练数据 (原 dataset.csv / company_dataset.csv / cnvd_dataset.csv) 存在同一张只追加的表中:
+    samples(id, kind, text, label, source, reason, created)
+    kind: local (资产有效性) / company (公司资质) / cnvd (CNVD 重点)
+    source: 写入方，例如 prepare_data / augment / analyzer / events / extract_cnvd
+
+- 写入只做 INSERT，与该文本当前标签相同的样本直接跳过 (重复提取不会让表膨胀)
+- 同一文本以最后写入的标签为准 (latest 视图)，历史标注保留在表中
+- (kind, text, id) 索引支撑按文本查询与 latest 视图；WAL 模式下扫描进程与后台学习进程可同时读写
+- 首次打开样本库时自动导入仍存在的旧 CSV (source = csv，每个文件只导入一次，记录在 imports 表)
+
+导出 / 查看: python fofa_finder/learning/sample_store.py stats
+            python fofa_finder/learning/sample_store.py export --kind company company_dataset.csv
+"""
+import os
+import sys
+import csv
+import time
+import sqlite3
+import argparse
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LEARNING_DIR = os.path.join(BASE_DIR, "fofa_finder", "learning")
+STORE_FILE = os.path.join(LEARNING_DIR, "samples.db")
+
+KINDS = ("local", "company", "cnvd")
+
+# kind -> (旧 CSV 数据集, 文本列)
+LEGACY_CSV = {
+    "local": (os.path.join(LEARNING_DIR, "dataset.csv"), "text"),
+    "company": (os.path.join(LEARNING_DIR, "company_dataset.csv"), "company"),
+    "cnvd": (os.path.join(LEARNING_DIR, "cnvd_dataset.csv"), "title"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    text TEXT NOT NULL,
+    label INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    reason TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_kind_text ON samples (kind, text, id);
+CREATE INDEX IF NOT EXISTS samples_source ON samples (source, created);
+CREATE VIEW IF NOT EXISTS latest AS
+    SELECT s.* FROM samples s
+    JOIN (SELECT MAX(id) AS id FROM samples GROUP BY kind, text) m ON s.id = m.id;
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+# 与该文本当前标签相同时不插入
+INSERT = """
+INSERT INTO samples (kind, text, label, source, reason, created)
+SELECT :kind, :text, :label, :source, :reason, :created
+WHERE COALESCE((SELECT label FROM samples WHERE kind = :kind AND text = :text ORDER BY id DESC LIMIT 1), -1) != :label
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def _connect():
+    # 每次调用打开新连接 (sqlite3 连接不能跨线程共享)，STORE_FILE 在调用时读取 (可被替换)
+    path = STORE_FILE
+    conn = sqlite3.connect(path, timeout=30)
+    with _init_lock:
+        if path not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            for kind in KINDS:
+                _import_legacy(conn, kind)
+            _initialized.add(path)
+    return conn
+
+
+def _rows(kind, rows, source, now):
+    if kind not in KINDS:
+        raise ValueError(f"未知的样本类型: {kind}")
+    for row in rows:
+        text = str(row[0]).strip()
+        if not text or text.lower() == 'nan':
+            continue
+        yield {"kind": kind, "text": text, "label": int(float(row[1])), "source": source,
+               "reason": row[2] if len(row) > 2 else None, "created": now}
+
+
+def add_many(kind, rows, source):
+    """
+    在一个事务中写入多条样本 rows: [(text, label)] 或 [(text, label, reason)]，返回实际新增的条数
+    """
+    conn = _connect()
+    try:
+        with conn:
+            before = conn.total_changes
+            conn.executemany(INSERT, _rows(kind, rows, source, time.time()))
+            return conn.total_changes - before
+    finally:
+        conn.close()
+
+
+def add(kind, text, label, source, reason=None):
+    """
+    写入一条样本，返回是否新增 (标签与当前一致时为 False)
+    """
+    return add_many(kind, [(text, label, reason)], source) > 0
+
+
+def _import_legacy(conn, kind):
+    path, column = LEGACY_CSV[kind]
+    if not os.path.exists(path):
+        return 0
+    # BEGIN IMMEDIATE: 多个进程同时首次打开样本库时只有一个执行导入
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM imports WHERE path = ?", (path,)).fetchone():
+            conn.rollback()
+            return 0
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            rows = [(r.get(column), r.get("label"), r.get("reason") or None) for r in csv.DictReader(f)
+                    if r.get(column) and r.get("label") not in (None, "")]
+        before = conn.total_changes
+        conn.executemany(INSERT, _rows(kind, rows, "csv", os.path.getmtime(path)))
+        added = conn.total_changes - before
+        conn.execute("INSERT INTO imports (path, kind, rows, created) VALUES (?, ?, ?, ?)", (path, kind, added, time.time()))
+        conn.commit()
+        return added
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def frame(kind, column="text", sources=None):
+    """
+    返回该类样本 (同一文本取最后一次标注) 的 DataFrame: [column, label, source, reason, created]
+    sources: 只取指定写入方的样本
+    """
+    import pandas as pd
+
+    conn = _connect()
+    try:
+        query = "SELECT text, label, source, reason, created FROM latest WHERE kind = ?"
+        params = [kind]
+        if sources:
+            query += f" AND source IN ({','.join('?' * len(sources))})"
+            params.extend(sources)
+        df = pd.read_sql_query(query + " ORDER BY id", conn, params=params)
+    finally:
+        conn.close()
+    return df.rename(columns={"text": column})
+
+
+def load(kind):
+    """
+    返回 (texts, labels)，同一文本取最后一次标注
+    """
+    df = frame(kind)
+    return df["text"].tolist(), df["label"].astype(int).tolist()
+
+
+def labeled(kind):
+    """
+    已有标注的文本集合
+    """
+    conn = _connect()
+    try:
+        return {row[0] for row in conn.execute("SELECT DISTINCT text FROM samples WHERE kind = ?", (kind,))}
+    finally:
+        conn.close()
+
+
+def lookup(kind, text):
+    """
+    某个文本的标注历史 (由旧到新)
+    """
+    conn = _connect()
+    try:
+        cursor = conn.execute("SELECT label, source, reason, created FROM samples WHERE kind = ? AND text = ? ORDER BY id",
+                              (kind, str(text).strip()))
+        return [dict(zip(("label", "source", "reason", "created"), row)) for row in cursor]
+    finally:
+        conn.close()
+
+
+def stats():
+    """
+    {kind: {"samples": 去重后样本数, "positives": 正样本数, "rows": 历史行数}}
+    """
+    conn = _connect()
+    try:
+        result = {}
+        for kind in KINDS:
+            samples, positives = conn.execute("SELECT COUNT(*), COALESCE(SUM(label), 0) FROM latest WHERE kind = ?", (kind,)).fetchone()
+            rows = conn.execute("SELECT COUNT(*) FROM samples WHERE kind = ?", (kind,)).fetchone()[0]
+            result[kind] = {"samples": samples, "positives": positives, "rows": rows}
+        return result
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.path.append(BASE_DIR)
+
+    parser = argparse.ArgumentParser(description="Inspect or export the labeled-sample store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    export = sub.add_parser("export", help="Write the latest label per text to a CSV file")
+    export.add_argument("--kind", choices=KINDS, required=True)
+    export.add_argument("output")
+    history = sub.add_parser("lookup", help="Show the labeling history of one text")
+    history.add_argument("--kind", choices=KINDS, required=True)
+    history.add_argument("text")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        for name, counts in stats().items():
+            print(f"{name:<8} samples={counts['samples']} positives={counts['positives']} rows={counts['rows']}")
+    elif args.command == "export":
+        df = frame(args.kind, LEGACY_CSV[args.kind][1])
+        df.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"Exported {len(df)} samples to {args.output}")
+    else:
+        for entry in lookup(args.kind, args.text):
+            print(entry)
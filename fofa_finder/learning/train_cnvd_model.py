@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
-import joblib
 import os
 import sys
 import logging
 import re
+import time
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
@@ -25,24 +25,31 @@ if not logger.handlers:
     logger.setLevel(logging.INFO)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "cnvd_dataset.csv")
 MODEL_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "cnvd_model.pkl")
 
+sys.path.append(BASE_DIR)
+from fofa_finder.learning.linear_model import FAMILIES, LinearTextModel
+from fofa_finder.modules.local_engine import family_path
+from fofa_finder.config import Config
+from fofa_finder.learning import model_registry, sample_store
+from fofa_finder.learning.training import dataset_hash, inference_ready, train_and_publish
+
+TFIDF_ARGS = {"ngram_range": (2, 5), "max_features": 5000}
+LINEAR_ARGS = {"ngram_range": (2, 5), "class_weight": 'balanced'}
+
 def clean_title(title):
     if not isinstance(title, str):
         return ""
     # Basic cleanup
     return title.strip()
 
-def train():
+def train(family="forest", search=False):
     logger.info("=== 开始训练 CNVD 重点资产识别模型 ===")
     
-    if not os.path.exists(DATASET_FILE):
-        logger.error(f"Dataset not found: {DATASET_FILE}")
+    df = sample_store.frame("cnvd", "title")[['title', 'label']]
+    if df.empty:
+        logger.error(f"No cnvd samples in {sample_store.STORE_FILE}. Run extract_cnvd_data.py first.")
         return
-        
-    df = pd.read_csv(DATASET_FILE)
-    df.dropna(subset=['title', 'label'], inplace=True)
     
     # Check data distribution
     df_neg = df[df.label==0]
@@ -56,6 +63,12 @@ def train():
         logger.warning("正样本太少 (<5)，无法训练有效模型。建议使用规则匹配代替。")
         return
 
+    if search:
+        # 交叉验证搜索不做过采样 (重复样本会跨折泄漏)，类别不均衡由搜索空间中的 class_weight 处理
+        train_and_publish("cnvd", family, df['title'], df['label'], family_path(MODEL_FILE, family),
+                          LINEAR_ARGS if family == "linear" else TFIDF_ARGS)
+        return
+
     # Upsample minority (Positives)
     if len(df_pos) < len(df_neg):
         logger.info("Upsampling positive class...")
@@ -76,23 +89,39 @@ def train():
     logger.info(f"Training on {len(X_train)} samples, testing on {len(X_test)} samples...")
     
     # Pipeline
-    pipeline = Pipeline([
-        ('tfidf', TfidfVectorizer(analyzer='char', ngram_range=(2, 5), max_features=5000)),
-        ('clf', RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced'))
-    ])
+    if family == "linear":
+        pipeline = LinearTextModel(**LINEAR_ARGS)
+    else:
+        pipeline = Pipeline([
+            ('tfidf', TfidfVectorizer(analyzer='char', **TFIDF_ARGS)),
+            ('clf', RandomForestClassifier(n_estimators=100, n_jobs=Config.TRAIN_N_JOBS, random_state=42, class_weight='balanced'))
+        ])
     
-    pipeline.fit(X_train, y_train)
+    started = time.time()
+    inference_ready(pipeline.fit(X_train, y_train))
+    train_seconds = time.time() - started
     
     # Evaluate
+    accuracy = None
     if len(X_test) > 0:
         y_pred = pipeline.predict(X_test)
+        accuracy = round(accuracy_score(y_test, y_pred), 4)
         logger.info("\nModel Evaluation:")
         logger.info(classification_report(y_test, y_pred))
-        logger.info(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
+        logger.info(f"Accuracy: {accuracy:.4f}")
         
-    # Save
-    joblib.dump(pipeline, MODEL_FILE)
-    logger.info(f"Model saved to {MODEL_FILE}")
+    # Save (新版本写入模型注册表并切换 CURRENT，旧路径同步为该版本)
+    meta = model_registry.register("cnvd", family, pipeline, family_path(MODEL_FILE, family), samples=len(df),
+                                   dataset_hash=dataset_hash(df['title'], df['label']),
+                                   accuracy=accuracy, train_seconds=round(train_seconds, 2), search=False)
+    logger.info(f"Model saved as cnvd/{family}@{meta['version']} -> {family_path(MODEL_FILE, family)}")
 
 if __name__ == "__main__":
-    train()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the local CNVD priority model")
+    parser.add_argument("--model", choices=FAMILIES, default="forest",
+                        help="forest: TF-IDF + RandomForest; linear: char hashing + logistic regression (*_linear.pkl)")
+    parser.add_argument("--search", action="store_true",
+                        help="Cross-validated hyperparameter search on all cores (cached features, see training.py)")
+    args = parser.parse_args()
+    train(args.model, search=args.search)
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
-import joblib
 import os
 import re
 from sklearn.model_selection import train_test_split
@@ -14,18 +13,28 @@ warnings.filterwarnings("ignore", category=UserWarning)
 
 import logging
 import sys
+import time
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(BASE_DIR)
 
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "company_dataset.csv")
 MODEL_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "company_model.pkl")
 
 from fofa_finder.modules.logger import setup_logger
+from fofa_finder.learning.linear_model import FAMILIES, LinearTextModel
+from fofa_finder.modules.local_engine import family_path
+from fofa_finder.config import Config
+from fofa_finder.learning import model_registry, sample_store
+from fofa_finder.learning.training import dataset_hash, inference_ready, train_and_publish
 
 logger = setup_logger("TrainModel")
 
+# Analyzer='char' is good for Chinese names.
+# ngram_range=(2, 4) captures "科技", "网络", "信息技术", "房地产" etc.
+TFIDF_ARGS = {"ngram_range": (2, 4), "max_features": 5000}
+LINEAR_ARGS = {"ngram_range": (2, 4)}
+
 def clean_company_name(name):
     if not isinstance(name, str):
         return ""
@@ -37,16 +46,19 @@ def clean_company_name(name):
 
 from sklearn.utils import resample
 
-def train():
-    if not os.path.exists(DATASET_FILE):
-        logger.error("Error: Dataset file not found! Run extract_company_data.py first.")
-        return
-        
+def train(family="forest", search=False):
     logger.info("Loading dataset...")
-    df = pd.read_csv(DATASET_FILE)
-    
-    # Drop NA
-    df.dropna(subset=['company', 'label'], inplace=True)
+    # 样本库中同一公司已按最后一次标注去重
+    df = sample_store.frame("company", "company")[['company', 'label']]
+    if df.empty:
+        logger.error("Error: No samples in the sample store! Run extract_company_data.py first.")
+        return
+
+    if search:
+        # 交叉验证搜索不做过采样 (重复样本会跨折泄漏)，类别不均衡由搜索空间中的 class_weight 处理
+        train_and_publish("company", family, df['company'], df['label'], family_path(MODEL_FILE, family),
+                          LINEAR_ARGS if family == "linear" else TFIDF_ARGS)
+        return
     
     # Handle Imbalance via Upsampling
     df_majority = df[df.label==0]
@@ -74,27 +86,41 @@ def train():
     logger.info(f"Training on {len(X_train)} samples, testing on {len(X_test)} samples...")
     
     # Build Pipeline: TF-IDF + Random Forest
-    # Analyzer='char' is good for Chinese names.
-    # ngram_range=(2, 4) captures "科技", "网络", "信息技术", "房地产" etc.
-    pipeline = Pipeline([
-        ('tfidf', TfidfVectorizer(analyzer='char', ngram_range=(2, 4), max_features=5000)),
-        ('clf', RandomForestClassifier(n_estimators=100, random_state=42))
-    ])
+    if family == "linear":
+        pipeline = LinearTextModel(**LINEAR_ARGS)
+    else:
+        pipeline = Pipeline([
+            ('tfidf', TfidfVectorizer(analyzer='char', **TFIDF_ARGS)),
+            ('clf', RandomForestClassifier(n_estimators=100, n_jobs=Config.TRAIN_N_JOBS, random_state=42))
+        ])
     
     # Train
-    pipeline.fit(X_train, y_train)
+    started = time.time()
+    inference_ready(pipeline.fit(X_train, y_train))
+    train_seconds = time.time() - started
     
     # Evaluate
+    accuracy = None
     if len(X_test) > 0:
         y_pred = pipeline.predict(X_test)
+        accuracy = round(accuracy_score(y_test, y_pred), 4)
         logger.info("\nModel Evaluation:")
         logger.info(classification_report(y_test, y_pred))
-        logger.info(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
+        logger.info(f"Accuracy: {accuracy:.4f}")
     
-    # Save
-    joblib.dump(pipeline, MODEL_FILE)
-    logger.info(f"\nModel saved to {MODEL_FILE}")
+    # Save (新版本写入模型注册表并切换 CURRENT，旧路径同步为该版本)
+    meta = model_registry.register("company", family, pipeline, family_path(MODEL_FILE, family), samples=len(df),
+                                   dataset_hash=dataset_hash(df['company'], df['label']),
+                                   accuracy=accuracy, train_seconds=round(train_seconds, 2), search=False)
+    logger.info(f"\nModel saved as company/{family}@{meta['version']} -> {family_path(MODEL_FILE, family)}")
     logger.info("Company eligibility engine is ready!")
 
 if __name__ == "__main__":
-    train()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the local company eligibility model")
+    parser.add_argument("--model", choices=FAMILIES, default="forest",
+                        help="forest: TF-IDF + RandomForest; linear: char hashing + logistic regression (*_linear.pkl)")
+    parser.add_argument("--search", action="store_true",
+                        help="Cross-validated hyperparameter search on all cores (cached features, see training.py)")
+    args = parser.parse_args()
+    train(args.model, search=args.search)
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
-import joblib
 import os
+import sys
 import html
 import re
+import time
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
@@ -12,9 +13,19 @@ from sklearn.metrics import classification_report, accuracy_score
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "dataset.csv")
 MODEL_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "local_model.pkl")
 
+sys.path.append(BASE_DIR)
+from fofa_finder.learning.linear_model import FAMILIES, LinearTextModel
+from fofa_finder.modules.local_engine import family_path
+from fofa_finder.config import Config
+from fofa_finder.learning import model_registry, sample_store
+from fofa_finder.learning.training import dataset_hash, inference_ready, train_and_publish
+
+# TF-IDF: Character level n-grams works well for Chinese short text classification
+TFIDF_ARGS = {"ngram_range": (1, 3), "max_features": 10000}
+LINEAR_ARGS = {"ngram_range": (1, 3)}
+
 def clean_text(text):
     if not isinstance(text, str):
         return ""
@@ -88,13 +99,12 @@ def get_augmented_data():
         
     return pd.DataFrame(data)
 
-def train():
-    if not os.path.exists(DATASET_FILE):
-        print("Error: Dataset file not found! Run prepare_data.py first.")
-        return
-        
+def train(family="forest", search=False):
     print("Loading dataset...")
-    df = pd.read_csv(DATASET_FILE)
+    df = sample_store.frame("local")[['text', 'label']]
+    if df.empty:
+        print("Error: No samples in the sample store! Run prepare_data.py first.")
+        return
     
     # Drop NA
     df.dropna(inplace=True)
@@ -115,6 +125,11 @@ def train():
     
     X = df['text']
     y = df['label']
+
+    if search:
+        train_and_publish("local", family, X, y, family_path(MODEL_FILE, family),
+                          LINEAR_ARGS if family == "linear" else TFIDF_ARGS)
+        return
     
     # Split
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -122,25 +137,39 @@ def train():
     print(f"Training on {len(X_train)} samples, testing on {len(X_test)} samples...")
     
     # Build Pipeline: TF-IDF + Random Forest
-    # TF-IDF: Character level n-grams works well for Chinese short text classification
-    pipeline = Pipeline([
-        ('tfidf', TfidfVectorizer(analyzer='char', ngram_range=(1, 3), max_features=10000)),
-        ('clf', RandomForestClassifier(n_estimators=100, n_jobs=-1, random_state=42))
-    ])
+    if family == "linear":
+        pipeline = LinearTextModel(**LINEAR_ARGS)
+    else:
+        pipeline = Pipeline([
+            ('tfidf', TfidfVectorizer(analyzer='char', **TFIDF_ARGS)),
+            ('clf', RandomForestClassifier(n_estimators=100, n_jobs=Config.TRAIN_N_JOBS, random_state=42))
+        ])
     
     # Train
-    pipeline.fit(X_train, y_train)
+    started = time.time()
+    inference_ready(pipeline.fit(X_train, y_train))
+    train_seconds = time.time() - started
     
     # Evaluate
     y_pred = pipeline.predict(X_test)
+    accuracy = round(accuracy_score(y_test, y_pred), 4)
     print("\nModel Evaluation:")
     print(classification_report(y_test, y_pred))
-    print(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
+    print(f"Accuracy: {accuracy:.4f}")
     
-    # Save
-    joblib.dump(pipeline, MODEL_FILE)
-    print(f"\nModel saved to {MODEL_FILE}")
+    # Save (新版本写入模型注册表并切换 CURRENT，旧路径同步为该版本)
+    meta = model_registry.register("local", family, pipeline, family_path(MODEL_FILE, family), samples=len(df),
+                                   dataset_hash=dataset_hash(X, y),
+                                   accuracy=accuracy, train_seconds=round(train_seconds, 2), search=False)
+    print(f"\nModel saved as local/{family}@{meta['version']} -> {family_path(MODEL_FILE, family)}")
     print("Local engine is ready!")
 
 if __name__ == "__main__":
-    train()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the local asset validity model")
+    parser.add_argument("--model", choices=FAMILIES, default="forest",
+                        help="forest: TF-IDF + RandomForest; linear: char hashing + logistic regression (*_linear.pkl)")
+    parser.add_argument("--search", action="store_true",
+                        help="Cross-validated hyperparameter search on all cores (cached features, see training.py)")
+    args = parser.parse_args()
+    train(args.model, search=args.search)
\ No newline at end of file
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+训练子系统: 特征矩阵缓存 + 交叉验证超参数搜索 + 训练记录 (train_*.py --search)
+
+1. 按固定随机种子划分训练 / 留出集，向量化器只在训练集上拟合
+2. 向量化结果按数据集哈希 (文本 + 标签 + 向量化参数) 缓存在 learning/.feature_cache/，
+   数据集未变化时反复调参 / 重训练不再重建 TF-IDF 矩阵
+3. GridSearchCV (分层 K 折) 由 joblib 在全部核心上并行评估参数组合 (Config.TRAIN_N_JOBS)，
+   搜索期间单个随机森林单线程运行，避免进程数 x 线程数超额订阅
+4. 最优参数在整个训练集上重新拟合 (随机森林使用 n_jobs)，作为新版本发布到模型注册表 (model_registry.py)，
+   元数据中记录数据集哈希、最优参数、交叉验证分数、留出集准确率、训练耗时与模型大小
+
+交叉验证各折共用训练集上拟合的 TF-IDF 词表 (无监督，对评分影响很小)，换来每个参数组合都不必重新向量化
+"""
+import os
+import sys
+import time
+import glob
+import hashlib
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BASE_DIR)
+
+from fofa_finder.config import Config
+from fofa_finder.modules.logger import setup_logger
+from fofa_finder.learning import model_registry
+from fofa_finder.learning.model_io import publish
+from fofa_finder.learning.linear_model import LinearTextModel
+
+logger = setup_logger("Training")
+
+CACHE_DIR = os.path.join(BASE_DIR, "fofa_finder", "learning", ".feature_cache")
+
+# 默认搜索空间 (forest: RandomForestClassifier 参数; linear: LogisticRegression / LinearSVC 参数)
+GRIDS = {
+    "forest": {
+        "n_estimators": [100, 200],
+        "max_depth": [None, 50],
+        "min_samples_leaf": [1, 2],
+        "class_weight": [None, "balanced"],
+    },
+    "linear": {
+        "C": [0.1, 0.3, 1.0, 3.0, 10.0],
+        "class_weight": [None, "balanced"],
+    },
+}
+
+
+def dataset_hash(texts, labels):
+    """
+    数据集内容的 sha256 (顺序敏感)
+    """
+    digest = hashlib.sha256()
+    for text, label in zip(texts, labels):
+        digest.update(f"{text}\x1f{int(label)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _vectorizer(family, model_args):
+    if family == "linear":
+        return LinearTextModel(**model_args).vectorizer
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(analyzer='char', **model_args)
+
+
+def _prune_cache(prefix, keep):
+    files = sorted(glob.glob(os.path.join(CACHE_DIR, f"{prefix}-*.joblib")), key=os.path.getmtime)
+    for path in files[:-keep] if keep > 0 else files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def cached_features(kind, family, model_args, X_train, y_train):
+    """
+    返回 (拟合后的 vectorizer, 训练集特征矩阵, cache_hit)，缓存键为训练集内容与向量化参数的哈希
+    """
+    import joblib
+
+    key = hashlib.sha256("|".join([
+        dataset_hash(X_train, y_train),
+        family,
+        repr(sorted(model_args.items())),
+    ]).encode("utf-8")).hexdigest()[:16]
+    prefix = f"{kind}-{family}"
+    cache_file = os.path.join(CACHE_DIR, f"{prefix}-{key}.joblib")
+
+    if os.path.exists(cache_file):
+        try:
+            cached = joblib.load(cache_file)
+            os.utime(cache_file) # 按最近使用时间淘汰
+            return cached["vectorizer"], cached["matrix"], True
+        except Exception as e:
+            logger.warning(f"特征缓存损坏，重新向量化: {e}")
+
+    vectorizer = _vectorizer(family, model_args)
+    M_train = vectorizer.fit_transform(X_train)
+    try:
+        if not os.path.exists(CACHE_DIR):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+        publish({"vectorizer": vectorizer, "matrix": M_train}, cache_file)
+        _prune_cache(prefix, Config.FEATURE_CACHE_KEEP)
+    except Exception as e:
+        logger.warning(f"写入特征缓存失败: {e}")
+    return vectorizer, M_train, False
+
+
+def _base_estimator(family, model_args):
+    if family == "linear":
+        return LinearTextModel(**model_args)._estimator()
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(random_state=42, n_jobs=1)
+
+
+def inference_ready(model):
+    """
+    训练完成后复位随机森林的 n_jobs: LocalEngine 逐条预测时，多线程调度的开销大于收益
+    """
+    steps = getattr(model, "steps", None)
+    if steps and hasattr(steps[-1][1], "n_jobs"):
+        steps[-1][1].set_params(n_jobs=None)
+    return model
+
+
+def _final_model(family, model_args, vectorizer, best_params, M_train, y_train, n_jobs):
+    if family == "linear":
+        model = LinearTextModel(**dict(model_args, **best_params))
+        return model.fit_matrix(M_train, y_train)
+
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    clf = RandomForestClassifier(random_state=42, n_jobs=n_jobs, **best_params).fit(M_train, y_train)
+    return inference_ready(Pipeline([('tfidf', vectorizer), ('clf', clf)]))
+
+
+def search_and_fit(kind, family, texts, labels, model_args, grid=None, cv=5, test_size=0.2, n_jobs=None):
+    """
+    交叉验证超参数搜索后在训练集上拟合最优模型，返回 (model, report)
+    model_args: forest 为 TfidfVectorizer 参数 (ngram_range / max_features)，linear 为 LinearTextModel 参数
+    """
+    from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+
+    texts = [str(t) for t in texts]
+    labels = np.asarray(labels, dtype=int)
+    n_jobs = Config.TRAIN_N_JOBS if n_jobs is None else n_jobs
+    grid = grid or GRIDS[family]
+    started = time.time()
+
+    X_train, X_test, y_train, y_test = train_test_split(texts, labels, test_size=test_size, random_state=42, stratify=labels)
+    vectorizer, M_train, hit = cached_features(kind, family, model_args, X_train, y_train)
+    logger.info(f"[{kind}/{family}] 特征矩阵 {M_train.shape[0]}x{M_train.shape[1]} ({'缓存命中' if hit else '已向量化并缓存'})")
+
+    folds = min(cv, int(np.bincount(y_train, minlength=2).min()))
+    if folds < 2:
+        raise ValueError("训练集中少数类样本不足 2 条，无法交叉验证")
+    search = GridSearchCV(_base_estimator(family, model_args), grid, scoring=Config.TRAIN_SCORING,
+                          cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=42),
+                          n_jobs=n_jobs, refit=False)
+    search.fit(M_train, y_train)
+    logger.info(f"[{kind}/{family}] {len(search.cv_results_['params'])} 组参数 x {folds} 折，"
+                f"最优 {Config.TRAIN_SCORING}={search.best_score_:.4f}: {search.best_params_}")
+
+    model = _final_model(family, model_args, vectorizer, search.best_params_, M_train, y_train, n_jobs)
+    predictions = model.predict(X_test)
+    report = {
+        "samples": int(len(labels)),
+        "dataset_hash": dataset_hash(texts, labels),
+        "params": search.best_params_,
+        "cv_score": round(float(search.best_score_), 4),
+        "accuracy": round(float(np.mean(predictions == y_test)), 4),
+        "train_seconds": round(time.time() - started, 2),
+        "search": True,
+    }
+    return model, report
+
+
+def train_and_publish(kind, family, texts, labels, model_file, model_args, **options):
+    """
+    搜索 + 拟合 + 发布为模型注册表的新版本 (model_file 为同步的旧路径)，返回版本元数据
+    """
+    model, report = search_and_fit(kind, family, texts, labels, model_args, **options)
+    meta = model_registry.register(kind, family, model, model_file, **report)
+    logger.info(f"[{kind}/{family}] 留出集准确率 {report['accuracy']:.4f}，耗时 {report['train_seconds']}s，"
+                f"模型 {meta['size_bytes'] / 1024:.0f} KB -> {meta['version']}")
+    return meta
@@ -11,9 +11,31 @@ import numpy as np
 
 # 设置路径
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "dataset.csv")
+sys.path.append(BASE_DIR)
+from fofa_finder.learning import sample_store
 MODEL_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "local_model.pkl")
 
+# 人工基准用例 (典型标题, 期望标签)，benchmarks/bench_models.py 也用它比较不同模型
+BENCHMARK_CASES = [
+    # 应该保留 (Label 1)
+    ("XX市综合管理平台后台", 1),
+    ("某某科技VPN入口", 1),
+    ("GitLab Community Edition", 1),
+    ("Jenkins Dashboard", 1),
+    ("泛微协同办公平台", 1),
+    ("H3C 路由器登录界面", 1),
+    ("XX公司内部财务系统", 1),
+
+    # 应该丢弃 (Label 0)
+    ("404 Not Found", 0),
+    ("Welcome to nginx!", 0),
+    ("Apache Tomcat/8.5.55", 0),
+    ("IIS Windows Server", 0),
+    ("Error 500: Internal Server Error", 0),
+    ("Test Page for the Nginx HTTP Server", 0),
+    ("Site under construction", 0),
+]
+
 def clean_text(text):
     if not isinstance(text, str):
         return ""
@@ -46,28 +68,8 @@ def verify():
     print(f"{'测试文本':<40} | {'预测结果':<10} | {'置信度':<10}")
     print("-" * 60)
 
-    test_cases = [
-        # 应该保留 (Label 1)
-        ("XX市综合管理平台后台", 1),
-        ("某某科技VPN入口", 1),
-        ("GitLab Community Edition", 1),
-        ("Jenkins Dashboard", 1),
-        ("泛微协同办公平台", 1),
-        ("H3C 路由器登录界面", 1),
-        ("XX公司内部财务系统", 1),
-        
-        # 应该丢弃 (Label 0)
-        ("404 Not Found", 0),
-        ("Welcome to nginx!", 0),
-        ("Apache Tomcat/8.5.55", 0),
-        ("IIS Windows Server", 0),
-        ("Error 500: Internal Server Error", 0),
-        ("Test Page for the Nginx HTTP Server", 0),
-        ("Site under construction", 0),
-    ]
-
     correct_count = 0
-    for text, expected in test_cases:
+    for text, expected in BENCHMARK_CASES:
         prediction = pipeline.predict([text])[0]
         proba = pipeline.predict_proba([text])[0]
         confidence = proba[prediction]
@@ -80,13 +82,12 @@ def verify():
         print(f"{text[:38]:<40} | {pred_str:<10} | {confidence:.2f}  {status}")
 
     print("-" * 60)
-    print(f"基准测试通过率: {correct_count}/{len(test_cases)} ({correct_count/len(test_cases)*100:.2f}%)")
+    print(f"基准测试通过率: {correct_count}/{len(BENCHMARK_CASES)} ({correct_count/len(BENCHMARK_CASES)*100:.2f}%)")
 
     # 3. 数据集统计评估
     print("\n[3/3] 数据集统计评估 (使用新随机种子划分验证集)")
-    if os.path.exists(DATASET_FILE):
-        df = pd.read_csv(DATASET_FILE)
-        df.dropna(inplace=True)
+    df = sample_store.frame("local")[['text', 'label']]
+    if not df.empty:
         
         # 必须与训练时保持一致的数据预处理
         print("正在对验证集数据进行清洗 (解码 HTML 实体)...")
@@ -118,7 +119,7 @@ def verify():
         print(f"真阳性 (TP - 正确保留): {cm[1][1]}")
         
     else:
-        print("警告: 未找到 dataset.csv，无法进行大规模统计评估。")
+        print("警告: 样本库中没有资产有效性样本，无法进行大规模统计评估。")
 
     print("\n=== 验证结束 ===")
 
@@ -5,30 +5,27 @@ import time
 import argparse
 from fofa_finder.modules.logger import setup_logger
 from fofa_finder.config import Config
-from fofa_finder.modules.excel_loader import ExcelLoader
-from fofa_finder.modules.fofa_client import FofaClient
-from fofa_finder.modules.analyzer import Analyzer
-from fofa_finder.modules.reporter import Reporter
-from fofa_finder.modules.reanalyzer import ReAnalyzer
-from fofa_finder.learning.augment_data import augment
-from fofa_finder.learning.train_company_model import train as train_company_model
-
-import glob
+from fofa_finder.modules.manifest import OutputManifest
+from fofa_finder.modules import metrics
+from fofa_finder.modules.prometheus import Exporter
+from fofa_finder.modules.profiler import CompanyProfiler
+# pandas / scikit-learn / requests 等重量级依赖在各阶段首次需要时才导入 (见 main())，
+# 保证 --help 与无事可做的断点续传快速返回 (benchmarks/bench_import.py 负责守护)
 
 logger = setup_logger("Main")
 
 def sync_progress(output_dir):
     """
-    扫描 output 目录，寻找所有已生成 _analysis.xlsx 的公司
+    根据输出清单 (manifest.jsonl) 寻找所有已生成分析报告的公司
     1. 将公司名加入 completed 集合
-    2. 将对应的 _raw.xlsx 路径补充到 reanalysis_progress.txt 中 (防止重复分析)
+    2. 将对应的原始数据路径补充到 reanalysis_progress.txt 中 (防止重复分析)
     返回: set(已完成公司名)
     """
     completed = set()
     if not os.path.exists(output_dir):
         return completed
         
-    logger.info("正在同步历史进度 (扫描已完成的分析报告)...")
+    logger.info("正在同步历史进度 (读取输出清单)...")
     
     # Load existing raw paths to avoid duplicates
     reanalysis_file = os.path.join(output_dir, "reanalysis_progress.txt")
@@ -38,42 +35,21 @@ def sync_progress(output_dir):
             for line in f:
                 existing_raw_paths.add(line.strip())
     
-    # Pattern: **/*_analysis.xlsx (recursive)
-    # This confirms that the AI analysis phase was fully completed
-    search_pattern = os.path.join(output_dir, "**", "*_analysis.xlsx")
-    files = glob.glob(search_pattern, recursive=True)
+    # The manifest is maintained by Reporter on every write;
+    # a legacy output dir without one is scanned once to build it.
+    manifest = OutputManifest(output_dir).ensure()
+    
+    # An analysis entry confirms that the AI analysis phase was fully completed
+    for entry in manifest.query(kind="analysis"):
+        completed.add(entry["company"])
     
     new_raw_paths = []
     
-    for file_path in files:
-        filename = os.path.basename(file_path)
-        if "_analysis.xlsx" in filename:
-            company_name = filename.replace("_analysis.xlsx", "")
-            completed.add(company_name)
-            
-            # Infer raw data path and sync to reanalysis_progress.txt
-            # Strategy: Check multiple possible locations for the raw file to support different structures
-            # 1. {parent}/raw_data/filename_raw.xlsx (Nested structure)
-            # 2. {parent}/filename_raw.xlsx (Flat structure)
-            # 3. {parent}/../raw_data/filename_raw.xlsx (Sibling structure, e.g., analysis_data/ vs raw_data/)
-            parent = os.path.dirname(file_path)
-            possible_paths = [
-                os.path.join(parent, "raw_data", f"{company_name}_raw.xlsx"),
-                os.path.join(parent, f"{company_name}_raw.xlsx"),
-                os.path.join(parent, "..", "raw_data", f"{company_name}_raw.xlsx")
-            ]
-            
-            found_raw_path = None
-            for p in possible_paths:
-                if os.path.exists(p):
-                    found_raw_path = p
-                    break
-            
-            if found_raw_path:
-                abs_raw_path = os.path.abspath(found_raw_path)
-                if abs_raw_path not in existing_raw_paths:
-                    new_raw_paths.append(abs_raw_path)
-                    existing_raw_paths.add(abs_raw_path) # Avoid adding same file twice in this loop
+    for entry in manifest.query(kind="raw"):
+        raw_path = entry["path"]
+        if entry["company"] in completed and raw_path not in existing_raw_paths:
+            new_raw_paths.append(raw_path)
+            existing_raw_paths.add(raw_path) # Avoid adding same file twice in this loop
 
     # Batch write new paths
     if new_raw_paths:
@@ -85,11 +61,23 @@ def sync_progress(output_dir):
     logger.info(f"发现 {len(completed)} 个已完成的分析任务 (将跳过这些公司)")
     return completed
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="FOFA Finder - Corporate Asset Discovery Tool")
     parser.add_argument("--api-mode", action="store_true", help="Use FOFA Official API instead of Web Simulation")
     parser.add_argument("--local-ai", action="store_true", help="Force use Local AI Model instead of DeepSeek API")
-    args = parser.parse_args()
+    parser.add_argument("--consolidated", action="store_true", help="Append all companies into one session dataset instead of per-company files")
+    parser.add_argument("--reanalyze", action="store_true", help="Re-audit recent raw data before the new scan")
+    parser.add_argument("--incremental", action="store_true", help="Re-analysis only audits assets that are new or changed since the last verdict")
+    parser.add_argument("--reanalyze-hours", type=int, default=Config.REANALYSIS_HOURS, help="Only re-audit raw data from the last N hours (0 = all)")
+    parser.add_argument("--workers", type=int, default=Config.REANALYSIS_WORKERS, help="Processes used to parse raw files during re-analysis")
+    parser.add_argument("--ai-concurrency", type=int, default=Config.REANALYSIS_AI_CONCURRENCY, help="Concurrent AI audits during re-analysis (1 = serial)")
+    parser.add_argument("--budget", type=float, default=Config.REANALYSIS_BUDGET_CNY, help="Stop dispatching re-analysis once this cost (CNY) is reached")
+    parser.add_argument("--metrics-port", type=int, default=Config.METRICS_PORT, help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-file", default=Config.METRICS_FILE, help="Periodically write Prometheus metrics to this textfile (node_exporter textfile collector)")
+    parser.add_argument("--skip-learning", action="store_true", help="Skip the auto-learning phase (augment + retrain) at startup")
+    parser.add_argument("--profile-every", type=int, default=Config.PROFILE_EVERY, help="Profile every Nth company with cProfile + tracemalloc (0 = off)")
+    parser.add_argument("--profile-min-assets", type=int, default=Config.PROFILE_MIN_ASSETS, help="Profile any company with at least M unique assets (0 = off)")
+    args = parser.parse_args(argv)
 
     if args.api_mode:
         Config.FOFA_MODE = 'api'
@@ -99,247 +87,316 @@ def main():
         Config.USE_LOCAL_AI = True
         logger.info("Switching to Local AI Mode (Offline) via command line argument.")
 
+    if args.consolidated:
+        Config.OUTPUT_LAYOUT = 'dataset'
+        logger.info("Switching to consolidated dataset output via command line argument.")
+
     logger.info("正在启动 FOFA Finder...")
+    Config.ensure_dirs()
+    
+    # Optional live metrics (Prometheus)
+    exporter = None
+    if args.metrics_port or args.metrics_file:
+        exporter = Exporter(port=args.metrics_port, textfile=args.metrics_file).start()
     
-    # Auto-Learning Phase
-    logger.info("="*50)
-    logger.info(">>> 阶段 0: 自动学习与模型增强 (Auto Learning) <<<")
-    logger.info("="*50)
+    # 后台学习进程与指标导出在任何退出路径 (提前 return / 异常) 上都要回收
+    learner = None
+    reporter = None
+    profiler = None
     try:
-        # Augment with small batch (e.g., 10) to keep startup fast but continuous
-        added_count = augment(batch_size=10)
-        if added_count > 0:
-            logger.info(f"成功获取 {added_count} 条新样本，正在重新训练本地模型...")
-            train_company_model()
-            logger.info("本地模型已更新！")
+        # Auto-Learning Phase
+        logger.info("="*50)
+        logger.info(">>> 阶段 0: 自动学习与模型增强 (Auto Learning) <<<")
+        logger.info("="*50)
+        if args.skip_learning:
+            logger.info("已跳过自动学习阶段 (--skip-learning)")
         else:
-            logger.info("本次未发现新样本或未进行增强。")
-    except Exception as e:
-        logger.warning(f"自动学习过程中出现异常 (非阻断性): {e}")
+            try:
+                from fofa_finder.learning.auto_learn import start_background
+                # 打标签 + 重训练在独立进程中进行，新模型原子发布后由 LocalEngine 热加载，不阻塞扫描启动
+                learner = start_background(batch_size=10)
+                logger.info(f"自动学习已转入后台进程 (PID {learner.pid})，扫描继续进行")
+            except Exception as e:
+                logger.warning(f"自动学习后台任务启动失败 (非阻断性): {e}")
 
-    # 1. Load Companies
-    loader = ExcelLoader()
-    companies = loader.load_companies()
+        # 1. Load Companies
+        from fofa_finder.modules.excel_loader import ExcelLoader
+        loader = ExcelLoader()
+        companies = loader.load_companies()
     
-    if not companies:
-        logger.error("未找到公司或 Excel 加载失败。")
-        return
+        if not companies:
+            logger.error("未找到公司或 Excel 加载失败。")
+            return
 
-    logger.info(f"即将处理 {len(companies)} 家公司...")
+        logger.info(f"即将处理 {len(companies)} 家公司...")
     
-    # 0. Historical Data Audit (Before Scan)
-    # logger.info("="*50)
-    # logger.info(">>> 阶段 1: 历史数据全量补漏分析 (Historical Audit) <<<")
-    # logger.info("="*50)
-    
-    # reanalyzer = ReAnalyzer()
-    # re_p_tokens, re_c_tokens = reanalyzer.run()
-    re_p_tokens, re_c_tokens = 0, 0
+        # 0. Historical Data Audit (Before Scan)
+        re_p_tokens, re_c_tokens = 0, 0
+        if args.reanalyze:
+            logger.info("="*50)
+            logger.info(">>> 阶段 1: 历史数据全量补漏分析 (Historical Audit) <<<")
+            logger.info("="*50)
+        
+            from fofa_finder.modules.reanalyzer import ReAnalyzer
+            reanalyzer = ReAnalyzer(incremental=args.incremental or None)
+            if args.ai_concurrency > 1:
+                re_p_tokens, re_c_tokens = reanalyzer.run_parallel(
+                    since_hours=args.reanalyze_hours,
+                    workers=args.workers,
+                    ai_concurrency=args.ai_concurrency,
+                    budget_cny=args.budget,
+                )
+            else:
+                re_p_tokens, re_c_tokens = reanalyzer.run(since_hours=args.reanalyze_hours)
+            reanalyzer.analyzer.flush_online_updates()
+            reanalyzer.reporter.close()
     
-    logger.info("\n")
-    logger.info("="*50)
-    logger.info(">>> 阶段 2: 新一轮资产扫描任务 (New Scan Task) <<<")
-    logger.info("="*50)
+        logger.info("\n")
+        logger.info("="*50)
+        logger.info(">>> 阶段 2: 新一轮资产扫描任务 (New Scan Task) <<<")
+        logger.info("="*50)
 
-    # Initialize Modules
-    fofa_client = FofaClient()
-    analyzer = Analyzer()
-    reporter = Reporter()
+        # Initialize Modules
+        from fofa_finder.modules.fofa_client import FofaClient
+        from fofa_finder.modules.analyzer import Analyzer
+        from fofa_finder.modules.reporter import Reporter
+        fofa_client = FofaClient()
+        analyzer = Analyzer()
+        reporter = Reporter()
     
-    # Check Balance (Start)
-    initial_balance_str = analyzer.get_account_balance()
-    logger.info(f"[DeepSeek] 初始账户余额: {initial_balance_str}")
+        # Optional per-company profiling (session_dir/profile_data/)
+        profiler = CompanyProfiler(os.path.join(reporter.session_dir, "profile_data"),
+                                   every=args.profile_every, min_assets=args.profile_min_assets)
     
-    # Try to parse initial balance to float for estimation
-    try:
-        # Assuming format "¥ 50.00" or similar, extract number
-        import re
-        balance_match = re.search(r'([\d\.]+)', str(initial_balance_str))
-        initial_balance = float(balance_match.group(1)) if balance_match else 0.0
-    except:
-        initial_balance = 0.0
+        # Check Balance (Start)
+        initial_balance_str = analyzer.get_account_balance()
+        logger.info(f"[DeepSeek] 初始账户余额: {initial_balance_str}")
+    
+        # Try to parse initial balance to float for estimation
+        try:
+            # Assuming format "¥ 50.00" or similar, extract number
+            import re
+            balance_match = re.search(r'([\d\.]+)', str(initial_balance_str))
+            initial_balance = float(balance_match.group(1)) if balance_match else 0.0
+        except:
+            initial_balance = 0.0
         
-    # 0. Self-Check Token
-    logger.info("正在执行自检 (Self-check)，目标: Baidu...")
-    token_valid, msg = fofa_client.check_token_status()
-    if not token_valid:
-        logger.critical(f"自检失败 (FAILED): {msg}")
-        logger.critical("请更新 d:\\cnvd_new\\http_request.txt (以及 http2/3.txt) 中的 FOFA Token/Cookie！")
-        logger.critical("程序即将退出。")
-        return
-    else:
-        logger.info(f"自检通过 (PASSED): {msg}")
+        # 0. Self-Check Token
+        logger.info("正在执行自检 (Self-check)，目标: Baidu...")
+        token_valid, msg = fofa_client.check_token_status()
+        if not token_valid:
+            logger.critical(f"自检失败 (FAILED): {msg}")
+            logger.critical("请更新 d:\\cnvd_new\\http_request.txt (以及 http2/3.txt) 中的 FOFA Token/Cookie！")
+            logger.critical("程序即将退出。")
+            return
+        else:
+            logger.info(f"自检通过 (PASSED): {msg}")
 
-    # Cost Tracking (Initialize with re-analysis usage)
-    total_prompt_tokens = re_p_tokens
-    total_completion_tokens = re_c_tokens
+        # Cost Tracking (Initialize with re-analysis usage)
+        total_prompt_tokens = re_p_tokens
+        total_completion_tokens = re_c_tokens
     
-    # Calculate initial cost from re-analysis
-    re_cost = (re_p_tokens / 1_000_000 * 2.0) + (re_c_tokens / 1_000_000 * 8.0)
-    total_cost_cny = re_cost # Global cumulative cost
+        # Calculate initial cost from re-analysis
+        re_cost = (re_p_tokens / 1_000_000 * 2.0) + (re_c_tokens / 1_000_000 * 8.0)
+        total_cost_cny = re_cost # Global cumulative cost
     
-    # Progress Tracking
-    progress_file = os.path.join(Config.OUTPUT_DIR, "progress.txt")
-    reanalysis_file = os.path.join(Config.OUTPUT_DIR, "reanalysis_progress.txt")
+        # Progress Tracking
+        progress_file = os.path.join(Config.OUTPUT_DIR, "progress.txt")
+        reanalysis_file = os.path.join(Config.OUTPUT_DIR, "reanalysis_progress.txt")
     
-    # Sync progress from actual files
-    processed_companies = sync_progress(Config.OUTPUT_DIR)
+        # Sync progress from actual files
+        processed_companies = sync_progress(Config.OUTPUT_DIR)
     
-    # Optional: Load manual progress if needed, but file scan is safer
-    # If we want to skip companies that were processed but yielded NO assets (and thus no report),
-    # we should read progress.txt too.
-    if os.path.exists(progress_file):
-        with open(progress_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                name = line.strip()
-                if name and name not in processed_companies:
-                    # Caution: This assumes if it's in progress.txt, it's done.
-                    # But user said progress.txt might be inaccurate.
-                    # Let's trust file system (processed_companies) for 'success',
-                    # and maybe use progress.txt for 'attempted but failed/empty'.
-                    # For now, let's merge them to be safe against re-scanning empty companies.
-                    processed_companies.add(name)
+        # Optional: Load manual progress if needed, but file scan is safer
+        # If we want to skip companies that were processed but yielded NO assets (and thus no report),
+        # we should read progress.txt too.
+        if os.path.exists(progress_file):
+            with open(progress_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    name = line.strip()
+                    if name and name not in processed_companies:
+                        # Caution: This assumes if it's in progress.txt, it's done.
+                        # But user said progress.txt might be inaccurate.
+                        # Let's trust file system (processed_companies) for 'success',
+                        # and maybe use progress.txt for 'attempted but failed/empty'.
+                        # For now, let's merge them to be safe against re-scanning empty companies.
+                        processed_companies.add(name)
                     
-    logger.info(f"最终进度: {len(processed_companies)} 家公司已处理 (文件扫描 + 历史记录)")
+        logger.info(f"最终进度: {len(processed_companies)} 家公司已处理 (文件扫描 + 历史记录)")
 
-    # Balance Calibration Settings
-    BALANCE_CHECK_INTERVAL = 20 # Check real balance every 20 companies
+        # Balance Calibration Settings
+        BALANCE_CHECK_INTERVAL = 20 # Check real balance every 20 companies
     
-    for idx, company_data in enumerate(companies):
-        company_name = company_data['name']
+        metrics.gauge("companies_total", len(companies))
+    
+        for idx, company_data in enumerate(companies):
+            company_name = company_data['name']
+            metrics.gauge("companies_done", idx)
+            metrics.gauge("companies_remaining", len(companies) - idx)
         
-        # Periodic Balance Calibration
-        if idx > 0 and idx % BALANCE_CHECK_INTERVAL == 0:
-            try:
-                # logger.info("正在校准账户余额...")
-                real_balance_str = analyzer.get_account_balance()
-                import re
-                balance_match = re.search(r'([\d\.]+)', str(real_balance_str))
-                if balance_match:
-                    new_balance = float(balance_match.group(1))
-                    # Reset estimation base
-                    initial_balance = new_balance
-                    total_cost_cny = 0.0 # Reset cumulative cost relative to this new checkpoint
-                    # logger.info(f"余额校准完成: {new_balance}")
-            except Exception as e:
-                logger.warning(f"余额校准失败: {e}")
+            # Periodic Balance Calibration
+            if idx > 0 and idx % BALANCE_CHECK_INTERVAL == 0:
+                try:
+                    # logger.info("正在校准账户余额...")
+                    real_balance_str = analyzer.get_account_balance()
+                    import re
+                    balance_match = re.search(r'([\d\.]+)', str(real_balance_str))
+                    if balance_match:
+                        new_balance = float(balance_match.group(1))
+                        # Reset estimation base
+                        initial_balance = new_balance
+                        total_cost_cny = 0.0 # Reset cumulative cost relative to this new checkpoint
+                        # logger.info(f"余额校准完成: {new_balance}")
+                except Exception as e:
+                    logger.warning(f"余额校准失败: {e}")
 
-        # Resume Check
-        if company_name in processed_companies:
-            # logger.info(f"跳过已处理公司: {company_name}") # Silence skip logs to reduce noise
-            continue
+            # Resume Check
+            if company_name in processed_companies:
+                # logger.info(f"跳过已处理公司: {company_name}") # Silence skip logs to reduce noise
+                metrics.count("companies_resumed")
+                continue
+        
+            profiler.begin(idx, company_name)
             
-        # Estimate current balance
-        est_balance = initial_balance - total_cost_cny
-        balance_info = f" | 余额≈¥{est_balance:.2f}" if initial_balance > 0 else ""
+            # Estimate current balance
+            est_balance = initial_balance - total_cost_cny
+            balance_info = f" | 余额≈¥{est_balance:.2f}" if initial_balance > 0 else ""
         
-        logger.info(f"[{idx+1}/{len(companies)}] 正在处理: {company_name} (匹配业务: {company_data['matched_keyword']}){balance_info}")
+            logger.info(f"[{idx+1}/{len(companies)}] 正在处理: {company_name} (匹配业务: {company_data['matched_keyword']}){balance_info}")
         
-        # 1. Analyze Name
-        keywords = analyzer.split_company_name(company_name)
+            # 1. Analyze Name
+            keywords = analyzer.split_company_name(company_name)
         
-        found_assets = False
-        all_company_assets = []
+            found_assets = False
+            all_company_assets = []
         
-        for kw in keywords:
-            # 2. Search
-            raw_result, query_syntax = fofa_client.search(kw)
-            if not raw_result:
-                logger.warning(f"关键词 '{kw}' 无查询结果")
-                continue
+            for kw in keywords:
+                # 2. Search
+                raw_result, query_syntax = fofa_client.search(kw)
+                if not raw_result:
+                    logger.warning(f"关键词 '{kw}' 无查询结果")
+                    continue
                 
-            # 3. Extract Assets
-            kw_assets = analyzer.extract_assets(raw_result)
+                # 3. Extract Assets
+                kw_assets = analyzer.extract_assets(raw_result)
             
-            # Local Filtering (Junk)
-            kw_assets = analyzer.filter_junk_assets(kw_assets)
+                # Local Filtering (Junk)
+                kw_assets = analyzer.filter_junk_assets(kw_assets)
             
-            if not kw_assets:
-                logger.warning(f"关键词 '{kw}' 无查询结果 (或全部被过滤)")
-                continue
+                if not kw_assets:
+                    logger.warning(f"关键词 '{kw}' 无查询结果 (或全部被过滤)")
+                    continue
                 
-            # Add metadata
-            for asset in kw_assets:
-                asset['fofa_query'] = query_syntax
-                asset['search_keyword'] = kw
+                # Add metadata
+                for asset in kw_assets:
+                    asset['fofa_query'] = query_syntax
+                    asset['search_keyword'] = kw
                 
-            all_company_assets.extend(kw_assets)
-            found_assets = True
+                all_company_assets.extend(kw_assets)
+                found_assets = True
             
-            # Rate Limit (per keyword)
-            time.sleep(2) 
+                # Rate Limit (per keyword)
+                metrics.pause(2) 
 
-        if not found_assets:
-            logger.warning(f"公司 {company_name} (所有关键词) 未发现任何资产")
-            # Mark as processed even if no assets found
-            with open(progress_file, 'a', encoding='utf-8') as f:
-                f.write(f"{company_name}\n")
-            continue
+            if not found_assets:
+                logger.warning(f"公司 {company_name} (所有关键词) 未发现任何资产")
+                # Mark as processed even if no assets found
+                with open(progress_file, 'a', encoding='utf-8') as f:
+                    f.write(f"{company_name}\n")
+                profiler.end()
+                continue
             
-        # 4. Filter Fingerprint (Consolidate assets first)
-        # Deduplicate assets by link
-        unique_assets = {a['link']: a for a in all_company_assets}.values()
-        all_company_assets = list(unique_assets)
+            # 4. Filter Fingerprint (Consolidate assets first)
+            # Deduplicate assets by link
+            unique_assets = {a['link']: a for a in all_company_assets}.values()
+            all_company_assets = list(unique_assets)
         
-        logger.info(f"公司 {company_name} 共发现 {len(all_company_assets)} 个唯一资产")
+            logger.info(f"公司 {company_name} 共发现 {len(all_company_assets)} 个唯一资产")
+            metrics.count("main.companies_with_assets")
+            metrics.count("main.unique_assets", len(all_company_assets))
+            profiler.check_assets(company_name, len(all_company_assets))
         
-        # 5. Save Raw Data (Always save if assets found)
-        raw_data_path = reporter.save_raw_data(company_name, all_company_assets)
+            # 5. Save Raw Data (Always save if assets found)
+            raw_data_path = reporter.save_raw_data(company_name, all_company_assets)
         
-        # Sync to reanalysis progress
-        if raw_data_path:
-             with open(reanalysis_file, 'a', encoding='utf-8') as f:
-                f.write(f"{raw_data_path}\n")
+            # Sync to reanalysis progress
+            if raw_data_path:
+                 with open(reanalysis_file, 'a', encoding='utf-8') as f:
+                    f.write(f"{raw_data_path}\n")
         
-        # 6. AI Analysis (New Full Audit Mode)
-        if all_company_assets: # Always analyze if we have assets
-            clean_assets, cnvd_assets, usage, analysis_data = analyzer.analyze_with_ai(company_name, all_company_assets)
+            # 6. AI Analysis (New Full Audit Mode)
+            if all_company_assets: # Always analyze if we have assets
+                clean_assets, cnvd_assets, usage, analysis_data = analyzer.analyze_with_ai(company_name, all_company_assets)
             
-            # Accumulate Cost
-            p_tokens = usage.get('prompt_tokens', 0)
-            c_tokens = usage.get('completion_tokens', 0)
-            total_prompt_tokens += p_tokens
-            total_completion_tokens += c_tokens
+                # Accumulate Cost
+                p_tokens = usage.get('prompt_tokens', 0)
+                c_tokens = usage.get('completion_tokens', 0)
+                total_prompt_tokens += p_tokens
+                total_completion_tokens += c_tokens
             
-            # Calculate current cost
-            current_cost = (p_tokens / 1_000_000 * 2.0) + (c_tokens / 1_000_000 * 8.0)
-            total_cost_cny += current_cost
+                # Calculate current cost
+                current_cost = (p_tokens / 1_000_000 * 2.0) + (c_tokens / 1_000_000 * 8.0)
+                total_cost_cny += current_cost
             
-            # Re-estimate balance after cost update
-            est_balance = initial_balance - total_cost_cny
+                # Re-estimate balance after cost update
+                est_balance = initial_balance - total_cost_cny
+                metrics.gauge("spend_cny", (total_prompt_tokens / 1_000_000 * 2.0) + (total_completion_tokens / 1_000_000 * 8.0))
+                if initial_balance > 0:
+                    metrics.gauge("estimated_balance_cny", est_balance)
             
-            logger.info(f"AI 分析完成: {company_name} | 本次花费: ¥{current_cost:.4f} | 累计花费: ¥{total_cost_cny:.4f} | 余额≈¥{est_balance:.2f}")
+                logger.info(f"AI 分析完成: {company_name} | 本次花费: ¥{current_cost:.4f} | 累计花费: ¥{total_cost_cny:.4f} | 余额≈¥{est_balance:.2f}")
             
-            # 7. Save Reports
-            reporter.save_ai_report(company_name, clean_assets, cnvd_assets, analysis_data)
-            reporter.save_ai_markdown(company_name, analysis_data) 
-        else:
-            logger.warning(f"无资产可分析: {company_name}")
+                # 7. Save Reports
+                reporter.save_ai_report(company_name, clean_assets, cnvd_assets, analysis_data, all_company_assets)
+                reporter.save_ai_markdown(company_name, analysis_data) 
+            else:
+                logger.warning(f"无资产可分析: {company_name}")
+            
+            # Mark as processed
+            with open(progress_file, 'a', encoding='utf-8') as f:
+                f.write(f"{company_name}\n")
             
-        # Mark as processed
-        with open(progress_file, 'a', encoding='utf-8') as f:
-            f.write(f"{company_name}\n")
+            profiler.end()
             
-        # Rate Limit (per company)
-        time.sleep(Config.RATE_LIMIT_MIN)
+            # Rate Limit (per company)
+            metrics.pause(Config.RATE_LIMIT_MIN)
         
-    # Cost Summary
-    # Pricing (Approx DeepSeek V3): Input 2元/1M, Output 8元/1M
-    input_cost = (total_prompt_tokens / 1_000_000) * 2.0
-    output_cost = (total_completion_tokens / 1_000_000) * 8.0
-    total_cost = input_cost + output_cost
+        profiler.end()
+        metrics.gauge("companies_done", len(companies))
+        metrics.gauge("companies_remaining", 0)
+        reporter.close()
+        
+        # Cost Summary
+        # Pricing (Approx DeepSeek V3): Input 2元/1M, Output 8元/1M
+        input_cost = (total_prompt_tokens / 1_000_000) * 2.0
+        output_cost = (total_completion_tokens / 1_000_000) * 8.0
+        total_cost = input_cost + output_cost
     
-    logger.info("="*50)
-    logger.info("任务统计 (Task Statistics)")
-    logger.info(f"Total Prompt Tokens: {total_prompt_tokens}")
-    logger.info(f"Total Completion Tokens: {total_completion_tokens}")
-    logger.info(f"Estimated Cost (CNY): ¥{total_cost:.4f}")
+        logger.info("="*50)
+        logger.info("任务统计 (Task Statistics)")
+        logger.info(f"Total Prompt Tokens: {total_prompt_tokens}")
+        logger.info(f"Total Completion Tokens: {total_completion_tokens}")
+        logger.info(f"Estimated Cost (CNY): ¥{total_cost:.4f}")
     
-    # Check Balance (End)
-    final_balance = analyzer.get_account_balance()
-    logger.info(f"[DeepSeek] 结束账户余额: {final_balance}")
+        # Check Balance (End)
+        final_balance = analyzer.get_account_balance()
+        logger.info(f"[DeepSeek] 结束账户余额: {final_balance}")
     
-    logger.info("="*50)
+        logger.info("="*50)
+    finally:
+        # 中断 (Ctrl+C / 异常) 时保存当前公司的剖析结果并停止 tracemalloc
+        if profiler is not None:
+            profiler.end()
+        # Per-stage timing report (console + session_dir/profile.json)
+        report = metrics.log_report()
+        if reporter is not None:
+            metrics.write_report(os.path.join(reporter.session_dir, "profile.json"), report)
+        if exporter:
+            exporter.stop()
+
+        if learner is not None and learner.is_alive():
+            logger.info("等待后台自动学习任务结束...")
+            learner.join()
 
     logger.info("所有任务已完成。")
 
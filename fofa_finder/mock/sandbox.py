@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+把一次模拟运行 / 基准测试的全部输出重定向到独立目录 (mock --run 与 benchmarks/run.py 共用)
+
+合成报告若写入 fofa_finder/output，会进入真实的 manifest.jsonl / events.jsonl / 载荷库，
+随后被 prepare_data.py、extract_*.py 当作训练数据导入样本库
+"""
+import os
+
+from ..config import Config
+
+
+def redirect_output(work_dir):
+    """
+    所有输出 (日志、事件、载荷、报告、样本库) 写入 work_dir，返回 work_dir
+    必须在导入 fofa_finder.main 等模块、输出第一条日志之前调用
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    Config.OUTPUT_DIR = work_dir
+    Config.LOG_FILE = os.path.join(work_dir, "fofa_finder.log")
+    Config.EVENTS_FILE = os.path.join(work_dir, "events.jsonl")
+    Config.PAYLOAD_DIR = os.path.join(work_dir, "payloads")
+
+    # 重分析中的资质预判会写入样本库
+    from ..learning import sample_store
+    sample_store.STORE_FILE = os.path.join(work_dir, "samples.db")
+    return work_dir
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+本地 FOFA / DeepSeek 模拟服务 (离线基准测试与 CI)
+
+覆盖的接口:
+    GET  /api/v1/search/all      FofaClient.search_official
+    GET  /api/v1/info/my         FofaClient.check_token_status
+    POST /chat/completions       Analyzer / augment_data (兼容 /v1 前缀)
+    GET  /user/balance           Analyzer.get_account_balance
+
+用法:
+    python -m fofa_finder.mock --port 8800 --latency 0.2 --rate-limit-rate 0.05
+    python -m fofa_finder.mock --run --companies 20          # 启动服务并完整跑一遍 main() (输出写入临时目录或 --output-dir)
+"""
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from . import synthetic
+
+FOFA_FIELDS = "host,ip,port,title,protocol,country_name,region_name,city_name"
+
+
+class MockState:
+    """
+    模拟服务的行为参数与运行状态 (各请求线程共享)
+
+    latency / jitter:   每个请求的固定延迟 + 随机抖动 (秒)
+    error_rate:         返回 HTTP 500 的概率
+    rate_limit_rate:    返回 HTTP 429 的概率
+    quota:              每个 FOFA Key 可用的查询次数 (0 = 不限)，用尽后返回 820031 错误
+    result_size:        每次 FOFA 查询返回的资产数 (int 或 (min, max))
+    bad_json_rate:      DeepSeek 回复夹杂非 JSON 文本的概率 (触发解析兜底)
+    balance:            DeepSeek 初始余额 (元)，按 token 扣费，用尽后返回 402
+    """
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, quota=0,
+                 result_size=(20, 200), bad_json_rate=0.0, balance=100.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota = quota
+        self.result_size = result_size
+        self.bad_json_rate = bad_json_rate
+        self.balance = balance
+        self.seed = seed
+
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.fofa_used = {}
+        self.requests = {}
+
+    def roll(self, rate):
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def delay(self):
+        seconds = self.latency
+        if self.jitter:
+            with self._lock:
+                seconds += self._rng.uniform(0, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def hit(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def use_quota(self, key):
+        """
+        记一次查询，返回是否仍在配额内
+        """
+        with self._lock:
+            used = self.fofa_used.get(key, 0)
+            if self.quota and used >= self.quota:
+                return False
+            self.fofa_used[key] = used + 1
+            return True
+
+    def remaining(self, key):
+        with self._lock:
+            return max(self.quota - self.fofa_used.get(key, 0), 0) if self.quota else 10000
+
+    def charge(self, usage):
+        """
+        按 DeepSeek 定价 (输入 2 元/百万，输出 8 元/百万) 扣减余额，余额不足返回 False
+        """
+        cost = (usage["prompt_tokens"] / 1_000_000 * 2.0) + (usage["completion_tokens"] / 1_000_000 * 8.0)
+        with self._lock:
+            if self.balance <= 0:
+                return False
+            self.balance -= cost
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_failure(self):
+        """
+        按配置注入 500 / 429，已响应时返回 True
+        """
+        if self.state.roll(self.state.error_rate):
+            self._send(500, {"error": True, "errmsg": "mock internal error"})
+            return True
+        if self.state.roll(self.state.rate_limit_rate):
+            self._send(429, {"error": True, "errmsg": "mock rate limited"})
+            return True
+        return False
+
+    def _route(self):
+        path = urllib.parse.urlparse(self.path).path.rstrip("/")
+        if path.startswith("/v1/"):
+            path = path[len("/v1"):]
+        return path
+
+    def do_GET(self):
+        path = self._route()
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        self.state.hit(path)
+        self.state.delay()
+
+        if path == "/api/v1/search/all":
+            if self._inject_failure():
+                return
+            self._fofa_search(params)
+        elif path == "/api/v1/info/my":
+            if not params.get("key"):
+                self._send(200, {"error": True, "errmsg": "[-700] 账号无效"})
+                return
+            self._send(200, {"error": False, "email": params.get("email", ""), "isvip": True, "vip_level": 2,
+                             "fcoin": 0, "remain_api_query": self.state.remaining(params["key"])})
+        elif path == "/user/balance":
+            if not self._authorized():
+                return
+            balance = max(self.state.balance, 0)
+            self._send(200, {"is_available": balance > 0, "balance_infos": [{
+                "currency": "CNY", "total_balance": f"{balance:.2f}",
+                "granted_balance": "0.00", "topped_up_balance": f"{balance:.2f}"}]})
+        else:
+            self._send(404, {"error": True, "errmsg": f"unknown endpoint {path}"})
+
+    def do_POST(self):
+        path = self._route()
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        self.state.hit(path)
+        self.state.delay()
+
+        if path != "/chat/completions":
+            self._send(404, {"error": True, "errmsg": f"unknown endpoint {path}"})
+            return
+        if not self._authorized() or self._inject_failure():
+            return
+        try:
+            request = json.loads(raw or b"{}")
+        except ValueError:
+            self._send(400, {"error": {"message": "invalid JSON body"}})
+            return
+        self._chat(request)
+
+    def _authorized(self):
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._send(401, {"error": {"message": "Authentication Fails"}})
+            return False
+        return True
+
+    def _fofa_search(self, params):
+        key = params.get("key")
+        if not key:
+            self._send(200, {"error": True, "errmsg": "[-700] 账号无效"})
+            return
+        if not self.state.use_quota(key):
+            self._send(200, {"error": True, "errmsg": "[820031] F点余额不足"})
+            return
+        try:
+            query = base64.b64decode(params.get("qbase64", "")).decode("utf-8")
+        except ValueError:
+            self._send(200, {"error": True, "errmsg": "[820000] 查询语法错误"})
+            return
+        fields = (params.get("fields") or FOFA_FIELDS).split(",")
+        size = int(params.get("size") or 100)
+        results = synthetic.fofa_results(query, fields, size, self.state.result_size, self.state.seed)
+        self._send(200, {"error": False, "mode": "extended", "page": 1, "query": query,
+                         "size": len(results), "results": results})
+
+    def _chat(self, request):
+        messages = request.get("messages") or []
+        content = synthetic.chat_reply(messages)
+        if self.state.roll(self.state.bad_json_rate):
+            content = synthetic.break_json(content)
+        usage = synthetic.usage_for(messages, content)
+        if not self.state.charge(usage):
+            self._send(402, {"error": {"message": "Insufficient Balance"}})
+            return
+        self._send(200, {
+            "id": f"mock-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "deepseek-chat"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+
+class MockServer:
+    """
+    在后台线程运行的模拟服务 (FOFA 与 DeepSeek 共用一个端口)
+    """
+    def __init__(self, host="127.0.0.1", port=0, **options):
+        self.host = host
+        self.port = port
+        self.state = MockState(**options)
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self._server.server_address[1]}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.state = self.state
+        threading.Thread(target=self._server.serve_forever, name="MockServer", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def configure(self, keys=1):
+        """
+        将 Config 指向本服务 (API 模式，keys 个模拟 FOFA Key)
+        """
+        from ..config import Config
+        Config.FOFA_MODE = 'api'
+        Config.FOFA_API_URL = f"{self.url}/api/v1/search/all"
+        Config.FOFA_API_KEYS = [{"email": f"mock{i}@example.com", "key": f"mock-key-{i}"} for i in range(keys)]
+        Config.DEEPSEEK_BASE_URL = self.url
+        Config.DEEPSEEK_API_KEY = "mock-deepseek-key"
+        return self
+
+
+def _result_size(value):
+    if "-" in value:
+        low, high = value.split("-", 1)
+        return int(low), int(high)
+    return int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock FOFA / DeepSeek server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800, help="0 = pick a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fixed delay per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay per request, uniform 0..N seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of an HTTP 429")
+    parser.add_argument("--quota", type=int, default=0, help="FOFA queries allowed per key (0 = unlimited)")
+    parser.add_argument("--result-size", type=_result_size, default=(20, 200), help="Assets per FOFA query, N or MIN-MAX")
+    parser.add_argument("--bad-json-rate", type=float, default=0.0, help="Probability of a non-JSON DeepSeek reply")
+    parser.add_argument("--balance", type=float, default=100.0, help="Initial DeepSeek balance (CNY)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keys", type=int, default=1, help="Number of mock FOFA keys (for --run)")
+    parser.add_argument("--run", action="store_true", help="Run fofa_finder.main end to end against the mock, then exit")
+    parser.add_argument("--companies", type=int, default=5, help="Synthetic companies for --run")
+    parser.add_argument("--sleep-scale", type=float, default=0.0, help="Config.SLEEP_SCALE for --run (0 = no rate-limit sleeps)")
+    parser.add_argument("--output-dir", help="Output directory for --run (default: a new temporary directory)")
+    args, main_args = parser.parse_known_args(argv)
+
+    server = MockServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, quota=args.quota,
+                        result_size=args.result_size, bad_json_rate=args.bad_json_rate,
+                        balance=args.balance, seed=args.seed).start()
+
+    if not args.run:
+        if main_args:
+            parser.error(f"unrecognized arguments: {' '.join(main_args)}")
+        print(f"Mock server listening on {server.url}")
+        print(f"  Config.FOFA_API_URL      = '{server.url}/api/v1/search/all'")
+        print(f"  Config.DEEPSEEK_BASE_URL = '{server.url}'")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+        return 0
+
+    import os
+    import tempfile
+    from ..config import Config
+    from .sandbox import redirect_output
+
+    # 合成数据不能进入真实的 output/ (manifest、事件流、载荷库会被学习脚本当作训练数据读取)
+    work_dir = redirect_output(os.path.abspath(args.output_dir) if args.output_dir else tempfile.mkdtemp(prefix="fofa_mock_"))
+    from .. import main as app
+
+    server.configure(keys=args.keys)
+    Config.SLEEP_SCALE = args.sleep_scale
+    Config.INPUT_FILE = synthetic.write_company_list(os.path.join(work_dir, "company_list.xlsx"), args.companies, args.seed)
+    try:
+        app.main(["--skip-learning"] + main_args)
+    finally:
+        server.stop()
+    print(json.dumps({"requests": server.state.requests, "fofa_used": server.state.fofa_used,
+                      "balance": round(server.state.balance, 4), "output_dir": work_dir}, ensure_ascii=False), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
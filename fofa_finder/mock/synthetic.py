@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+合成数据: 公司名、FOFA 资产、DeepSeek 回复
+同一 seed + 同一输入总是得到相同输出，便于基准测试复现
+"""
+import re
+import json
+import random
+import hashlib
+
+BRANDS = [
+    "云图", "数盾", "星链", "智联", "蓝鲸", "天枢", "易维", "锐捷", "恒信", "华创",
+    "极光", "联析", "启明", "安络", "紫金", "海纳", "北斗", "凌云", "卓越", "鼎新",
+]
+CITIES = ["北京", "上海", "深圳", "杭州", "成都", "南京", "武汉", "西安"]
+TECH_SUFFIXES = ["科技", "软件", "网络科技", "信息技术", "数据科技", "云计算"]
+TRADITIONAL_SUFFIXES = ["房地产开发", "餐饮管理", "物流", "投资管理"]
+SCOPES = [
+    "计算机软硬件开发；信息技术咨询服务；系统集成",
+    "互联网信息服务；大数据处理；云计算平台运营",
+    "软件开发；网站建设；人工智能应用软件开发",
+    "房地产开发经营；物业管理",
+]
+
+# 资产标题模板: 业务系统 (含 CNVD 重点)、普通站点与噪音
+TITLE_TEMPLATES = [
+    "{brand}协同办公OA系统", "{brand} SSL VPN 登录", "{brand}后台管理系统", "{brand}CRM客户管理平台",
+    "{brand}ERP系统 - 登录", "Whitelabel Error Page", "{brand}官方网站", "{brand}开发者文档中心",
+    "{brand}招聘门户", "{brand}数据可视化大屏", "欢迎使用 nginx!", "{brand}导航 - 网址大全",
+    "澳门在线博彩投注平台", "403 Forbidden", "",
+]
+# 模拟审计结论: 含噪音词的标题剔除，含重点词的标题列为 CNVD 候选
+JUNK_WORDS = ("nginx", "导航", "博彩", "Forbidden")
+CNVD_WORDS = ("OA", "VPN", "后台", "CRM", "ERP", "登录", "Error Page")
+
+
+def _rng(*parts):
+    digest = hashlib.md5("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _brand_of(text):
+    for brand in BRANDS:
+        if brand in text:
+            return brand
+    return BRANDS[0]
+
+
+# ---------- 公司列表 ----------
+
+def company_rows(count, seed=0):
+    """
+    生成公司列表 (企业名称, 实缴资本, 经营范围)，约 1/5 为传统行业
+    """
+    rng = _rng("companies", seed)
+    rows = []
+    for i in range(count):
+        brand = BRANDS[i % len(BRANDS)] + (str(i // len(BRANDS)) if i >= len(BRANDS) else "")
+        city = rng.choice(CITIES)
+        if i % 5 == 4:
+            name = f"{city}{brand}{rng.choice(TRADITIONAL_SUFFIXES)}有限公司"
+            scope = SCOPES[-1]
+        else:
+            name = f"{city}{brand}{rng.choice(TECH_SUFFIXES)}有限公司"
+            scope = rng.choice(SCOPES[:-1])
+        capital = f"{rng.randint(6000, 50000)}万人民币"
+        rows.append({"企业名称": name, "实缴资本": capital, "经营范围": scope})
+    return rows
+
+
+def write_company_list(path, count, seed=0):
+    """
+    写出可被 ExcelLoader 直接读取的公司列表 Excel
+    """
+    import pandas as pd
+    pd.DataFrame(company_rows(count, seed)).to_excel(path, index=False)
+    return path
+
+
+# ---------- FOFA ----------
+
+def fofa_results(query, fields, size, result_size, seed=0):
+    """
+    按查询语句生成资产 (list of lists，列顺序与 fields 一致)
+    result_size: 每次查询返回的条数 (int 或 (min, max))
+    """
+    rng = _rng("fofa", seed, query)
+    if isinstance(result_size, (tuple, list)):
+        count = rng.randint(result_size[0], result_size[1])
+    else:
+        count = result_size
+    count = min(count, size)
+    brand = _brand_of(query)
+    domain = hashlib.md5(query.encode("utf-8")).hexdigest()[:8]
+
+    results = []
+    for i in range(count):
+        template = rng.choice(TITLE_TEMPLATES)
+        port = rng.choice([80, 443, 8080, 8443, 7001, 9090])
+        host = f"{'https://' if port in (443, 8443) else ''}n{i}.{domain}.example.com:{port}"
+        values = {
+            "host": host,
+            "ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "port": str(port),
+            "title": template.format(brand=brand),
+            "protocol": "https" if port in (443, 8443) else "http",
+            "country_name": "China",
+            "region_name": "Beijing",
+            "city_name": "Beijing",
+        }
+        results.append([values.get(f, "") for f in fields])
+    return results
+
+
+# ---------- DeepSeek ----------
+
+def _audit_reply(prompt):
+    match = re.search(r"资产列表 \(ID: Title\):\s*(\[.*\])\s*请执行", prompt, re.S)
+    items = json.loads(match.group(1)) if match else []
+    valid_ids, cnvd_ids = [], []
+    for item in items:
+        title = str(item.get("title", ""))
+        if title in ("", "N/A") or any(w in title for w in JUNK_WORDS):
+            continue
+        valid_ids.append(item["id"])
+        if any(w in title for w in CNVD_WORDS):
+            cnvd_ids.append(item["id"])
+    return {
+        "valid_ids": valid_ids,
+        "cnvd_candidates": cnvd_ids,
+        "summary": f"共 {len(items)} 条资产，保留 {len(valid_ids)} 条业务系统 (合成数据)。",
+        "cnvd_strategy": "优先测试 OA、VPN 与后台管理系统的弱口令和未授权访问 (合成数据)。",
+    }
+
+
+def _company_in(prompt):
+    match = re.search(r'公司(?:名称)? "(.+?)"', prompt)
+    return match.group(1) if match else ""
+
+
+def chat_reply(messages):
+    """
+    根据 prompt 类型返回合成回复内容 (字符串)
+    支持: 资产审计 (Analyzer.analyze_with_ai)、名称拆分、资质预判、相关性验证
+    """
+    prompt = messages[-1].get("content", "") if messages else ""
+
+    if "valid_ids" in prompt:
+        return "```json\n" + json.dumps(_audit_reply(prompt), ensure_ascii=False) + "\n```"
+
+    company = _company_in(prompt)
+    if "核心关键词" in prompt:
+        short = re.sub(r"^(北京|上海|深圳|杭州|成都|南京|武汉|西安)", "", company)
+        short = re.sub(r"(有限公司|股份|公司)$", "", short)
+        return json.dumps([_brand_of(company), short], ensure_ascii=False)
+    if "is_relevant" in prompt:
+        return json.dumps({"is_relevant": True, "confidence": 80, "reason": "标题包含品牌词 (合成数据)"}, ensure_ascii=False)
+    if "eligible" in prompt:
+        eligible = not any(s in company for s in TRADITIONAL_SUFFIXES)
+        reason = "技术驱动型企业 (合成数据)" if eligible else "传统行业 (合成数据)"
+        return json.dumps({"eligible": eligible, "reason": reason}, ensure_ascii=False)
+    return "{}"
+
+
+def break_json(content):
+    """
+    模拟模型输出格式错误 (在 JSON 前后夹杂说明文字)，触发解析兜底路径
+    """
+    return "好的，以下是分析结果：\n" + content.replace("```json", "").replace("```", "") + "\n以上。"
+
+
+def usage_for(messages, content):
+    """
+    粗略估算 token 用量 (约 2 字符 / token)
+    """
+    prompt_chars = sum(len(m.get("content", "")) for m in messages)
+    return {
+        "prompt_tokens": max(1, prompt_chars // 2),
+        "completion_tokens": max(1, len(content) // 2),
+        "total_tokens": max(1, prompt_chars // 2) + max(1, len(content) // 2),
+    }
@@ -5,15 +5,24 @@ import time
 import pandas as pd
 import re
 import os
-import csv
+import atexit
+import threading
 from collections import Counter
 from .logger import setup_logger
 from .local_engine import LocalEngine
+from .payload_store import capture_exchange
+from . import events
+from . import metrics
 from ..config import Config
 
 logger = setup_logger("Analyzer")
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-COMPANY_DATASET_FILE = os.path.join(BASE_DIR, "fofa_finder", "learning", "company_dataset.csv")
+
+def count_tokens(call, usage):
+    """
+    DeepSeek Token 用量计数 (按调用类型区分)
+    """
+    metrics.count("deepseek_tokens", usage.get('prompt_tokens', 0), call=call, type="prompt")
+    metrics.count("deepseek_tokens", usage.get('completion_tokens', 0), call=call, type="completion")
 
 class Analyzer:
     def __init__(self):
@@ -22,6 +31,12 @@ class Analyzer:
         self.local_engine = LocalEngine() # Init local model
         self.use_local_model_fallback = True # Enable fallback
         self.force_local_model = Config.USE_LOCAL_AI # Force mode from config
+        # 在线模型的待更新标签: 攒够 ONLINE_UPDATE_BATCH 条或超过 ONLINE_UPDATE_INTERVAL 秒后一次 partial_fit + 发布
+        self._online_pending = []
+        self._online_flushed = time.time()
+        self._online_lock = threading.Lock()
+        if Config.ONLINE_LEARNING:
+            atexit.register(self.flush_online_updates)
         
         if self.force_local_model:
             logger.info("已启用强制本地 AI 模式 (Force Local AI Mode)")
@@ -66,15 +81,17 @@ class Analyzer:
             logger.error(f"查询余额异常: {e}")
             return "异常"
 
+    @metrics.timed("analyzer.check_company_eligibility")
     def check_company_eligibility(self, company_name):
         """
         AI 预判：公司是否具备 CNVD 挖掘价值
         """
         # 如果强制本地模式，使用本地模型
         if self.force_local_model:
-            return self.local_engine.predict_company_eligibility(company_name)
+            return self._local_eligibility(company_name)
             
         logger.info(f"正在进行公司资质预判: {company_name}")
+        started = time.time()
         
         prompt = f"""
         请分析公司 "{company_name}" 的业务属性，判断其是否适合作为 CNVD (国家信息安全漏洞共享平台) 的通用型漏洞挖掘对象。
@@ -95,13 +112,15 @@ class Analyzer:
         messages = [{"role": "user", "content": prompt}]
         
         try:
+            body = {"model": "deepseek-chat", "messages": messages, "temperature": 0.1}
             response = requests.post(
                 f"{self.base_url}/chat/completions",
                 headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
                 # 使用 deepseek-chat 快速判断，temperature 设低一点保证稳定性
-                json={"model": "deepseek-chat", "messages": messages, "temperature": 0.1},
+                json=body,
                 timeout=30
             )
+            capture_exchange(logger, "DeepSeek eligibility", body, response)
             
             if response.status_code == 200:
                 result = response.json()
@@ -117,38 +136,77 @@ class Analyzer:
                     reason = data.get('reason', 'AI 未提供理由')
                     
                     logger.info(f"资质预判结果: {eligible} - {reason}")
+                    count_tokens("eligibility", usage)
+                    events.emit(events.ELIGIBILITY, company=company_name, eligible=bool(eligible), reason=reason,
+                                source="deepseek", usage=usage, elapsed=round(time.time() - started, 3))
                     self._save_company_training_data(company_name, eligible, reason)
                     return eligible, reason, usage
                 except json.JSONDecodeError:
                     logger.warning(f"AI 预判返回格式错误: {content}")
+                    events.emit(events.ELIGIBILITY, company=company_name, eligible=False, reason=content,
+                                source="parse_error", usage=usage, elapsed=round(time.time() - started, 3))
                     # 兜底：如果解析失败，为了不误杀，暂且返回 True? 或者 False?
                     # 考虑到要省钱，返回 False 比较安全，但在日志里记录警告
                     return False, "解析失败 (保守跳过)", usage
             else:
                 logger.error(f"预判 API 请求失败: {response.status_code}")
+                events.emit(events.ELIGIBILITY, company=company_name, eligible=False, reason=f"HTTP {response.status_code}",
+                            source="api_error", usage={}, elapsed=round(time.time() - started, 3))
                 return False, "API Error", {}
                 
         except Exception as e:
             logger.error(f"预判异常: {e}")
             if self.use_local_model_fallback:
                 logger.warning("API 预判失败，切换至本地模型...")
-                return self.local_engine.predict_company_eligibility(company_name)
+                return self._local_eligibility(company_name)
             return False, f"Exception: {e}", {}
 
+    def _local_eligibility(self, company_name):
+        """
+        本地模型预判 (并记录事件，source=local 的结果不作为训练标签)
+        """
+        started = time.time()
+        eligible, reason, usage = self.local_engine.predict_company_eligibility(company_name)
+        events.emit(events.ELIGIBILITY, company=company_name, eligible=bool(eligible), reason=reason,
+                    source="local", usage={}, elapsed=round(time.time() - started, 3))
+        return eligible, reason, usage
+
     def _save_company_training_data(self, company, eligible, reason):
         """
-        保存公司资质预判数据到 CSV (Active Learning)
+        保存公司资质预判数据到样本库 (Active Learning)
         """
         try:
-            file_exists = os.path.exists(COMPANY_DATASET_FILE)
-            with open(COMPANY_DATASET_FILE, 'a', newline='', encoding='utf-8-sig') as f:
-                writer = csv.writer(f)
-                if not file_exists:
-                    writer.writerow(['company', 'label', 'reason'])
-                writer.writerow([company, 1 if eligible else 0, reason])
+            # 并行重分析时多个线程同时写入: 每次调用独立的 SQLite 连接
+            from fofa_finder.learning import sample_store
+            sample_store.add("company", company, 1 if eligible else 0, "analyzer", reason)
         except Exception as e:
             logger.error(f"保存训练数据失败: {e}")
+            return
+
+        if Config.ONLINE_LEARNING:
+            with self._online_lock:
+                self._online_pending.append((company, 1 if eligible else 0))
+                due = (len(self._online_pending) >= Config.ONLINE_UPDATE_BATCH
+                       or time.time() - self._online_flushed >= Config.ONLINE_UPDATE_INTERVAL)
+            if due:
+                self.flush_online_updates()
+
+    def flush_online_updates(self):
+        """
+        把攒下的资质标签一次性增量更新到在线模型 (扫描结束 / 进程退出时也会调用)
+        """
+        with self._online_lock:
+            pending, self._online_pending = self._online_pending, []
+            self._online_flushed = time.time()
+        if not pending:
+            return
+        try:
+            from fofa_finder.learning import online_model
+            online_model.update("company", [c for c, _ in pending], [l for _, l in pending])
+        except Exception as e:
+            logger.error(f"在线模型增量更新失败: {e}")
 
+    @metrics.timed("analyzer.extract_assets", items=len)
     def extract_assets(self, raw_data):
         """
         从 FOFA 原始响应中提取资产列表
@@ -201,6 +259,7 @@ class Analyzer:
             
         return assets
 
+    @metrics.timed("analyzer.filter_junk_assets", items=len)
     def filter_junk_assets(self, assets):
         """
         本地过滤垃圾资产 (博彩、色情等)
@@ -266,12 +325,14 @@ class Analyzer:
         else:
             return False, f"最大指纹数量 {count} <= {Config.FINGERPRINT_THRESHOLD}"
 
+    @metrics.timed("analyzer.split_company_name")
     def split_company_name(self, company_name):
         """
         使用 DeepSeek 将公司全称拆分为查询关键字
         例如: "北京放心科技服务有限公司" -> ["放心科技", "放心科技服务"]
         """
         logger.info(f"正在拆分公司名称: {company_name}")
+        started = time.time()
         
         prompt = f"""
         请提取公司名称 "{company_name}" 的核心关键词，用于搜索引擎检索。
@@ -290,13 +351,15 @@ class Analyzer:
         messages = [{"role": "user", "content": prompt}]
         
         try:
+            body = {"model": "deepseek-chat", "messages": messages, "temperature": 0.1}
             response = requests.post(
                 f"{self.base_url}/chat/completions",
                 headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
                 # 使用 deepseek-chat (无思考) 节省时间
-                json={"model": "deepseek-chat", "messages": messages, "temperature": 0.1},
+                json=body,
                 timeout=30
             )
+            capture_exchange(logger, "DeepSeek split", body, response)
             
             if response.status_code == 200:
                 result = response.json()
@@ -307,6 +370,9 @@ class Analyzer:
                     keywords = json.loads(content)
                     if isinstance(keywords, list):
                         logger.info(f"生成关键词: {keywords}")
+                        count_tokens("split", result.get('usage', {}))
+                        events.emit(events.SPLIT_KEYWORDS, company=company_name, keywords=keywords, source="deepseek",
+                                    usage=result.get('usage', {}), elapsed=round(time.time() - started, 3))
                         return keywords
                 except json.JSONDecodeError:
                     logger.warning(f"AI 返回格式错误: {content}")
@@ -319,7 +385,10 @@ class Analyzer:
             
         # Fallback: 简单的规则拆分
         short_name = company_name.replace("北京", "").replace("有限公司", "").replace("股份", "").replace("科技", "")
-        return [short_name] if short_name else [company_name]
+        keywords = [short_name] if short_name else [company_name]
+        events.emit(events.SPLIT_KEYWORDS, company=company_name, keywords=keywords, source="fallback",
+                    usage={}, elapsed=round(time.time() - started, 3))
+        return keywords
 
     def _extract_json_from_text(self, text):
         """
@@ -357,6 +426,7 @@ class Analyzer:
             
         return None
 
+    @metrics.timed("analyzer.analyze_with_ai")
     def analyze_with_ai(self, company_name, assets):
         """
         调用 DeepSeek 分析资产 (全量模式 - 仅发送 Title)
@@ -375,11 +445,13 @@ class Analyzer:
         
         # 本次实现：在 API 调用失败的 except 块中，尝试本地兜底。
         
+        started = time.time()
         if self.force_local_model:
             logger.info("强制使用本地模型分析 (Offline Mode)...")
-            return self.local_engine.predict_assets(assets)
+            return self._local_audit(company_name, assets, started)
         
         total_assets = len(assets)
+        metrics.add_items(total_assets)
         logger.info(f"正在使用 DeepSeek 分析 {company_name} (全量行数: {total_assets})...")
         
         # 1. 构造精简 Payload (仅 ID 和 Title)
@@ -405,6 +477,8 @@ class Analyzer:
             batch_data = lean_data[batch_start:batch_end]
             
             logger.info(f"  > 处理分批: {batch_start+1} - {batch_end} (共 {len(batch_data)} 条)...")
+            batch_started = time.time()
+            batch_timer = metrics.timer("analyzer.audit_batch", len(batch_data)).start()
             
             asset_text = json.dumps(batch_data, ensure_ascii=False, indent=0)
             
@@ -428,101 +502,118 @@ class Analyzer:
             
             messages = [{"role": "user", "content": prompt}]
             
-            # Retry mechanism for each batch
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = requests.post(
-                        f"{self.base_url}/chat/completions",
-                        headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
-                        json={"model": "deepseek-chat", "messages": messages}, 
-                        timeout=120
-                    )
+            # 所有出口 (成功 / 重试耗尽 / 切换本地模型) 都先结束批次计时，本地审计不计入 audit_batch
+            fallback = False
+            try:
+                # Retry mechanism for each batch
+                max_retries = 3
+                for attempt in range(max_retries):
+                    try:
+                        body = {"model": "deepseek-chat", "messages": messages}
+                        response = requests.post(
+                            f"{self.base_url}/chat/completions",
+                            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+                            json=body, 
+                            timeout=120
+                        )
+                        capture_exchange(logger, f"DeepSeek audit {company_name}", body, response)
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        content = result['choices'][0]['message']['content']
-                        usage = result.get('usage', {'prompt_tokens': 0, 'completion_tokens': 0})
+                        if response.status_code == 200:
+                            result = response.json()
+                            content = result['choices'][0]['message']['content']
+                            usage = result.get('usage', {'prompt_tokens': 0, 'completion_tokens': 0})
                         
-                        # Accumulate Usage (only for successful or last attempt to avoid double counting if we could separate, 
-                        # but actually if we retry, we spend tokens again. So we SHOULD count them if the API charged us.
-                        # Assuming API charges for failed/bad-json responses too.)
-                        total_usage['prompt_tokens'] += usage.get('prompt_tokens', 0)
-                        total_usage['completion_tokens'] += usage.get('completion_tokens', 0)
+                            # Accumulate Usage (only for successful or last attempt to avoid double counting if we could separate, 
+                            # but actually if we retry, we spend tokens again. So we SHOULD count them if the API charged us.
+                            # Assuming API charges for failed/bad-json responses too.)
+                            total_usage['prompt_tokens'] += usage.get('prompt_tokens', 0)
+                            total_usage['completion_tokens'] += usage.get('completion_tokens', 0)
+                            count_tokens("audit", usage)
                         
-                        # Log (Full content)
-                        logger.debug(f"[DeepSeek Response Batch] ({company_name}):\n{content}") 
                         
-                        # Parse JSON
-                        try:
-                            json_str = content
-                            if "```json" in content:
-                                json_str = content.split("```json")[1].split("```")[0]
-                            elif "```" in content:
-                                 json_str = content.split("```")[1].split("```")[0]
+                            # Parse JSON
+                            try:
+                                json_str = content
+                                if "```json" in content:
+                                    json_str = content.split("```json")[1].split("```")[0]
+                                elif "```" in content:
+                                     json_str = content.split("```")[1].split("```")[0]
                             
-                            analysis_data = json.loads(json_str.strip())
+                                analysis_data = json.loads(json_str.strip())
                             
-                            batch_valid_ids = analysis_data.get('valid_ids', [])
-                            batch_cnvd_ids = analysis_data.get('cnvd_candidates', [])
+                                batch_valid_ids = analysis_data.get('valid_ids', [])
+                                batch_cnvd_ids = analysis_data.get('cnvd_candidates', [])
                             
-                            all_valid_ids.extend(batch_valid_ids)
-                            all_cnvd_ids.extend(batch_cnvd_ids)
+                                all_valid_ids.extend(batch_valid_ids)
+                                all_cnvd_ids.extend(batch_cnvd_ids)
+                            
+                                if analysis_data.get('summary'):
+                                    combined_summaries.append(analysis_data.get('summary'))
+                                if analysis_data.get('cnvd_strategy'):
+                                    combined_strategies.append(analysis_data.get('cnvd_strategy'))
                             
-                            if analysis_data.get('summary'):
-                                combined_summaries.append(analysis_data.get('summary'))
-                            if analysis_data.get('cnvd_strategy'):
-                                combined_strategies.append(analysis_data.get('cnvd_strategy'))
+                                events.emit(events.BATCH_VERDICT, company=company_name, batch=batch_start // BATCH_SIZE + 1,
+                                            offset=batch_start, size=len(batch_data), valid_ids=batch_valid_ids, cnvd_ids=batch_cnvd_ids,
+                                            attempt=attempt + 1, parsed="json", usage=usage, elapsed=round(time.time() - batch_started, 3))
                                 
-                            # Success! Break retry loop
-                            break
+                                # Success! Break retry loop
+                                break
                             
-                        except json.JSONDecodeError:
-                            # 尝试正则兜底提取
-                            extracted_data = self._extract_json_from_text(content)
-                            if extracted_data:
-                                logger.warning(f"批次 {batch_start} JSON 解析失败，但正则提取成功 (尝试 {attempt+1}/{max_retries})")
-                                batch_valid_ids = extracted_data.get('valid_ids', [])
-                                batch_cnvd_ids = extracted_data.get('cnvd_candidates', [])
-                                all_valid_ids.extend(batch_valid_ids)
-                                all_cnvd_ids.extend(batch_cnvd_ids)
-                                if extracted_data.get('summary'):
-                                    combined_summaries.append(extracted_data.get('summary'))
-                                if extracted_data.get('cnvd_strategy'):
-                                    combined_strategies.append(extracted_data.get('cnvd_strategy'))
-                                break # Success via regex extraction
+                            except json.JSONDecodeError:
+                                # 尝试正则兜底提取
+                                extracted_data = self._extract_json_from_text(content)
+                                if extracted_data:
+                                    logger.warning(f"批次 {batch_start} JSON 解析失败，但正则提取成功 (尝试 {attempt+1}/{max_retries})")
+                                    batch_valid_ids = extracted_data.get('valid_ids', [])
+                                    batch_cnvd_ids = extracted_data.get('cnvd_candidates', [])
+                                    all_valid_ids.extend(batch_valid_ids)
+                                    all_cnvd_ids.extend(batch_cnvd_ids)
+                                    if extracted_data.get('summary'):
+                                        combined_summaries.append(extracted_data.get('summary'))
+                                    if extracted_data.get('cnvd_strategy'):
+                                        combined_strategies.append(extracted_data.get('cnvd_strategy'))
+                                    events.emit(events.BATCH_VERDICT, company=company_name, batch=batch_start // BATCH_SIZE + 1,
+                                                offset=batch_start, size=len(batch_data), valid_ids=batch_valid_ids, cnvd_ids=batch_cnvd_ids,
+                                                attempt=attempt + 1, parsed="regex", usage=usage, elapsed=round(time.time() - batch_started, 3))
+                                    break # Success via regex extraction
                             
-                            logger.warning(f"批次 {batch_start} JSON 解析失败 (尝试 {attempt+1}/{max_retries})")
-                            if attempt == max_retries - 1:
-                                logger.error(f"批次 {batch_start} 最终解析失败，跳过该批次数据")
-                            else:
-                                time.sleep(2) # Wait before retry
-                                continue
-                    else:
-                        logger.error(f"DeepSeek API 错误 (Batch {batch_start}): {response.status_code}")
+                                logger.warning(f"批次 {batch_start} JSON 解析失败 (尝试 {attempt+1}/{max_retries})")
+                                if attempt == max_retries - 1:
+                                    logger.error(f"批次 {batch_start} 最终解析失败，跳过该批次数据")
+                                else:
+                                    metrics.pause(2) # Wait before retry
+                                    continue
+                        else:
+                            logger.error(f"DeepSeek API 错误 (Batch {batch_start}): {response.status_code}")
                         
-                        # 402 Payment Required or 401 Unauthorized -> Switch to Local Model
-                        if response.status_code in [402, 401] and self.use_local_model_fallback:
-                            logger.warning("API 余额不足或未授权，切换至本地模型引擎...")
-                            return self.local_engine.predict_assets(assets)
+                            # 402 Payment Required or 401 Unauthorized -> Switch to Local Model
+                            if response.status_code in [402, 401] and self.use_local_model_fallback:
+                                logger.warning("API 余额不足或未授权，切换至本地模型引擎...")
+                                fallback = True
+                                break
                             
+                            if attempt < max_retries - 1:
+                                metrics.pause(2)
+                                continue
+                        
+                    except Exception as e:
+                        logger.error(f"AI 分析异常 (Batch {batch_start}): {e}")
                         if attempt < max_retries - 1:
-                            time.sleep(2)
+                            metrics.pause(2)
                             continue
-                        
-                except Exception as e:
-                    logger.error(f"AI 分析异常 (Batch {batch_start}): {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
-                        continue
-                    else:
-                        # Final attempt failed -> Try Local Model as last resort
-                        if self.use_local_model_fallback:
-                            logger.warning("API 多次重试失败，切换至本地模型引擎...")
-                            return self.local_engine.predict_assets(assets)
+                        else:
+                            # Final attempt failed -> Try Local Model as last resort
+                            if self.use_local_model_fallback:
+                                logger.warning("API 多次重试失败，切换至本地模型引擎...")
+                                fallback = True
+                                break
+            finally:
+                batch_timer.stop()
+            if fallback:
+                return self._local_audit(company_name, assets, started)
             
             # Rate limit between batches (outside retry loop)
-            time.sleep(2)
+            metrics.pause(2)
             
         # 4. 聚合结果
         # Deduplicate IDs just in case
@@ -546,9 +637,20 @@ class Analyzer:
         
         logger.info(f"AI 清洗完成 (聚合): 原始 {total_assets} -> 有效 {len(clean_assets)} -> CNVD重点 {len(cnvd_assets)}")
         logger.info(f"Total Token Usage: {total_usage}")
+        events.emit(events.AUDIT_RESULT, company=company_name, total=total_assets, valid=len(clean_assets),
+                    cnvd=len(cnvd_assets), source="deepseek", usage=total_usage, elapsed=round(time.time() - started, 3))
         
         return clean_assets, cnvd_assets, total_usage, final_analysis_data
 
+    def _local_audit(self, company_name, assets, started):
+        """
+        本地模型审计 (并记录事件)
+        """
+        clean_assets, cnvd_assets, usage, analysis_data = self.local_engine.predict_assets(assets)
+        events.emit(events.AUDIT_RESULT, company=company_name, total=len(assets), valid=len(clean_assets),
+                    cnvd=len(cnvd_assets), source="local", usage={}, elapsed=round(time.time() - started, 3))
+        return clean_assets, cnvd_assets, usage, analysis_data
+
     def check_relevance_with_ai(self, company_name, assets):
         """
         验证资产是否与公司相关 (用于放宽查询后的验证)
@@ -583,13 +685,15 @@ class Analyzer:
         messages = [{"role": "user", "content": prompt}]
         
         try:
+            body = {"model": "deepseek-chat", "messages": messages, "temperature": 0.1}
             response = requests.post(
                 f"{self.base_url}/chat/completions",
                 headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
                 # 使用 deepseek-chat 快速判断
-                json={"model": "deepseek-chat", "messages": messages, "temperature": 0.1},
+                json=body,
                 timeout=30
             )
+            capture_exchange(logger, "DeepSeek relevance", body, response)
             
             if response.status_code == 200:
                 result = response.json()
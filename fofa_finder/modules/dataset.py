@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import threading
+from .logger import setup_logger
+from .storage import append_member, member_ref, read_member
+from ..config import Config
+
+logger = setup_logger("Dataset")
+
+INDEX_FILENAME = "company_index.jsonl"
+
+
+class RunDataset:
+    """
+    会话级合并数据集: 所有公司追加写入少量分片文件，并维护公司索引
+
+    目录结构:
+        dataset/
+            raw-00000.jsonl.gz        每家公司一个独立的 gzip member
+            analysis-00000.jsonl.gz
+            report-00000.jsonl.gz
+            company_index.jsonl       {"company", "kind", "part", "offset", "length", "rows", "time"}
+
+    分片超过 Config.DATASET_PART_MB 后滚动到下一个编号
+    """
+    def __init__(self, root_dir, part_bytes=None):
+        self.root_dir = root_dir
+        self.index_file = os.path.join(root_dir, INDEX_FILENAME)
+        self.part_bytes = part_bytes or Config.DATASET_PART_MB * 1024 * 1024
+        self._parts = {}
+        self._lock = threading.Lock()
+
+        if not os.path.exists(root_dir):
+            os.makedirs(root_dir)
+
+    def _part_path(self, kind, number):
+        return os.path.join(self.root_dir, f"{kind}-{number:05d}.jsonl.gz")
+
+    def _current_part(self, kind):
+        """
+        返回当前可写入的分片路径 (超过大小上限时滚动)
+        """
+        number = self._parts.get(kind)
+        if number is None:
+            number = 0
+            while os.path.exists(self._part_path(kind, number + 1)):
+                number += 1
+        path = self._part_path(kind, number)
+        if os.path.exists(path) and os.path.getsize(path) >= self.part_bytes:
+            number += 1
+            path = self._part_path(kind, number)
+        self._parts[kind] = number
+        return path
+
+    def append(self, company_name, kind, tables):
+        """
+        追加一家公司的数据 (tables: {表名: DataFrame/list[dict]})
+        返回可被 storage.read_table 读取的分片引用
+        """
+        rows = sum(len(data) for data in tables.values())
+        with self._lock:
+            part = self._current_part(kind)
+            offset, length = append_member(part, tables)
+            entry = {
+                "company": company_name,
+                "kind": kind,
+                "part": os.path.basename(part),
+                "offset": offset,
+                "length": length,
+                "rows": rows,
+                "time": time.time(),
+            }
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return member_ref(part, offset, length)
+
+    def entries(self, kind=None):
+        """
+        读取公司索引 (按写入顺序)
+        """
+        result = []
+        if not os.path.exists(self.index_file):
+            return result
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程中断时可能残留半行
+                    continue
+                if kind is None or entry.get("kind") == kind:
+                    result.append(entry)
+        return result
+
+    def ref(self, entry):
+        return member_ref(os.path.join(self.root_dir, entry["part"]), entry["offset"], entry["length"])
+
+    def lookup(self, company_name, kind):
+        """
+        返回某公司某类数据的最新索引项 (不存在时返回 None)
+        """
+        found = None
+        for entry in self.entries(kind):
+            if entry.get("company") == company_name:
+                found = entry
+        return found
+
+    def companies(self, kind=None):
+        return sorted({e["company"] for e in self.entries(kind)})
+
+    def read(self, company_name, kind, table=None, columns=None):
+        entry = self.lookup(company_name, kind)
+        if entry is None:
+            raise KeyError(f"数据集中不存在 {company_name} ({kind})")
+        return read_member(os.path.join(self.root_dir, entry["part"]), entry["offset"], entry["length"],
+                           table=table, columns=columns)
+
+
+def session_of(dataset_dir):
+    """
+    数据集所属会话时间戳: realtime/<timestamp>/dataset 或 YYYY/MM/DD/dataset/<timestamp>
+    """
+    if os.path.basename(dataset_dir) == "dataset":
+        return os.path.basename(os.path.dirname(dataset_dir))
+    return os.path.basename(dataset_dir)
+
+
+def find_datasets(output_dir):
+    """
+    递归查找 output 下所有合并数据集目录
+    同一会话的日期归档副本 (YYYY/.../dataset/<timestamp>) 只返回一份，优先 realtime
+    """
+    sessions = {}
+    for root, dirs, files in os.walk(output_dir):
+        if INDEX_FILENAME not in files:
+            continue
+        session = session_of(root)
+        if session not in sessions or "realtime" in root.split(os.sep):
+            sessions[session] = root
+    return sorted(sessions.values())
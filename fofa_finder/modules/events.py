@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from .logger import DeferredQueueHandler
+from ..config import Config
+
+# 事件类型
+ELIGIBILITY = "eligibility"        # 公司资质预判: company, eligible, reason, source
+SPLIT_KEYWORDS = "split_keywords"  # 公司名拆分: company, keywords, source
+BATCH_VERDICT = "batch_verdict"    # 单个审计批次: company, batch, size, valid_ids, cnvd_ids
+AUDIT_RESULT = "audit_result"      # 公司审计汇总: company, total, valid, cnvd, source
+
+# source 取值: deepseek / local / fallback / parse_error / api_error
+
+
+class JsonEventFormatter(logging.Formatter):
+    """
+    record.msg 为事件 dict，序列化为单行 JSON
+    """
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+_logger = None
+_listener = None
+_lock = threading.Lock()
+
+
+def _event_logger():
+    """
+    独立的事件 logger: 只写 Config.EVENTS_FILE，不进入终端与主日志
+    序列化与写盘在后台线程完成
+    """
+    global _logger, _listener
+    with _lock:
+        if _logger is not None:
+            return _logger
+
+        log_dir = os.path.dirname(Config.EVENTS_FILE)
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+
+        handler = logging.FileHandler(Config.EVENTS_FILE, encoding='utf-8')
+        handler.setFormatter(JsonEventFormatter())
+
+        q = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(q, handler)
+        _listener.start()
+        atexit.register(stop_events)
+
+        logger = logging.getLogger("fofa_finder.events")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(DeferredQueueHandler(q, [handler]))
+        _logger = logger
+        return _logger
+
+
+def stop_events():
+    """
+    等待队列中的事件全部写盘后停止后台线程 (进程退出时自动调用)
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def emit(event, **fields):
+    """
+    记录一条结构化事件 (一行 JSON): {"ts", "event", ...fields}
+    """
+    if not Config.EVENTS_ENABLED:
+        return
+    record = {"ts": round(time.time(), 3), "event": event}
+    record.update(fields)
+    _event_logger().info(record)
+
+
+def read_events(path=None, event=None):
+    """
+    流式读取事件文件 (跳过中断时残留的半行)
+    """
+    path = path or Config.EVENTS_FILE
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if event is None or record.get("event") == event:
+                yield record
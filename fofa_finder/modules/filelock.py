@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    跨进程互斥锁 (POSIX flock / Windows msvcrt.locking)，同时也是线程锁
+
+    扫描进程与后台学习进程会同时写同一批文件 (载荷分段、在线模型)，线程锁只能保护进程内:
+        with FileLock(path + ".lock"):
+            ...
+    锁文件只用于加锁，内容为空，可以保留在磁盘上
+    """
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def _acquire(self, f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            return
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue # LK_LOCK 重试 10 次后仍未拿到锁时抛出，继续等待
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            f = open(self.path, "a+b")
+            try:
+                self._acquire(f)
+            except BaseException:
+                f.close()
+                raise
+            self._file = f
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        f, self._file = self._file, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
+            self._thread_lock.release()
+        return False
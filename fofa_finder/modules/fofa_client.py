@@ -4,6 +4,8 @@ import time
 import random
 import urllib.parse
 from .logger import setup_logger
+from .payload_store import capture_exchange
+from . import metrics
 from ..config import Config
 
 logger = setup_logger("FofaClient")
@@ -169,7 +171,7 @@ class FofaClient:
                 return False, "No API Keys configured"
             
             valid_count = 0
-            info_url = "https://fofa.info/api/v1/info/my"
+            info_url = self.api_url.replace("/search/all", "/info/my")
             
             for k in self.api_keys:
                 try:
@@ -253,15 +255,15 @@ class FofaClient:
             }
             
             # Rate limiting sleep
-            time.sleep(2)
+            metrics.pause(2)
             
             try:
                 logger.info(f"正在请求 FOFA API ({email})...")
                 response = requests.get(self.api_url, params=params, timeout=60)
+                metrics.count("fofa_queries", key=email, status=response.status_code)
                 
-                # Log full response in debug
-                logger.debug(f"[API Request URL] {response.url}")
-                logger.debug(f"[API Response] HTTP {response.status_code}\n{response.text}")
+                # Capture request/response bodies (the log only keeps payload ids; credentials are not stored)
+                capture_exchange(logger, "FOFA API", {'query': query, 'size': params['size'], 'fields': params['fields']}, response)
                 
                 if response.status_code == 200:
                     json_resp = response.json()
@@ -279,6 +281,7 @@ class FofaClient:
                             return {}, query # Return empty result to avoid Failover
                         
                         # Switch key for other errors (quota, account invalid)
+                        metrics.count("fofa_key_errors", key=email)
                         self.current_key_index = (self.current_key_index + 1) % total_keys
                         attempts += 1
                         continue
@@ -287,7 +290,8 @@ class FofaClient:
                         return json_resp, query
                 elif response.status_code == 429:
                     logger.warning(f"FOFA API Rate Limit (429) with Key ({email}). Sleeping 5s...")
-                    time.sleep(5)
+                    metrics.count("fofa_rate_limited", key=email)
+                    metrics.pause(5)
                     # Retry once with same key? Or switch? Switch is better if one key is exhausted.
                     # But 429 usually means global IP limit or key limit. Let's switch.
                     self.current_key_index = (self.current_key_index + 1) % total_keys
@@ -344,7 +348,7 @@ class FofaClient:
         # Rate Limiting
         sleep_time = random.uniform(Config.RATE_LIMIT_MIN, Config.RATE_LIMIT_MAX)
         logger.info(f"等待 {sleep_time:.1f} 秒...")
-        time.sleep(sleep_time)
+        metrics.pause(sleep_time)
         
         # Retry loop for interfaces
         attempts = 0
@@ -361,9 +365,10 @@ class FofaClient:
             try:
                 logger.info(f"正在请求 {url}...")
                 response = requests.post(url, headers=headers, data=data, timeout=60)
+                metrics.count("fofa_queries", key=f"web:{self.current_api_index}", status=response.status_code)
                 
-                # 记录原始响应包到文件日志
-                logger.debug(f"[{url}] HTTP {response.status_code} Response: {response.text}")
+                # 记录原始请求/响应包 (日志中只保留载荷 id)
+                capture_exchange(logger, f"FOFA Web {url}", data, response)
                 
                 if response.status_code == 200:
                     try:
@@ -381,11 +386,12 @@ class FofaClient:
             # Switch API
             self.current_api_index = (self.current_api_index + 1) % len(self.apis)
             attempts += 1
-            time.sleep(2) # Short sleep before switching
+            metrics.pause(2) # Short sleep before switching
             
         logger.error(f"所有 API 均请求失败: {query[:30]}...")
         return None, query
 
+    @metrics.timed("fofa.search")
     def search(self, company_name):
         """
         执行搜索
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
-import joblib
 import os
-import pandas as pd
+import time
 from .logger import setup_logger
+from ..config import Config
 
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -13,41 +13,190 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 MODEL_PATH = os.path.join(BASE_DIR, "fofa_finder", "learning", "local_model.pkl")
 COMPANY_MODEL_PATH = os.path.join(BASE_DIR, "fofa_finder", "learning", "company_model.pkl")
 CNVD_MODEL_PATH = os.path.join(BASE_DIR, "fofa_finder", "learning", "cnvd_model.pkl")
+REGISTRY_DIR = os.path.join(BASE_DIR, "fofa_finder", "learning", "registry")
+
+# LocalEngine 模型名 -> 模型注册表中的 kind
+REGISTRY_KINDS = {"model": "local", "company_model": "company", "cnvd_model": "cnvd"}
+
+def family_path(path, family):
+    """
+    同一模型不同实现的发布路径: company_model.pkl -> company_model_linear.pkl
+    'forest' (TF-IDF + RandomForest) 使用原路径
+    """
+    if family == "forest":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{family}{ext}"
+
+def online_path(path):
+    """
+    增量学习模型 (learning/online_model.py) 的发布路径: company_model.pkl -> company_model_online.pkl
+    """
+    return family_path(path, "online")
+
+def mmap_path(path):
+    """
+    内存映射格式 (learning/mmap_model.py) 的导出目录: company_model.pkl -> company_model_mmap/
+    """
+    return os.path.splitext(path)[0] + "_mmap"
+
+def registry_artifact(kind, family, version=None):
+    """
+    模型注册表 (learning/model_registry.py) 中某个版本的模型文件: registry/<kind>/<family>/<version>/model.pkl
+    version 为空时读取 CURRENT 指针，版本不存在时返回 None
+    """
+    family_dir = os.path.join(REGISTRY_DIR, kind, family)
+    if not version:
+        try:
+            with open(os.path.join(family_dir, "CURRENT"), "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+    path = os.path.join(family_dir, version, "model.pkl")
+    return path if version and os.path.exists(path) else None
+
+def registry_version(path):
+    """
+    模型文件 (或其内存映射目录) 对应的注册表版本，例如 'company/forest@v0003'；不在注册表中时返回 None
+    """
+    parts = os.path.relpath(path, REGISTRY_DIR).split(os.sep)
+    if len(parts) < 4 or parts[0] == os.pardir:
+        return None
+    return f"{parts[0]}/{parts[1]}@{parts[2]}"
+
+def _newer_or_same(path, than):
+    try:
+        return os.stat(path).st_mtime_ns >= os.stat(than).st_mtime_ns
+    except OSError:
+        return False
 
 class LocalEngine:
+    """
+    本地模型推理 (资产有效性 / 公司资质 / CNVD 重点)
+    三个模型均在第一次使用时才加载 (joblib + scikit-learn 导入与反序列化较慢)
+    加载后每隔 Config.MODEL_RELOAD_INTERVAL 秒检查模型文件 mtime，文件被重新发布时热加载
+    模型注册表中有版本时优先加载 (Config.LOCAL_MODEL_PINS 固定的版本或 CURRENT 指针)，
+    CURRENT 切换 (新版本发布 / 回滚) 同样会被热加载
+    """
     def __init__(self):
-        self.model = None
-        self.company_model = None
-        self.cnvd_model = None
-        self.load_model()
-        self.load_company_model()
-        self.load_cnvd_model()
+        self._model = None
+        self._company_model = None
+        self._cnvd_model = None
+        self._loaded = set()
+        self._mtimes = {}  # name -> 已加载文件的 (路径, st_mtime_ns)
+        self._checked = {} # name -> 上次检查的 time.monotonic()
+        self.versions = {} # name -> 已加载模型的注册表版本 (不在注册表中时为 None)，写入推理结论
+
+    @staticmethod
+    def _path(name):
+        # 每次调用时读取模块变量 (基准测试会替换为语料模型路径)
+        path = {"model": MODEL_PATH, "company_model": COMPANY_MODEL_PATH, "cnvd_model": CNVD_MODEL_PATH}[name]
+        if Config.ONLINE_LEARNING and os.path.exists(online_path(path)):
+            path = online_path(path)
+        else:
+            # 注册表中所选实现的版本 > 旧路径上的所选实现 > 注册表中的 forest > 旧路径上的 forest
+            family = Config.LOCAL_MODEL_FAMILY
+            legacy = family_path(path, family)
+            path = (LocalEngine._versioned(name, family)
+                    or (legacy if os.path.exists(legacy) else None)
+                    or LocalEngine._versioned(name, "forest")
+                    or path)
+        # 内存映射导出比 .pkl 旧 (模型重新发布后尚未导出) 时仍使用 .pkl
+        if Config.LOCAL_MODEL_MMAP and _newer_or_same(mmap_path(path), path):
+            return mmap_path(path)
+        return path
+
+    @staticmethod
+    def _versioned(name, family):
+        kind = REGISTRY_KINDS[name]
+        # 固定版本只作用于 Config.LOCAL_MODEL_FAMILY，版本不存在时跟随 CURRENT
+        pinned = Config.LOCAL_MODEL_PINS.get(kind) if family == Config.LOCAL_MODEL_FAMILY else None
+        return (pinned and registry_artifact(kind, family, pinned)) or registry_artifact(kind, family)
+
+    @staticmethod
+    def _read(path):
+        if os.path.isdir(path):
+            from fofa_finder.learning.mmap_model import load
+            return load(path)
+        import joblib
+        return joblib.load(path)
+
+    def _mtime(self, name):
+        path = self._path(name)
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _modified(self, name):
+        interval = Config.MODEL_RELOAD_INTERVAL
+        if not interval:
+            return False
+        now = time.monotonic()
+        if now - self._checked.get(name, 0) < interval:
+            return False
+        self._checked[name] = now
+        mtime = self._mtime(name)
+        return mtime is not None and mtime != self._mtimes.get(name)
+
+    def _lazy(self, name, loader):
+        if name not in self._loaded:
+            loader()
+        elif self._modified(name):
+            logger.info(f"检测到模型文件更新，重新加载: {self._path(name)}")
+            loader()
+        return getattr(self, "_" + name)
+
+    def _mark_loaded(self, name):
+        # 在反序列化之前记录 mtime: 加载期间文件再次被替换时，下次检查仍能发现
+        self._loaded.add(name)
+        self._mtimes[name] = self._mtime(name)
+        self._checked[name] = time.monotonic()
+        self.versions[name] = registry_version(self._path(name))
+
+    @property
+    def model(self):
+        return self._lazy("model", self.load_model)
+
+    @property
+    def company_model(self):
+        return self._lazy("company_model", self.load_company_model)
+
+    @property
+    def cnvd_model(self):
+        return self._lazy("cnvd_model", self.load_cnvd_model)
 
     def load_model(self):
-        if os.path.exists(MODEL_PATH):
+        self._mark_loaded("model")
+        path = self._path("model")
+        if os.path.exists(path):
             try:
-                self.model = joblib.load(MODEL_PATH)
-                logger.info(f"本地 AI 模型 (资产) 已加载: {MODEL_PATH}")
+                self._model = self._read(path)
+                logger.info(f"本地 AI 模型 (资产) 已加载: {path}")
             except Exception as e:
                 logger.error(f"加载本地资产模型失败: {e}")
         else:
             logger.warning("未找到本地资产模型文件，请先运行 learning/train_model.py")
 
     def load_company_model(self):
-        if os.path.exists(COMPANY_MODEL_PATH):
+        self._mark_loaded("company_model")
+        path = self._path("company_model")
+        if os.path.exists(path):
             try:
-                self.company_model = joblib.load(COMPANY_MODEL_PATH)
-                logger.info(f"本地 AI 模型 (公司资质) 已加载: {COMPANY_MODEL_PATH}")
+                self._company_model = self._read(path)
+                logger.info(f"本地 AI 模型 (公司资质) 已加载: {path}")
             except Exception as e:
                 logger.error(f"加载本地公司模型失败: {e}")
         else:
             logger.warning("未找到本地公司模型文件，请先运行 learning/train_company_model.py")
 
     def load_cnvd_model(self):
-        if os.path.exists(CNVD_MODEL_PATH):
+        self._mark_loaded("cnvd_model")
+        path = self._path("cnvd_model")
+        if os.path.exists(path):
             try:
-                self.cnvd_model = joblib.load(CNVD_MODEL_PATH)
-                logger.info(f"本地 AI 模型 (CNVD) 已加载: {CNVD_MODEL_PATH}")
+                self._cnvd_model = self._read(path)
+                logger.info(f"本地 AI 模型 (CNVD) 已加载: {path}")
             except Exception as e:
                 logger.error(f"加载本地 CNVD 模型失败: {e}")
         else:
@@ -58,7 +207,8 @@ class LocalEngine:
         使用本地模型预测公司资质
         返回: (eligible: bool, reason: str, usage: dict)
         """
-        if not self.company_model:
+        company_model = self.company_model
+        if not company_model:
             # 如果没有模型，默认通过（Fail-open），以免误杀
             logger.warning("本地公司模型未加载，默认判定为通过")
             return True, "本地模型未加载 (Default Pass)", {}
@@ -67,19 +217,20 @@ class LocalEngine:
             # Predict
             # 1 = Eligible, 0 = Ineligible
             # Input needs to be iterable
-            prediction = self.company_model.predict([company_name])[0]
+            prediction = company_model.predict([company_name])[0]
             
             # Try to get probability if possible
             confidence = "N/A"
-            if hasattr(self.company_model, "predict_proba"):
-                probs = self.company_model.predict_proba([company_name])[0]
+            if hasattr(company_model, "predict_proba"):
+                probs = company_model.predict_proba([company_name])[0]
                 confidence = f"{probs[prediction]:.2f}"
             
             is_eligible = bool(prediction == 1)
-            reason = f"[本地模型] 判定{'通过' if is_eligible else '拒绝'} (置信度: {confidence})"
+            version = self.versions.get("company_model")
+            reason = f"[本地模型{' ' + version if version else ''}] 判定{'通过' if is_eligible else '拒绝'} (置信度: {confidence})"
             
             logger.info(f"本地公司资质推理: {company_name} -> {is_eligible}")
-            return is_eligible, reason, {'local_mode': True}
+            return is_eligible, reason, {'local_mode': True, 'model_version': version}
             
         except Exception as e:
             logger.error(f"本地公司推理异常: {e}")
@@ -139,11 +290,12 @@ class LocalEngine:
                     valid_count += 1
             
             usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'local_mode': True}
+            versions = ", ".join(v for v in (self.versions.get("model"), self.versions.get("cnvd_model")) if v)
             
             analysis_data = {
                 "valid_ids": [i for i, p in enumerate(predictions) if p == 1],
                 "cnvd_candidates": [i for i, asset in enumerate(assets) if asset in cnvd_assets],
-                "summary": f"[本地模型分析] 共扫描 {len(assets)} 个资产，识别出 {valid_count} 个有效业务系统，其中 {cnvd_count} 个为 CNVD 重点资产。",
+                "summary": f"[本地模型分析{' ' + versions if versions else ''}] 共扫描 {len(assets)} 个资产，识别出 {valid_count} 个有效业务系统，其中 {cnvd_count} 个为 CNVD 重点资产。",
                 "cnvd_strategy": "当前处于离线/省钱模式，仅提供基础清洗，建议人工复核。"
             }
             
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 import logging
+import logging.handlers
 import sys
 import os
+import queue
+import threading
+import atexit
 import wcwidth
 from colorama import init, Fore, Style
 from ..config import Config
@@ -67,27 +71,36 @@ class TableFormatter(logging.Formatter):
         name_padded = f"{name:<12}"
         
         # 4. 消息 (固定 120, 单行截断)
+        max_msg_width = 122 # Increased to match header calculation
         message = record.getMessage()
+        # 每个字符显示宽度至少为 1 (零宽字符除外)，先按字符数截取，避免在超长消息上逐字计算
+        message = message[:max_msg_width * 2]
         # 清理换行符
         message = message.replace('\n', ' ').replace('\r', '')
-        max_msg_width = 122 # Increased to match header calculation
         
-        # 严格按视觉宽度截断
-        current_width = 0
-        truncated_msg = ""
-        for char in message:
-            char_width = wcwidth.wcwidth(char)
-            if char_width < 0: char_width = 0
-            
-            if current_width + char_width > max_msg_width - 3: # 预留 ...
-                truncated_msg += "..."
-                break
+        if message.isascii():
+            # ASCII 快速路径: 显示宽度 == 字符数
+            if len(message) > max_msg_width:
+                message = message[:max_msg_width - 3] + "..."
+            message_padded = message.ljust(max_msg_width)
+        else:
+            # 严格按视觉宽度截断
+            current_width = 0
+            truncated_msg = ""
+            for char in message:
+                char_width = wcwidth.wcwidth(char)
+                if char_width < 0: char_width = 0
+                
+                if current_width + char_width > max_msg_width - 3: # 预留 ...
+                    truncated_msg += "..."
+                    current_width += 3
+                    break
+                
+                truncated_msg += char
+                current_width += char_width
             
-            truncated_msg += char
-            current_width += char_width
-        
-        # 填充对齐
-        message_padded = self.pad_text(truncated_msg, max_msg_width)
+            # 填充对齐
+            message_padded = truncated_msg + " " * max(0, max_msg_width - current_width)
         
         # 组合单行表格
         # Header widths: Time=12, Level=12, Module=16, Message=122
@@ -141,15 +154,77 @@ def print_header():
         
         _header_printed = True
 
-def setup_logger(name):
-    # 如果已经存在同名 logger 且有 handlers，直接返回
-    logger = logging.getLogger(name)
-    if logger.handlers:
-        return logger
-        
-    logger.setLevel(logging.DEBUG) # Set logger level to DEBUG to capture everything
-    
-    # 打印表头 (如果还没打印)
+class LazyPayload:
+    """
+    延迟序列化的日志参数: 仅在某个 Handler 真正输出该条记录时才调用 func
+    用法: logger.debug("[API Response] %s", LazyPayload(lambda r=response: r.text))
+    (用默认参数绑定对象，避免循环中变量被重新赋值后输出错误内容)
+    """
+    __slots__ = ("func",)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __str__(self):
+        try:
+            return str(self.func())
+        except Exception as e:
+            return f"<payload unavailable: {e}>"
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    只把 LogRecord 放入队列，不在调用线程中格式化
+    (标准 QueueHandler.prepare 会先 format 一次，大消息会阻塞业务线程)
+    handlers: 监听线程使用的 Handler，fork 出的子进程中没有监听线程时直接同步输出
+    start: 首条记录到达时调用 (延迟启动监听线程，import 时不创建日志文件)
+    """
+    def __init__(self, q, handlers, start=None):
+        super().__init__(q)
+        self.handlers = handlers
+        self.start = start
+        self.owner_pid = os.getpid()
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        if os.getpid() != self.owner_pid:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        if self.start is not None:
+            self.start()
+        super().emit(record)
+
+
+# 全局日志队列与后台监听线程 (所有模块 logger 共用一组 Handler)
+_queue = queue.SimpleQueue()
+_handlers = []
+_listener = None
+_listener_lock = threading.Lock()
+_owner_pid = None
+
+
+def _start_listener():
+    global _listener, _owner_pid
+    if _listener is not None:
+        return
+    # 多个线程可能同时输出第一条日志: 加锁后再次检查，保证只启动一个监听线程
+    with _listener_lock:
+        if _listener is not None:
+            return
+        if not _handlers:
+            _handlers.extend(_create_handlers())
+        _owner_pid = os.getpid()
+        _listener = logging.handlers.QueueListener(_queue, *_handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def _create_handlers():
+    # 打印表头 (第一条日志输出前)
     print_header()
     
     # Console Handler (Table Style) - Keep INFO for cleaner console
@@ -157,18 +232,53 @@ def setup_logger(name):
     ch = logging.StreamHandler(sys.stdout)
     ch.setFormatter(console_formatter)
     ch.setLevel(logging.INFO) 
-    logger.addHandler(ch)
     
     # File Handler (Plain text, DEBUG level for full details)
     # Ensure log dir exists
     log_dir = os.path.dirname(Config.LOG_FILE)
     if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+        os.makedirs(log_dir, exist_ok=True)
         
     file_formatter = logging.Formatter(Config.LOG_FORMAT, datefmt="%Y-%m-%d %H:%M:%S")
     fh = logging.FileHandler(Config.LOG_FILE, encoding='utf-8')
     fh.setFormatter(file_formatter)
     fh.setLevel(logging.DEBUG) 
-    logger.addHandler(fh)
+    return [ch, fh]
+
+
+def stop_logging():
+    """
+    等待队列中的日志全部输出后停止后台线程 (进程退出时自动调用)
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None and os.getpid() == _owner_pid:
+            _listener.stop()
+            _listener = None
+            for handler in _handlers:
+                handler.flush()
+
+
+def set_console_level(level):
+    """
+    调整终端输出级别 (文件日志不受影响)，例如基准测试时只显示 WARNING 以上
+    """
+    _start_listener()
+    for handler in _handlers:
+        if not isinstance(handler, logging.FileHandler):
+            handler.setLevel(level)
+
+
+def setup_logger(name):
+    # 如果已经存在同名 logger 且有 handlers，直接返回
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+        
+    logger.setLevel(logging.DEBUG) # Set logger level to DEBUG to capture everything
+    
+    # 终端与文件输出都在后台线程完成，调用方只负责入队
+    # 监听线程 (及表头、日志文件) 在第一条日志到达时才启动，import 模块本身没有副作用
+    logger.addHandler(DeferredQueueHandler(_queue, _handlers, start=_start_listener))
     
     return logger
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import threading
+from .logger import setup_logger
+from .storage import split_output_name, parse_member_ref
+from .dataset import RunDataset, find_datasets, session_of
+from ..config import Config
+
+logger = setup_logger("Manifest")
+
+MANIFEST_FILENAME = "manifest.jsonl"
+
+# 同一 manifest 文件在进程内共用一把锁 (Reporter 可能被多个线程同时调用)
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path):
+    with _locks_guard:
+        if path not in _locks:
+            _locks[path] = threading.Lock()
+        return _locks[path]
+
+
+def _to_epoch(value):
+    """
+    支持 epoch 秒数 或 'YYYY-MM-DD' / 'YYYY-MM-DD HH:MM:SS' 字符串
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    fmt = "%Y-%m-%d %H:%M:%S" if ":" in value else "%Y-%m-%d"
+    return time.mktime(time.strptime(value, fmt))
+
+
+class OutputManifest:
+    """
+    输出文件清单 (output/manifest.jsonl)
+    Reporter 每次写入追加一行: path, company, kind, size, mtime, rows, session
+    下游工具通过 query() 按类型/时间范围检索，无需递归扫描 output 目录
+    """
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir or Config.OUTPUT_DIR
+        self.path = os.path.join(self.output_dir, MANIFEST_FILENAME)
+        self._lock = _lock_for(os.path.abspath(self.path))
+        self._entries = []
+        self._offset = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def record(self, path, company, kind, rows=None, session=None):
+        """
+        记录一次写入 (path 可以是普通文件或数据集分片引用)
+        """
+        member = parse_member_ref(path)
+        if member:
+            size, mtime = member[2], time.time()
+        else:
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            size, mtime = stat.st_size, stat.st_mtime
+
+        entry = {
+            "path": path,
+            "company": company,
+            "kind": kind,
+            "size": size,
+            "mtime": mtime,
+            "rows": rows,
+            "session": session,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        return entry
+
+    def entries(self):
+        """
+        返回全部记录 (增量读取: 只解析上次读取之后追加的部分)
+        """
+        if not self.exists():
+            return []
+        with self._lock:
+            size = os.path.getsize(self.path)
+            if size < self._offset:
+                # 文件被重建，从头读取
+                self._entries, self._offset = [], 0
+            if size > self._offset:
+                with open(self.path, 'rb') as f:
+                    f.seek(self._offset)
+                    chunk = f.read()
+                # 只处理完整的行，末尾残留的半行留到下次
+                end = chunk.rfind(b"\n") + 1
+                for line in chunk[:end].decode('utf-8').splitlines():
+                    if not line.strip():
+                        continue
+                    try:
+                        self._entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+                self._offset += end
+            return list(self._entries)
+
+    def query(self, kind=None, since=None, until=None, company=None):
+        """
+        按类型 / 时间范围 (mtime) / 公司检索记录
+        since / until 支持 epoch 秒数或 'YYYY-MM-DD' 字符串
+        """
+        since, until = _to_epoch(since), _to_epoch(until)
+        result = []
+        for entry in self.entries():
+            if kind is not None and entry.get("kind") != kind:
+                continue
+            if company is not None and entry.get("company") != company:
+                continue
+            mtime = entry.get("mtime") or 0
+            if since is not None and mtime < since:
+                continue
+            if until is not None and mtime >= until:
+                continue
+            result.append(entry)
+        return result
+
+    def latest(self, company, kind, before=None):
+        """
+        某公司某类输出的最新记录 (before: 仅考虑该时间点之前的记录)
+        """
+        found = None
+        for entry in self.query(kind=kind, company=company, until=before):
+            if found is None or entry.get("mtime", 0) >= found.get("mtime", 0):
+                found = entry
+        return found
+
+    def ensure(self):
+        """
+        清单不存在时 (旧版输出目录) 执行一次全量扫描生成
+        """
+        if not self.exists():
+            self.rebuild()
+        return self
+
+    def rebuild(self):
+        """
+        全量扫描 output 目录重建清单 (仅在首次使用或清单损坏时需要)
+        日期归档副本与 realtime 中的原文件 (文件名/大小/mtime 相同) 只记录一份
+        """
+        logger.info(f"正在扫描 {self.output_dir} 重建输出清单...")
+        entries = []
+        seen = set()
+
+        candidates = []
+        for root, dirs, files in os.walk(self.output_dir):
+            parts = root.split(os.sep)
+            session = None
+            if "realtime" in parts and parts.index("realtime") + 1 < len(parts):
+                session = parts[parts.index("realtime") + 1]
+            for file in files:
+                company, kind = split_output_name(file)
+                if kind is None and file.endswith("_analysis.md"):
+                    company, kind = file[:-len("_analysis.md")], "report"
+                if kind is not None:
+                    candidates.append((os.path.join(root, file), file, company, kind, session))
+
+        # realtime 中的原文件优先于归档副本
+        candidates.sort(key=lambda c: c[4] is None)
+        for path, file, company, kind, session in candidates:
+            stat = os.stat(path)
+            key = (file, stat.st_size, int(stat.st_mtime))
+            if key in seen:
+                continue
+            seen.add(key)
+            entries.append({
+                "path": os.path.abspath(path),
+                "company": company,
+                "kind": kind,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "rows": None,
+                "session": session,
+            })
+
+        for dataset_dir in find_datasets(self.output_dir):
+            dataset = RunDataset(dataset_dir)
+            session = session_of(dataset_dir)
+            for entry in dataset.entries():
+                entries.append({
+                    "path": dataset.ref(entry),
+                    "company": entry["company"],
+                    "kind": entry["kind"],
+                    "size": entry["length"],
+                    "mtime": entry["time"],
+                    "rows": entry.get("rows"),
+                    "session": session,
+                })
+
+        entries.sort(key=lambda e: e["mtime"])
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+            self._entries, self._offset = [], 0
+
+        logger.info(f"输出清单已重建: {len(entries)} 条记录")
+        return len(entries)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query or rebuild the output manifest")
+    parser.add_argument("--kind", choices=["raw", "analysis", "report"], help="Filter by output kind")
+    parser.add_argument("--since", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="End date (YYYY-MM-DD, exclusive)")
+    parser.add_argument("--company", help="Filter by company name")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the manifest by scanning the output directory")
+    args = parser.parse_args()
+
+    manifest = OutputManifest()
+    if args.rebuild:
+        manifest.rebuild()
+    else:
+        manifest.ensure()
+    for item in manifest.query(args.kind, args.since, args.until, args.company):
+        print(json.dumps(item, ensure_ascii=False))
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+import time
+import functools
+import threading
+from .logger import setup_logger
+from ..config import Config
+
+logger = setup_logger("Metrics")
+
+
+class Timer:
+    """
+    单次计时: 墙钟时间 / 本线程 CPU 时间 / 主动等待 (pause) 时间
+    其余部分 (wall - cpu - sleep) 视为 I/O 或其他等待
+    """
+    __slots__ = ("stage", "items", "wall", "cpu", "sleep", "_wall0", "_cpu0")
+
+    def __init__(self, stage, items=0):
+        self.stage = stage
+        self.items = items
+        self.wall = self.cpu = self.sleep = 0.0
+
+    def start(self):
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.thread_time()
+        _active().append(self)
+        return self
+
+    def stop(self, items=None):
+        self.wall = time.perf_counter() - self._wall0
+        self.cpu = time.thread_time() - self._cpu0
+        if items is not None:
+            self.items = items
+        stack = _active()
+        if self in stack:
+            # 内层计时若因提前 return 未结束，随外层一起出栈
+            del stack[stack.index(self):]
+        registry.record(self)
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+# 延迟直方图分桶 (秒)，用于 Prometheus 导出
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def format_key(name, key):
+    if not key:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in key) + "}"
+
+
+class StageStats:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.durations = []
+        self.items = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.sleep = 0.0
+
+    def summary(self):
+        count = len(self.durations)
+        ordered = sorted(self.durations)
+        io = max(0.0, self.wall - self.cpu - self.sleep)
+        return {
+            "count": count,
+            "items": self.items,
+            "total_s": round(self.wall, 3),
+            "mean_ms": round(self.wall / count * 1000, 2) if count else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "items_per_s": round(self.items / self.wall, 2) if self.wall > 0 and self.items else 0.0,
+            "cpu_s": round(self.cpu, 3),
+            "sleep_s": round(self.sleep, 3),
+            "io_wait_s": round(io, 3),
+        }
+
+
+def percentile(ordered, pct):
+    """
+    最近秩法百分位 (ordered 须已排序)
+    """
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Registry:
+    """
+    进程内的阶段耗时与计数器汇总 (线程安全)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}   # (name, labels) -> value
+            self.gauges = {}     # (name, labels) -> value
+            self.idle_sleep = 0.0 # 不在任何计时阶段内的 pause()
+            self.started = time.time()
+
+    def record(self, timer):
+        with self._lock:
+            stats = self.stages.setdefault(timer.stage, StageStats())
+            stats.durations.append(timer.wall)
+            for i, bound in enumerate(BUCKETS):
+                if timer.wall <= bound:
+                    stats.buckets[i] += 1
+            stats.items += timer.items or 0
+            stats.wall += timer.wall
+            stats.cpu += timer.cpu
+            stats.sleep += timer.sleep
+
+    def count(self, name, n=1, **labels):
+        key = (name, label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def snapshot(self):
+        """
+        导出用的原始数据副本: (stages, counters, gauges)
+        """
+        with self._lock:
+            stages = {name: (list(st.buckets), len(st.durations), st.wall, st.items, st.cpu, st.sleep)
+                      for name, st in self.stages.items()}
+            return stages, dict(self.counters), dict(self.gauges)
+
+    def add_idle_sleep(self, seconds):
+        with self._lock:
+            self.idle_sleep += seconds
+
+    def report(self):
+        with self._lock:
+            stages = {name: stats.summary() for name, stats in self.stages.items()}
+            return {
+                "started": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+                "elapsed_s": round(time.time() - self.started, 3),
+                "stages": dict(sorted(stages.items(), key=lambda kv: -kv[1]["total_s"])),
+                "counters": {format_key(n, k): v for (n, k), v in sorted(self.counters.items())},
+                "gauges": {format_key(n, k): v for (n, k), v in sorted(self.gauges.items())},
+                "idle_sleep_s": round(self.idle_sleep, 3),
+            }
+
+
+registry = Registry()
+_local = threading.local()
+
+
+def _active():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def timer(stage, items=0):
+    """
+    with metrics.timer("fofa.search"): ...
+    """
+    return Timer(stage, items)
+
+
+def timed(stage, items=None):
+    """
+    方法计时装饰器
+    items: 可选，从返回值计算处理条数的函数 (例如 len)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t = Timer(stage).start()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                count = None
+                if items is not None and result is not None:
+                    try:
+                        count = items(result)
+                    except Exception:
+                        count = None
+                t.stop(count)
+        return wrapper
+    return decorator
+
+
+def add_items(n):
+    """
+    为当前线程最内层的计时阶段累加处理条数
+    """
+    stack = _active()
+    if stack:
+        stack[-1].items += n
+
+
+def count(name, n=1, **labels):
+    registry.count(name, n, **labels)
+
+
+def gauge(name, value, **labels):
+    registry.gauge(name, value, **labels)
+
+
+def pause(seconds):
+    """
+    time.sleep 的替代: 睡眠时间计入当前线程所有正在计时的阶段 (wait vs work)
+    实际睡眠时间按 Config.SLEEP_SCALE 缩放 (模拟服务基准测试时设为 0)
+    """
+    seconds *= Config.SLEEP_SCALE
+    if seconds <= 0:
+        return
+    time.sleep(seconds)
+    stack = _active()
+    for t in stack:
+        t.sleep += seconds
+    if not stack:
+        registry.add_idle_sleep(seconds)
+
+
+def log_report(report=None):
+    """
+    在终端输出各阶段耗时汇总
+    """
+    report = report or registry.report()
+    logger.info(f"性能统计 (总耗时 {report['elapsed_s']:.1f}s, 阶段外等待 {report['idle_sleep_s']:.1f}s):")
+    for name, s in report["stages"].items():
+        logger.info(
+            f"  {name}: {s['count']}次 {s['total_s']:.1f}s | p50/95/99 {s['p50_ms']:.0f}/{s['p95_ms']:.0f}/{s['p99_ms']:.0f}ms"
+            f" | {s['items_per_s']}/s | CPU/等待/IO {s['cpu_s']:.1f}/{s['sleep_s']:.1f}/{s['io_wait_s']:.1f}s"
+        )
+    if report["counters"]:
+        logger.info(f"  计数器: {report['counters']}")
+    return report
+
+
+def write_report(path, report=None):
+    report = report or registry.report()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"性能报告已保存至: {path}")
+    return report
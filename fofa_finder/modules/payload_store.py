@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import gzip
+import time
+import queue
+import atexit
+import hashlib
+import threading
+from .logger import setup_logger, LazyPayload
+from .filelock import FileLock
+from . import metrics
+from ..config import Config
+
+logger = setup_logger("Payload")
+
+INDEX_FILENAME = "index.jsonl"
+LOCK_FILENAME = ".lock"
+PRUNED_FILENAME = ".pruned" # 每次清理分段后重写，mtime 变化表示索引已被压缩
+
+
+def _codec(name):
+    """
+    返回 (扩展名, 压缩函数, 解压函数)
+    'auto' 优先使用 zstd (需要 pip install zstandard)，否则使用 gzip
+    """
+    if name in ("auto", "zstd"):
+        try:
+            import zstandard
+            compressor = zstandard.ZstdCompressor(level=Config.PAYLOAD_COMPRESS_LEVEL)
+            return ".zst", compressor.compress, lambda data: zstandard.ZstdDecompressor().decompress(data)
+        except ImportError:
+            if name == "zstd":
+                logger.warning("未安装 zstandard，载荷压缩降级为 gzip (pip install zstandard)")
+    return ".gz", lambda data: gzip.compress(data, compresslevel=Config.PAYLOAD_COMPRESS_LEVEL), gzip.decompress
+
+
+def _to_bytes(body):
+    if body is None:
+        return b""
+    if isinstance(body, bytes):
+        return body
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    return json.dumps(body, ensure_ascii=False).encode('utf-8')
+
+
+class PayloadStore:
+    """
+    HTTP 请求/响应体存储 (按内容寻址，日志中只记录 id)
+
+    目录结构:
+        payloads/
+            payloads-00000.gz        每个载荷一个独立的压缩 member (gzip 或 zstd frame)
+            payloads-00001.gz        超过 Config.PAYLOAD_SEGMENT_MB 后滚动
+            index.jsonl              {"id", "segment", "offset", "length", "size", "kind", "time", ...}
+
+    id 为内容 sha256 的前 32 位十六进制，相同内容只保存一次
+    压缩与写盘在后台线程完成，capture() 只计算哈希并入队
+    多个进程 (扫描 + 后台学习) 共用同一目录: 选择分段、取偏移、写入与清理在 .lock 文件锁内完成；
+    清理旧分段时同时从索引中删除其中的载荷，其他进程发现 .pruned 标记变化后重新加载已保存的 id
+    """
+    def __init__(self, root_dir=None, compression=None, segment_bytes=None, max_segments=None):
+        self.root_dir = root_dir or Config.PAYLOAD_DIR
+        self.index_file = os.path.join(self.root_dir, INDEX_FILENAME)
+        self.ext, self._compress, self._decompress = _codec(compression or Config.PAYLOAD_COMPRESSION)
+        self.segment_bytes = segment_bytes or Config.PAYLOAD_SEGMENT_MB * 1024 * 1024
+        self.max_segments = Config.PAYLOAD_MAX_SEGMENTS if max_segments is None else max_segments
+
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(self.root_dir, LOCK_FILENAME))
+        self._known = None # 已保存 (或已入队) 的 id
+        self._pruned_stamp = None # 加载 _known 时 .pruned 标记的 mtime
+        self._queue = queue.Queue()
+        self._worker = None
+
+    # ---------- 写入 ----------
+
+    def capture(self, body, kind, **meta):
+        """
+        保存一个载荷，返回引用 id (立即返回，后台写盘)
+        """
+        data = _to_bytes(body)
+        payload_id = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            if self._known is None or self._pruned_stamp != self._stat_pruned():
+                self._known = self._load_ids()
+            if payload_id in self._known:
+                metrics.count("payload_dedup", result="hit")
+                return payload_id
+            self._known.add(payload_id)
+            metrics.count("payload_dedup", result="miss")
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="PayloadWriter", daemon=True)
+                self._worker.start()
+        self._queue.put((payload_id, data, kind, meta, time.time()))
+        return payload_id
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logger.error(f"写入载荷失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _segment_path(self, number):
+        return os.path.join(self.root_dir, f"payloads-{number:05d}{self.ext}")
+
+    def _segments(self):
+        if not os.path.exists(self.root_dir):
+            return []
+        return sorted(f for f in os.listdir(self.root_dir) if f.startswith("payloads-"))
+
+    def _current_segment(self):
+        """
+        返回当前可写入的分段路径 (超过大小上限时滚动，并按 PAYLOAD_MAX_SEGMENTS 清理最旧的分段)
+        调用方需持有文件锁
+        """
+        segments = self._segments()
+        number = int(segments[-1][len("payloads-"):][:5]) if segments else 0
+        path = self._segment_path(number)
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+            number += 1
+            path = self._segment_path(number)
+            segments.append(os.path.basename(path))
+            if self.max_segments and len(segments) > self.max_segments:
+                self._prune(segments[:-self.max_segments])
+        return path
+
+    def _prune(self, expired):
+        """
+        先从索引中删除过期分段内的载荷 (临时文件 + os.replace)，再删除分段文件
+        被删除的 id 不再算作已保存，之后再次捕获相同内容时会重新写入
+        """
+        expired = set(expired)
+        removed = set()
+        tmp_path = f"{self.index_file}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._entries():
+                if entry["segment"] in expired:
+                    removed.add(entry["id"])
+                else:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.index_file)
+        with open(os.path.join(self.root_dir, PRUNED_FILENAME), 'w', encoding='utf-8') as f:
+            f.write("\n".join(sorted(expired)) + "\n")
+        for old in sorted(expired):
+            try:
+                os.remove(os.path.join(self.root_dir, old))
+            except FileNotFoundError:
+                pass
+            logger.info(f"已清理过期载荷分段: {old}")
+        with self._lock:
+            if self._known is not None:
+                self._known -= removed
+                self._pruned_stamp = self._stat_pruned()
+
+    def _write(self, payload_id, data, kind, meta, created):
+        if not os.path.exists(self.root_dir):
+            os.makedirs(self.root_dir, exist_ok=True)
+        compressed = self._compress(data)
+        # 其他进程可能同时追加同一分段: 取偏移与写入必须在文件锁内
+        with self._file_lock:
+            segment = self._current_segment()
+            with open(segment, 'ab') as f:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                f.write(compressed)
+            entry = {
+                "id": payload_id,
+                "segment": os.path.basename(segment),
+                "offset": offset,
+                "length": len(compressed),
+                "size": len(data),
+                "kind": kind,
+                "time": created,
+            }
+            entry.update(meta)
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        """
+        等待后台线程写完已入队的载荷
+        """
+        if self._worker is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    # ---------- 读取 ----------
+
+    def _entries(self):
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程中断时可能残留半行
+                    continue
+
+    def _stat_pruned(self):
+        try:
+            return os.stat(os.path.join(self.root_dir, PRUNED_FILENAME)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_ids(self):
+        """
+        已保存的 id (所在分段已被删除的不算，例如清理中途中断)
+        """
+        self._pruned_stamp = self._stat_pruned()
+        segments = set(self._segments())
+        return {entry["id"] for entry in self._entries() if entry["segment"] in segments}
+
+    def lookup(self, payload_id):
+        """
+        返回索引项 (支持 id 前缀)，不存在时返回 None
+        """
+        for entry in self._entries():
+            if entry["id"].startswith(payload_id):
+                return entry
+        return None
+
+    def get(self, payload_id):
+        """
+        读取载荷原始字节，不存在 (或所在分段已被清理) 时返回 None
+        """
+        self.flush()
+        entry = self.lookup(payload_id)
+        if entry is None:
+            return None
+        path = os.path.join(self.root_dir, entry["segment"])
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            f.seek(entry["offset"])
+            data = f.read(entry["length"])
+        if entry["segment"].endswith(".zst"):
+            import zstandard
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    进程内共享的 PayloadStore (Config.PAYLOAD_CAPTURE 关闭时返回 None)
+    """
+    global _store
+    if not Config.PAYLOAD_CAPTURE:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = PayloadStore()
+            atexit.register(_store.close)
+        return _store
+
+
+def reset_store():
+    """
+    关闭并丢弃共享 PayloadStore (切换 Config.PAYLOAD_DIR 后下次 get_store() 重新创建)
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+def capture_exchange(log, label, request_body, response):
+    """
+    保存一次 HTTP 交互的请求体与响应体，并在调用方日志中记录引用 id
+    未开启载荷捕获时退回旧行为: 在 DEBUG 日志中输出完整响应
+    返回: (request_id, response_id)
+    """
+    store = get_store()
+    if store is None:
+        log.debug("[%s] HTTP %s\n%s", label, response.status_code, LazyPayload(lambda r=response: r.text))
+        return None, None
+
+    request_id = store.capture(request_body, f"{label}/request")
+    response_id = store.capture(response.content, f"{label}/response", status=response.status_code)
+    log.debug("[%s] HTTP %s | request=%s response=%s", label, response.status_code, request_id, response_id)
+    return request_id, response_id
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Print a captured HTTP payload by id")
+    parser.add_argument("payload_id", help="Payload id (or unique prefix) from the log")
+    parser.add_argument("--dir", help="Payload directory (default: Config.PAYLOAD_DIR)")
+    args = parser.parse_args()
+
+    store = PayloadStore(args.dir)
+    data = store.get(args.payload_id)
+    if data is None:
+        print(f"Payload not found: {args.payload_id}", file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(data.decode('utf-8', errors='replace'))
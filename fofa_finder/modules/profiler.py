@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import os
+import io
+import time
+import pstats
+import cProfile
+import tracemalloc
+from .logger import setup_logger
+from ..config import Config
+
+logger = setup_logger("Profiler")
+
+
+def _safe_name(name):
+    invalid_chars = r'<>:"/\|?*'
+    for char in invalid_chars:
+        name = name.replace(char, '_')
+    return name
+
+
+class CompanyProfiler:
+    """
+    按公司采样的 cProfile + tracemalloc 剖析 (默认关闭)
+
+    触发条件 (满足其一即可):
+    - every: 每 N 家公司剖析一家 (按公司序号，idx % N == 0)
+    - min_assets: 资产数 >= M 的公司 (资产数在搜索后才知道，因此只剖析提取之后的阶段)
+
+    每家被剖析的公司在 out_dir 下生成:
+        <公司>.prof          cProfile 原始数据 (python -m pstats / snakeviz 查看)
+        <公司>.tracemalloc   tracemalloc 快照 (tracemalloc.Snapshot.load 读取)
+        <公司>_summary.txt   耗时 Top N (cumulative) + 内存分配 Top N + 峰值内存
+    注意: cProfile 只记录主线程
+    """
+    def __init__(self, out_dir, every=0, min_assets=0, top=None, frames=None):
+        self.out_dir = out_dir
+        self.every = every or 0
+        self.min_assets = min_assets or 0
+        self.top = top or Config.PROFILE_TOP
+        self.frames = frames or Config.PROFILE_TRACEMALLOC_FRAMES
+        self._profile = None
+        self._company = None
+        self._reason = None
+        self._started = None
+        self._owns_tracemalloc = False
+
+    @property
+    def enabled(self):
+        return bool(self.every or self.min_assets)
+
+    @property
+    def active(self):
+        return self._profile is not None
+
+    def begin(self, idx, company_name):
+        """
+        公司开始处理时调用: 命中采样间隔则立即开始剖析
+        """
+        self.end()
+        if self.every and idx % self.every == 0:
+            self._start(company_name, f"every={self.every}")
+
+    def check_assets(self, company_name, asset_count):
+        """
+        资产汇总后调用: 超过阈值且尚未在剖析时，从此处开始剖析
+        """
+        if self.active or not self.min_assets or asset_count < self.min_assets:
+            return
+        self._start(company_name, f"assets={asset_count}>={self.min_assets}")
+
+    def _start(self, company_name, reason):
+        self._company = company_name
+        self._reason = reason
+        self._started = time.perf_counter()
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError as e:
+            # 已有其它 profiler 在运行 (如 python -m cProfile)
+            logger.warning(f"无法启动 cProfile ({company_name}): {e}")
+            self._profile = None
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            return
+        logger.info(f"开始剖析: {company_name} ({reason})")
+
+    def end(self):
+        """
+        结束当前公司的剖析并写出结果 (未在剖析时无操作)
+        """
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        elapsed = time.perf_counter() - self._started
+        profile, company = self._profile, self._company
+        self._profile = None
+
+        try:
+            if not os.path.exists(self.out_dir):
+                os.makedirs(self.out_dir)
+            base = os.path.join(self.out_dir, _safe_name(company))
+            profile.dump_stats(base + ".prof")
+            snapshot.dump(base + ".tracemalloc")
+            with open(base + "_summary.txt", 'w', encoding='utf-8') as f:
+                f.write(self._summary(company, profile, snapshot, peak, elapsed))
+            logger.info(f"剖析结果已保存: {base}.prof (耗时 {elapsed:.1f}s, 峰值内存 {peak / 1024 / 1024:.1f} MB)")
+            return base
+        except Exception as e:
+            logger.error(f"保存剖析结果失败 ({company}): {e}")
+            return None
+
+    def _summary(self, company, profile, snapshot, peak, elapsed):
+        out = io.StringIO()
+        out.write(f"Company: {company}\n")
+        out.write(f"Trigger: {self._reason}\n")
+        out.write(f"Elapsed: {elapsed:.3f}s\n")
+        out.write(f"Peak traced memory: {peak / 1024 / 1024:.2f} MB\n\n")
+
+        out.write(f"== cProfile (top {self.top} by cumulative time) ==\n")
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(self.top)
+
+        out.write(f"\n== tracemalloc (top {self.top} allocation sites) ==\n")
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            out.write(f"{stat}\n")
+        return out.getvalue()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .logger import setup_logger
+from .metrics import registry, BUCKETS
+from ..config import Config
+
+logger = setup_logger("Prometheus")
+
+PREFIX = "fofa_finder_"
+_NAME_INVALID = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _metric_name(name):
+    return PREFIX + _NAME_INVALID.sub("_", name)
+
+
+def _labels(key, extra=None):
+    pairs = list(key) + list(extra or [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in pairs)
+    return "{" + body + "}"
+
+
+def render():
+    """
+    将 metrics.registry 渲染为 Prometheus 文本格式 (text/plain; version=0.0.4)
+    - 计数器: fofa_finder_<name>_total
+    - 仪表:   fofa_finder_<name>
+    - 阶段延迟直方图: fofa_finder_stage_duration_seconds{stage="..."}
+    """
+    stages, counters, gauges = registry.snapshot()
+    lines = []
+
+    by_name = {}
+    for (name, key), value in counters.items():
+        by_name.setdefault(name, []).append((key, value))
+    for name in sorted(by_name):
+        metric = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        for key, value in sorted(by_name[name]):
+            lines.append(f"{metric}{_labels(key)} {value}")
+
+    by_name = {}
+    for (name, key), value in gauges.items():
+        by_name.setdefault(name, []).append((key, value))
+    for name in sorted(by_name):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} gauge")
+        for key, value in sorted(by_name[name]):
+            lines.append(f"{metric}{_labels(key)} {value}")
+
+    if stages:
+        metric = PREFIX + "stage_duration_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for stage in sorted(stages):
+            buckets, count, total, items, cpu, sleep = stages[stage]
+            key = (("stage", stage),)
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                lines.append(f"{metric}_bucket{_labels(key, [('le', bound)])} {bucket_count}")
+            lines.append(f"{metric}_bucket{_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{_labels(key)} {total:.6f}")
+            lines.append(f"{metric}_count{_labels(key)} {count}")
+
+        for suffix, index, kind in (("stage_items_total", 3, "counter"),
+                                    ("stage_cpu_seconds_total", 4, "counter"),
+                                    ("stage_sleep_seconds_total", 5, "counter")):
+            metric = PREFIX + suffix
+            lines.append(f"# TYPE {metric} {kind}")
+            for stage in sorted(stages):
+                lines.append(f"{metric}{_labels((('stage', stage),))} {stages[stage][index]}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """
+    原子写入 (tmp + os.replace)，供 node_exporter textfile collector 读取
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求不写入主日志
+        pass
+
+
+class Exporter:
+    """
+    可选的指标导出: HTTP 端点 (/metrics) 和/或 textfile 定期写入
+    两者都在后台线程运行，不影响主流程
+    """
+    def __init__(self, port=None, textfile=None, interval=None, host=None):
+        self.port = port
+        self.textfile = textfile
+        self.interval = interval or Config.METRICS_INTERVAL
+        self.host = host or Config.METRICS_HOST
+        self._server = None
+        self._stop = threading.Event()
+        self._writer = None
+
+    def start(self):
+        if self.port is not None:
+            self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+            threading.Thread(target=self._server.serve_forever, name="MetricsHTTP", daemon=True).start()
+            logger.info(f"指标端点已启动: http://{self.host}:{self._server.server_address[1]}/metrics")
+        if self.textfile:
+            self._writer = threading.Thread(target=self._write_loop, name="MetricsTextfile", daemon=True)
+            self._writer.start()
+            logger.info(f"指标文件每 {self.interval}s 更新: {self.textfile}")
+        return self
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        try:
+            write_textfile(self.textfile)
+        except Exception as e:
+            logger.warning(f"写入指标文件失败: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._writer:
+            self._writer.join()
+            self._writer = None
+            self._write() # 最终状态
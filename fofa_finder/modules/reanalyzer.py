@@ -1,40 +1,228 @@
 # -*- coding: utf-8 -*-
 import os
-import pandas as pd
 import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from .analyzer import Analyzer
-from .reporter import Reporter
+from .reporter import Reporter, asset_title
+from .storage import read_table, split_output_name, OVERVIEW_TABLE, VALID_TABLE, CNVD_TABLE, VERDICT_TABLE
 from .logger import setup_logger
+from . import metrics
 from ..config import Config
 
 logger = setup_logger("ReAnalyzer")
 
+INCREMENTAL_HEADING = "**增量审计**:"
+
+def with_incremental(text, section):
+    """
+    把本次增量审计的总结附在上次结论之后，替换掉之前的增量审计段落 (多次 --incremental 不会无限累积)
+    """
+    base = (text or '').split(INCREMENTAL_HEADING)[0].rstrip()
+    return "\n\n".join(s for s in [base, f"{INCREMENTAL_HEADING} {section}"] if s)
+
+def estimate_cost(usage):
+    """
+    DeepSeek V3 估算价格: 输入 2元/1M, 输出 8元/1M
+    """
+    p_tokens = usage.get('prompt_tokens', 0)
+    c_tokens = usage.get('completion_tokens', 0)
+    return (p_tokens / 1_000_000 * 2.0) + (c_tokens / 1_000_000 * 8.0)
+
+def load_assets(filepath):
+    """
+    读取原始数据并转换为资产列表 (在进程池中执行，须为模块级函数)
+    """
+    df = read_table(filepath)
+    return df.where(df.notna(), None).to_dict('records')
+
+class CostBudget:
+    """
+    多线程共享的花费预算 (CNY)，limit 为空或 <= 0 表示不限制
+    """
+    def __init__(self, limit_cny=None):
+        self.limit = limit_cny if limit_cny and limit_cny > 0 else None
+        self.spent = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def charge(self, usage):
+        cost = estimate_cost(usage)
+        with self._lock:
+            self.prompt_tokens += usage.get('prompt_tokens', 0)
+            self.completion_tokens += usage.get('completion_tokens', 0)
+            self.spent += cost
+        return cost
+
+    def exhausted(self):
+        return self.limit is not None and self.spent >= self.limit
+
 class ReAnalyzer:
-    def __init__(self):
+    def __init__(self, incremental=None):
         self.analyzer = Analyzer()
         self.reporter = Reporter() # Creates new session dir automatically for this run
         self.progress_file = os.path.join(Config.OUTPUT_DIR, "reanalysis_progress.txt")
+        self.manifest = self.reporter.manifest
+        self.ref_companies = {} # 原始数据路径 (或数据集分片引用) -> 公司名
+        self._progress_lock = threading.Lock()
+        # 增量模式: 仅审计与上次分析相比新增或标题变化的资产
+        self.incremental = Config.REANALYSIS_INCREMENTAL if incremental is None else incremental
 
-    def find_raw_files(self, root_dir):
+    def find_raw_files(self, since=None):
         """
-        递归查找所有 _raw.xlsx 文件
+        从输出清单中查找原始数据 (文件路径或数据集分片引用)
+        since: 仅返回该时间点 (epoch) 之后写入的记录
         """
         raw_files = []
-        for root, dirs, files in os.walk(root_dir):
-            for file in files:
-                if file.endswith("_raw.xlsx"):
-                    raw_files.append(os.path.join(root, file))
+        for entry in self.manifest.query(kind="raw", since=since):
+            self.ref_companies[entry["path"]] = entry["company"]
+            raw_files.append(entry["path"])
         return raw_files
 
     def extract_company_name(self, filename):
         """
-        从文件名提取公司名称
+        从文件名 (或数据集分片引用) 提取公司名称
+        """
+        if filename in self.ref_companies:
+            return self.ref_companies[filename]
+        name, _ = split_output_name(filename)
+        return name or os.path.basename(filename)
+
+    def load_progress(self):
+        processed_files = set()
+        if os.path.exists(self.progress_file):
+            with open(self.progress_file, 'r', encoding='utf-8') as f:
+                processed_files = set(line.strip() for line in f if line.strip())
+            logger.info(f"已加载进度: {len(processed_files)} 个文件已处理")
+        return processed_files
+
+    def mark_processed(self, filepath):
+        """
+        原子追加一行进度: 加锁 + 单次 O_APPEND 写入 + fsync
+        进程中断时最多残留一条不完整记录，不会与其他行交错
+        """
+        line = f"{filepath}\n".encode('utf-8')
+        with self._progress_lock:
+            fd = os.open(self.progress_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def find_targets(self, since_hours):
+        """
+        从输出清单中选出最近 since_hours 小时内的原始数据 (since_hours 为空表示全部历史)
         """
-        basename = os.path.basename(filename)
-        name = basename.replace("_raw.xlsx", "")
-        return name
+        time_threshold = time.time() - since_hours * 3600 if since_hours else None
+        
+        # Filter by time (manifest query, no directory walk)
+        target_files = self.find_raw_files(since=time_threshold)
+        
+        scope = f"近期({since_hours}h内)" if since_hours else "全部历史"
+        logger.info(f"输出清单中共 {len(self.manifest.query(kind='raw'))} 个原始文件，其中 {len(target_files)} 个为{scope}文件")
+        return target_files
+
+    def previous_verdicts(self, company_name):
+        """
+        读取该公司最近一次分析的逐条结论
+        返回: ({link: (title, valid, cnvd)}, overview_dict)
+        旧版分析文件没有 Verdicts 表时，由 Valid/CNVD 表与当时的原始数据推算
+        """
+        prev = self.manifest.latest(company_name, "analysis")
+        if prev is None:
+            return {}, {}
+        path = prev["path"]
+        
+        try:
+            overview = read_table(path, OVERVIEW_TABLE)
+            overview = overview.iloc[0].to_dict() if not overview.empty else {}
+            
+            try:
+                df = read_table(path, VERDICT_TABLE)
+                verdicts = {}
+                for row in df.to_dict('records'):
+                    verdicts[row['link']] = (row['title'], bool(row['valid']), bool(row['cnvd']))
+                return verdicts, overview
+            except ValueError:
+                pass
+            
+            # Legacy analysis: valid/cnvd links + the raw data audited in that run
+            valid = read_table(path, VALID_TABLE).to_dict('records')
+            try:
+                cnvd = read_table(path, CNVD_TABLE).to_dict('records')
+            except ValueError:
+                cnvd = []
+            valid_links = {a.get('link') for a in valid}
+            cnvd_links = {a.get('link') for a in cnvd}
+            
+            raw = self.manifest.latest(company_name, "raw", before=prev["mtime"] + 1)
+            audited = load_assets(raw["path"]) if raw else valid
+            
+            verdicts = {}
+            for asset in audited:
+                link = asset.get('link')
+                if link:
+                    verdicts[link] = (asset_title(asset), link in valid_links, link in cnvd_links)
+            return verdicts, overview
+        except Exception as e:
+            logger.warning(f"读取上次分析结论失败 ({company_name}): {e}，将全量审计")
+            return {}, {}
+
+    def audit_assets(self, company_name, assets):
+        """
+        审计资产列表；增量模式下仅将新增或标题变化的资产发送给 AI，其余沿用上次结论
+        返回: (clean_assets, cnvd_assets, usage, analysis_data)
+        """
+        if not self.incremental:
+            return self.analyzer.analyze_with_ai(company_name, assets)
+        
+        verdicts, overview = self.previous_verdicts(company_name)
+        changed = []
+        reused = {}
+        for asset in assets:
+            link = asset.get('link')
+            verdict = verdicts.get(link) if link else None
+            if verdict and verdict[0] == asset_title(asset):
+                reused[link] = verdict
+            else:
+                changed.append(asset)
+        
+        logger.info(f"[Incremental] {company_name}: 共 {len(assets)} 条，沿用上次结论 {len(reused)} 条，需审计 {len(changed)} 条")
+        metrics.count("verdict_cache", len(reused), result="hit")
+        metrics.count("verdict_cache", len(changed), result="miss")
+        
+        usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+        # Excel 中的空单元格读出来是 NaN
+        summary = overview.get('Summary') if isinstance(overview.get('Summary'), str) else ''
+        strategy = overview.get('Strategy') if isinstance(overview.get('Strategy'), str) else ''
+        audited_valid, audited_cnvd = set(), set()
+        
+        if changed:
+            clean, cnvd, usage, analysis_data = self.analyzer.analyze_with_ai(company_name, changed)
+            audited_valid = {id(a) for a in clean}
+            audited_cnvd = {id(a) for a in cnvd}
+            if reused:
+                summary = with_incremental(summary, analysis_data.get('summary', ''))
+                strategy = with_incremental(strategy, analysis_data.get('cnvd_strategy', ''))
+            else:
+                summary = analysis_data.get('summary', '')
+                strategy = analysis_data.get('cnvd_strategy', '')
+        
+        def merged(audited, flag):
+            result = []
+            for asset in assets:
+                verdict = reused.get(asset.get('link'))
+                if id(asset) in audited or (verdict and verdict[flag]):
+                    result.append(asset)
+            return result
+        
+        clean_assets = merged(audited_valid, 1)
+        cnvd_assets = merged(audited_cnvd, 2)
+        return clean_assets, cnvd_assets, usage, {"summary": summary, "cnvd_strategy": strategy}
 
-    def run(self):
+    def run(self, since_hours=48):
         """
         执行历史数据重分析
         返回: (prompt_tokens, completion_tokens)
@@ -42,32 +230,14 @@ class ReAnalyzer:
         logger.info("启动历史数据重分析 (Re-analysis Mode)...")
         
         # Load Progress
-        processed_files = set()
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                processed_files = set(line.strip() for line in f if line.strip())
-            logger.info(f"已加载进度: {len(processed_files)} 个文件已处理")
+        processed_files = self.load_progress()
 
         # Check Balance (Start)
         initial_balance = self.analyzer.get_account_balance()
         logger.info(f"[DeepSeek] 初始账户余额: {initial_balance}")
 
-        # Find files (Today and Yesterday only)
-        all_raw_files = self.find_raw_files(Config.OUTPUT_DIR)
-        
-        # Filter by time
-        target_files = []
-        now = time.time()
-        one_day = 86400
-        # Consider files from last 48 hours to be safe for "Today + Yesterday"
-        time_threshold = now - (2 * one_day)
-        
-        for f in all_raw_files:
-            mtime = os.path.getmtime(f)
-            if mtime > time_threshold:
-                target_files.append(f)
-                
-        logger.info(f"扫描到 {len(all_raw_files)} 个原始文件，其中 {len(target_files)} 个为近期(48h内)文件")
+        # Find files (default: last 48 hours, i.e. "Today + Yesterday")
+        target_files = self.find_targets(since_hours)
         
         # Cost Tracking
         total_prompt_tokens = 0
@@ -96,23 +266,21 @@ class ReAnalyzer:
                 
                 if not eligible:
                     logger.info(f"[AI Filter] 跳过非目标公司: {company_name} ({reason}) | 累计花费: ¥{total_cost_cny:.4f}")
-                    with open(self.progress_file, 'a', encoding='utf-8') as f:
-                        f.write(f"{filepath}\n")
+                    self.mark_processed(filepath)
                     continue
 
-                # Read Excel
-                df = pd.read_excel(filepath)
+                # Read Raw Data (xlsx / jsonl / parquet)
+                df = read_table(filepath)
                 assets = df.to_dict('records')
                 
                 if not assets:
                     logger.warning(f"文件为空或无资产: {filepath}")
-                    with open(self.progress_file, 'a', encoding='utf-8') as f:
-                        f.write(f"{filepath}\n")
+                    self.mark_processed(filepath)
                     continue
                     
                 # AI Analysis (New Interface)
                 # Returns: clean_assets, cnvd_assets, usage, analysis_data
-                clean_assets, cnvd_assets, usage, analysis_data = self.analyzer.analyze_with_ai(company_name, assets)
+                clean_assets, cnvd_assets, usage, analysis_data = self.audit_assets(company_name, assets)
                 
                 # Accumulate Cost
                 p_tokens = usage.get('prompt_tokens', 0)
@@ -127,15 +295,14 @@ class ReAnalyzer:
                 logger.info(f"分析完成: {company_name} | 原始: {len(assets)} -> 有效: {len(clean_assets)} | 本次花费: ¥{current_cost:.4f} | 累计花费: ¥{total_cost_cny:.4f}")
                 
                 # Save Reports
-                self.reporter.save_ai_report(company_name, clean_assets, cnvd_assets, analysis_data)
+                self.reporter.save_ai_report(company_name, clean_assets, cnvd_assets, analysis_data, assets)
                 self.reporter.save_ai_markdown(company_name, analysis_data)
                 
                 # Mark as processed
-                with open(self.progress_file, 'a', encoding='utf-8') as f:
-                    f.write(f"{filepath}\n")
+                self.mark_processed(filepath)
                     
                 # Rate Limit
-                time.sleep(1)
+                metrics.pause(1)
                 
             except Exception as e:
                 logger.error(f"处理文件失败 {filepath}: {e}")
@@ -144,4 +311,109 @@ class ReAnalyzer:
         final_balance = self.analyzer.get_account_balance()
         logger.info(f"[DeepSeek] 结束账户余额: {final_balance}")
                 
-        return total_prompt_tokens, total_completion_tokens
\ No newline at end of file
+        return total_prompt_tokens, total_completion_tokens
+
+    def audit_one(self, filepath, load, budget):
+        """
+        并行模式下单个文件的处理流程 (在审计线程中执行)
+        load: 返回资产列表的 Future (进程池预取) 或 None (当前线程读取)
+        返回: 状态字符串
+        """
+        company_name = self.extract_company_name(filepath)
+        
+        # Pre-check eligibility
+        eligible, reason, usage = self.analyzer.check_company_eligibility(company_name)
+        budget.charge(usage)
+        
+        if not eligible:
+            logger.info(f"[AI Filter] 跳过非目标公司: {company_name} ({reason}) | 累计花费: ¥{budget.spent:.4f}")
+            if load is not None:
+                load.cancel()
+            self.mark_processed(filepath)
+            return "skipped"
+        
+        # Prefetched by the process pool
+        assets = load.result() if load is not None else load_assets(filepath)
+        
+        if not assets:
+            logger.warning(f"文件为空或无资产: {filepath}")
+            self.mark_processed(filepath)
+            return "empty"
+        
+        # Budget may have been used up by other workers meanwhile
+        if budget.exhausted():
+            logger.warning(f"预算已用尽，放弃审计: {company_name} (下次运行继续)")
+            return "budget"
+        
+        clean_assets, cnvd_assets, usage, analysis_data = self.audit_assets(company_name, assets)
+        current_cost = budget.charge(usage)
+        
+        logger.info(f"分析完成: {company_name} | 原始: {len(assets)} -> 有效: {len(clean_assets)} | 本次花费: ¥{current_cost:.4f} | 累计花费: ¥{budget.spent:.4f}")
+        
+        # Save Reports
+        self.reporter.save_ai_report(company_name, clean_assets, cnvd_assets, analysis_data, assets)
+        self.reporter.save_ai_markdown(company_name, analysis_data)
+        
+        # Mark as processed
+        self.mark_processed(filepath)
+        return "done"
+
+    def run_parallel(self, since_hours=48, workers=None, ai_concurrency=None, budget_cny=None):
+        """
+        并行历史数据重分析:
+        - 进程池 (workers) 预取并解析原始数据文件
+        - 线程池 (ai_concurrency) 限制同时进行的 AI 审计数量
+        - 共享预算 budget_cny 用尽后停止派发新任务
+        返回: (prompt_tokens, completion_tokens)
+        """
+        workers = workers or Config.REANALYSIS_WORKERS
+        ai_concurrency = ai_concurrency or Config.REANALYSIS_AI_CONCURRENCY
+        budget = CostBudget(budget_cny if budget_cny is not None else Config.REANALYSIS_BUDGET_CNY)
+        
+        budget_info = f"¥{budget.limit:.2f}" if budget.limit else "不限"
+        logger.info(f"启动并行历史数据重分析 (解析进程: {workers}, AI 并发: {ai_concurrency}, 预算: {budget_info})...")
+        
+        processed_files = self.load_progress()
+        
+        initial_balance = self.analyzer.get_account_balance()
+        logger.info(f"[DeepSeek] 初始账户余额: {initial_balance}")
+        
+        pending = [f for f in self.find_targets(since_hours) if f not in processed_files]
+        logger.info(f"待处理: {len(pending)} 个文件")
+        
+        # In-flight window: at most 2x ai_concurrency files parsed ahead of the auditors
+        window = threading.BoundedSemaphore(ai_concurrency * 2)
+        loaders = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        results = {}
+        futures = {} # future -> filepath
+        
+        try:
+            with ThreadPoolExecutor(max_workers=ai_concurrency) as auditors:
+                for idx, filepath in enumerate(pending):
+                    if budget.exhausted():
+                        logger.warning(f"已达到预算上限 ¥{budget.limit:.2f}，停止派发 (剩余 {len(pending) - idx} 个文件留待下次)")
+                        break
+                    window.acquire()
+                    load = loaders.submit(load_assets, filepath) if loaders else None
+                    future = auditors.submit(self.audit_one, filepath, load, budget)
+                    future.add_done_callback(lambda _: window.release())
+                    futures[future] = filepath
+                
+                for future in as_completed(futures):
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        status = "error"
+                        logger.error(f"处理文件失败 {futures[future]}: {e}")
+                    results[status] = results.get(status, 0) + 1
+        finally:
+            if loaders:
+                loaders.shutdown(cancel_futures=True)
+        
+        logger.info(f"并行重分析结束: {results} | 累计花费: ¥{budget.spent:.4f}")
+        
+        # Check Balance (End)
+        final_balance = self.analyzer.get_account_balance()
+        logger.info(f"[DeepSeek] 结束账户余额: {final_balance}")
+        
+        return budget.prompt_tokens, budget.completion_tokens
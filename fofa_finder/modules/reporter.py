@@ -4,10 +4,60 @@ import os
 import time
 import shutil
 from .logger import setup_logger
+from .storage import get_backend, export_excel, RAW_TABLE, OVERVIEW_TABLE, VALID_TABLE, CNVD_TABLE, VERDICT_TABLE
+from .dataset import RunDataset
+from .manifest import OutputManifest
+from . import metrics
 from ..config import Config
 
 logger = setup_logger("Reporter")
 
+REPORT_TABLE = "Report"
+
+def build_markdown(company_name, summary, strategy, generated_at=None):
+    """
+    生成 Markdown 简报内容 (实时写入与按需渲染共用)
+    """
+    generated_at = generated_at or time.strftime('%Y-%m-%d %H:%M:%S')
+    
+    content = f"# {company_name} 资产安全审计报告\n\n"
+    content += f"**生成时间**: {generated_at}\n\n"
+    
+    content += "## 1. 资产梳理总结\n"
+    content += f"{summary}\n\n"
+    
+    content += "## 2. CNVD 挖掘策略建议\n"
+    content += f"{strategy}\n\n"
+    return content
+
+def asset_title(asset):
+    """
+    规范化资产标题 (与 Analyzer 发送给 AI 的标题一致)
+    """
+    title = asset.get('title')
+    if title is None or pd.isna(title) or not str(title).strip():
+        return "N/A"
+    return str(title).strip()
+
+def build_verdicts(assets, clean_assets, cnvd_assets):
+    """
+    逐条记录资产的审计结论 (link, title, valid, cnvd)
+    """
+    valid_links = {a.get('link') for a in clean_assets}
+    cnvd_links = {a.get('link') for a in cnvd_assets}
+    rows = []
+    for asset in assets:
+        link = asset.get('link')
+        if not link:
+            continue
+        rows.append({
+            'link': link,
+            'title': asset_title(asset),
+            'valid': link in valid_links,
+            'cnvd': link in cnvd_links,
+        })
+    return pd.DataFrame(rows, columns=['link', 'title', 'valid', 'cnvd'])
+
 class Reporter:
     def __init__(self):
         # Create session directory based on timestamp in realtime folder
@@ -23,11 +73,23 @@ class Reporter:
         self.analysis_dir = os.path.join(self.session_dir, "analysis_data")
         self.report_dir = os.path.join(self.session_dir, "report_data")
         
-        for d in [self.raw_dir, self.analysis_dir, self.report_dir]:
-            if not os.path.exists(d):
-                os.makedirs(d)
+        # Output layout: 'per_company' (one file per company) or 'dataset' (one consolidated dataset per session)
+        self.dataset = None
+        if Config.OUTPUT_LAYOUT == 'dataset':
+            self.dataset = RunDataset(os.path.join(self.session_dir, "dataset"))
+        else:
+            for d in [self.raw_dir, self.analysis_dir, self.report_dir]:
+                if not os.path.exists(d):
+                    os.makedirs(d)
+        
+        # Storage backend (jsonl / parquet / xlsx)
+        self.backend = get_backend(Config.STORAGE_FORMAT)
+        
+        # Output manifest (first use on a legacy output dir triggers a one-time scan)
+        self.manifest = OutputManifest(Config.OUTPUT_DIR).ensure()
             
-        logger.info(f"Report Session Directory: {self.session_dir}")
+        layout = "合并数据集" if self.dataset else self.backend.name
+        logger.info(f"Report Session Directory: {self.session_dir} (格式: {layout})")
 
     def _sanitize_filename(self, name):
         invalid_chars = r'<>:"/\|?*'
@@ -70,31 +132,64 @@ class Reporter:
         except Exception as e:
             logger.error(f"Archiving failed for {filepath}: {e}")
 
+    def _record(self, path, company_name, kind, rows=None):
+        try:
+            self.manifest.record(path, company_name, kind, rows=rows, session=self.timestamp)
+        except Exception as e:
+            logger.warning(f"登记输出清单失败 ({path}): {e}")
+
+    def _write_tables(self, company_name, filepath, tables, category):
+        """
+        使用当前存储后端写入并归档，按配置附带生成 Excel 视图
+        合并数据集模式下改为追加到会话数据集
+        每次写入都会登记到输出清单 (manifest)
+        返回: 文件路径 或 数据集分片引用
+        """
+        kind = category.replace("_data", "")
+        rows = len(next(iter(tables.values()))) if kind == "raw" else len(tables.get(VALID_TABLE, []))
+        
+        if self.dataset:
+            ref = self.dataset.append(company_name, kind, tables)
+            self._record(ref, company_name, kind, rows)
+            return ref
+
+        self.backend.write(filepath, tables)
+        self._record(filepath, company_name, kind, rows)
+        self._archive_file(filepath, category)
+        
+        if Config.EXCEL_EXPORT and self.backend.ext != ".xlsx":
+            try:
+                xlsx_path = export_excel(filepath)
+                self._archive_file(xlsx_path, category)
+            except Exception as e:
+                logger.warning(f"生成 Excel 视图失败 ({filepath}): {e}")
+        return filepath
+
+    @metrics.timed("reporter.save_raw_data")
     def save_raw_data(self, company_name, assets):
         """
         Save raw data to session dir and archive it.
         Category: raw_data
         """
         safe_name = self._sanitize_filename(company_name)
-        filename = f"{safe_name}_raw.xlsx"
+        filename = f"{safe_name}_raw{self.backend.ext}"
         filepath = os.path.join(self.raw_dir, filename)
         
+        metrics.add_items(len(assets))
         try:
             df_assets = pd.DataFrame(assets)
             
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df_assets.to_excel(writer, sheet_name='Raw Assets', index=False)
+            # Write + Archive
+            filepath = self._write_tables(company_name, filepath, {RAW_TABLE: df_assets}, "raw_data")
                 
             logger.info(f"原始数据已保存至: {filepath}")
             
-            # Archive
-            self._archive_file(filepath, "raw_data")
-            
             return filepath
         except Exception as e:
             logger.error(f"保存原始数据失败 ({company_name}): {e}")
             return None
 
+    @metrics.timed("reporter.save_ai_markdown")
     def save_ai_markdown(self, company_name, analysis_data):
         """
         Save markdown report to session dir and archive it.
@@ -107,18 +202,20 @@ class Reporter:
         try:
             summary = analysis_data.get('summary', '无')
             strategy = analysis_data.get('cnvd_strategy', '无')
+            generated_at = time.strftime('%Y-%m-%d %H:%M:%S')
             
-            content = f"# {company_name} 资产安全审计报告\n\n"
-            content += f"**生成时间**: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            
-            content += "## 1. 资产梳理总结\n"
-            content += f"{summary}\n\n"
+            if self.dataset:
+                # 合并数据集模式: 仅记录内容，Markdown 按需渲染 (tools/render_report.py)
+                report = [{'Company': company_name, 'Generated': generated_at, 'Summary': summary, 'Strategy': strategy}]
+                ref = self._write_tables(company_name, None, {REPORT_TABLE: report}, "report_data")
+                logger.info(f"AI 报告内容已写入数据集: {ref}")
+                return ref
             
-            content += "## 2. CNVD 挖掘策略建议\n"
-            content += f"{strategy}\n\n"
+            content = build_markdown(company_name, summary, strategy, generated_at)
             
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write(content)
+            self._record(filepath, company_name, "report")
                 
             logger.info(f"AI Markdown 报告已保存至: {filepath}")
             
@@ -130,14 +227,17 @@ class Reporter:
             logger.error(f"保存 Markdown 报告失败 ({company_name}): {e}")
             return None
 
-    def save_ai_report(self, company_name, clean_assets, cnvd_assets, analysis_data):
+    @metrics.timed("reporter.save_ai_report")
+    def save_ai_report(self, company_name, clean_assets, cnvd_assets, analysis_data, assets=None):
         """
-        Save AI analysis excel to session dir and archive it.
+        Save AI analysis tables to session dir and archive it.
         Category: analysis_data
+        assets: 本次审计的全部资产，提供时额外写入 Verdicts 表 (增量重分析依据)
         """
         safe_name = self._sanitize_filename(company_name)
-        filename = f"{safe_name}_analysis.xlsx"
+        filename = f"{safe_name}_analysis{self.backend.ext}"
         filepath = os.path.join(self.analysis_dir, filename)
+        metrics.add_items(len(clean_assets))
         
         try:
             df_clean = pd.DataFrame(clean_assets)
@@ -151,18 +251,30 @@ class Reporter:
                 'Strategy': analysis_data.get('cnvd_strategy', '')
             }])
             
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df_overview.to_excel(writer, sheet_name='Overview', index=False)
-                df_clean.to_excel(writer, sheet_name='Valid Assets', index=False)
-                if not df_cnvd.empty:
-                    df_cnvd.to_excel(writer, sheet_name='CNVD Candidates', index=False)
-                
-            logger.info(f"AI 分析报告(Excel)已保存至: {filepath}")
+            tables = {OVERVIEW_TABLE: df_overview, VALID_TABLE: df_clean}
+            if not df_cnvd.empty:
+                tables[CNVD_TABLE] = df_cnvd
+            if assets:
+                tables[VERDICT_TABLE] = build_verdicts(assets, clean_assets, cnvd_assets)
             
-            # Archive
-            self._archive_file(filepath, "analysis_data")
+            # Write + Archive
+            filepath = self._write_tables(company_name, filepath, tables, "analysis_data")
+                
+            logger.info(f"AI 分析报告已保存至: {filepath}")
             
             return filepath
         except Exception as e:
             logger.error(f"保存 AI 报告失败 ({company_name}): {e}")
             return None
+
+    def close(self):
+        """
+        会话结束: 合并数据集模式下将数据集文件一次性归档到日期目录
+        """
+        if not self.dataset:
+            return
+        for filename in sorted(os.listdir(self.dataset.root_dir)):
+            filepath = os.path.join(self.dataset.root_dir, filename)
+            if os.path.isfile(filepath):
+                self._archive_file(filepath, os.path.join("dataset", self.timestamp))
+        logger.info(f"合并数据集已归档: {self.dataset.root_dir}")
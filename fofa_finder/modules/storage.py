@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import gzip
+import json
+from .logger import setup_logger
+from ..config import Config
+
+logger = setup_logger("Storage")
+
+# 每个输出文件都是若干张命名表 (对应 Excel 的 Sheet)
+RAW_TABLE = "Raw Assets"
+OVERVIEW_TABLE = "Overview"
+VALID_TABLE = "Valid Assets"
+CNVD_TABLE = "CNVD Candidates"
+VERDICT_TABLE = "Verdicts" # 每条资产的审计结论 (link, title, valid, cnvd)，供增量重分析比对
+
+OUTPUT_KINDS = ("raw", "analysis")
+
+
+def _clean_value(value):
+    """
+    JSON 不支持 NaN，统一转为 None
+    """
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _column_filter(columns):
+    """
+    columns: 列名列表 / 判断函数 (例如只读取列名含 'title' 的列) / None (全部列)
+    """
+    if columns is None or callable(columns):
+        return columns
+    wanted = set(columns)
+    return lambda c: c in wanted
+
+
+def _to_frame(data):
+    import pandas as pd
+    if isinstance(data, pd.DataFrame):
+        return data
+    return pd.DataFrame(data)
+
+
+class ExcelBackend:
+    """
+    兼容格式: 每张表一个 Sheet (写入慢，约 100 万行上限)
+    """
+    name = "xlsx"
+    ext = ".xlsx"
+
+    def write(self, filepath, tables):
+        import pandas as pd
+        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+            for table, data in tables.items():
+                _to_frame(data).to_excel(writer, sheet_name=table, index=False)
+        return filepath
+
+    def read(self, filepath, table=None, columns=None):
+        import pandas as pd
+        return pd.read_excel(filepath, sheet_name=table if table else 0, usecols=_column_filter(columns))
+
+    def tables(self, filepath):
+        import pandas as pd
+        with pd.ExcelFile(filepath) as xls:
+            return list(xls.sheet_names)
+
+
+class JsonlBackend:
+    """
+    默认格式: gzip 压缩的 JSON Lines
+    每张表先写一行表头 {"_table": 名称, "_columns": [...]}，随后每行一条记录
+    """
+    name = "jsonl"
+    ext = ".jsonl.gz"
+    TABLE_KEY = "_table"
+    COLUMNS_KEY = "_columns"
+
+    def write(self, filepath, tables):
+        with gzip.open(filepath, 'wt', encoding='utf-8', compresslevel=Config.JSONL_COMPRESS_LEVEL) as f:
+            f.write(self.encode(tables))
+        return filepath
+
+    def encode(self, tables):
+        """
+        将多张表编码为 JSONL 文本 (供 Reporter 的合并数据集模式复用)
+        """
+        lines = []
+        for table, data in tables.items():
+            df = _to_frame(data)
+            columns = [str(c) for c in df.columns]
+            lines.append(json.dumps({self.TABLE_KEY: table, self.COLUMNS_KEY: columns}, ensure_ascii=False))
+            for row in df.itertuples(index=False, name=None):
+                record = {c: _clean_value(v) for c, v in zip(columns, row)}
+                record[self.TABLE_KEY] = table
+                lines.append(json.dumps(record, ensure_ascii=False, default=str))
+        return "\n".join(lines) + "\n"
+
+    def decode(self, lines, table=None, columns=None):
+        """
+        从 JSONL 行中还原指定表 (table=None 表示第一张表)
+        与 Excel 一致: 指定的表不存在时抛出 ValueError
+        """
+        import pandas as pd
+        target = table
+        header = None
+        records = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            name = record.pop(self.TABLE_KEY, None)
+            if self.COLUMNS_KEY in record:
+                if target is None:
+                    target = name
+                if name == target:
+                    header = record[self.COLUMNS_KEY]
+                continue
+            if name == target:
+                records.append(record)
+
+        if header is None:
+            if table is not None:
+                raise ValueError(f"Table named '{table}' not found")
+            return pd.DataFrame()
+        keep = _column_filter(columns)
+        cols = header if keep is None else [c for c in header if keep(c)]
+        return pd.DataFrame(records, columns=cols)
+
+    def read(self, filepath, table=None, columns=None):
+        with gzip.open(filepath, 'rt', encoding='utf-8') as f:
+            return self.decode(f, table, columns)
+
+    def tables(self, filepath):
+        names = []
+        with gzip.open(filepath, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if f'"{self.COLUMNS_KEY}"' not in line:
+                    continue
+                record = json.loads(line)
+                if self.COLUMNS_KEY in record:
+                    names.append(record[self.TABLE_KEY])
+        return names
+
+
+class ParquetBackend:
+    """
+    列式格式: 所有表合并为一个 Parquet 文件，以 _table 列区分
+    表名与列顺序记录在 schema metadata 中 (需要安装 pyarrow)
+    """
+    name = "parquet"
+    ext = ".parquet"
+    TABLE_KEY = "_table"
+    META_KEY = b"fofa_finder.tables"
+
+    def write(self, filepath, tables):
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        layout = {}
+        frames = []
+        for table, data in tables.items():
+            df = _to_frame(data).copy()
+            df.columns = [str(c) for c in df.columns]
+            layout[table] = list(df.columns)
+            # 同一列可能混合 str/int (如 port)，统一按字符串存储
+            for col in df.columns:
+                if df[col].dtype == object:
+                    df[col] = df[col].astype("string")
+            df[self.TABLE_KEY] = table
+            frames.append(df)
+
+        combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        arrow_table = pa.Table.from_pandas(combined, preserve_index=False)
+        metadata = dict(arrow_table.schema.metadata or {})
+        metadata[self.META_KEY] = json.dumps(layout, ensure_ascii=False).encode('utf-8')
+        pq.write_table(arrow_table.replace_schema_metadata(metadata), filepath, compression='zstd')
+        return filepath
+
+    def _layout(self, filepath):
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(filepath).metadata or {}
+        return json.loads(metadata.get(self.META_KEY, b"{}").decode('utf-8'))
+
+    def read(self, filepath, table=None, columns=None):
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        layout = self._layout(filepath)
+        if not layout:
+            return pd.DataFrame()
+        if table is None:
+            table = next(iter(layout))
+        if table not in layout:
+            raise ValueError(f"Table named '{table}' not found")
+
+        header = layout[table]
+        keep = _column_filter(columns)
+        cols = header if keep is None else [c for c in header if keep(c)]
+        arrow_table = pq.read_table(filepath, columns=cols + [self.TABLE_KEY],
+                                    filters=[(self.TABLE_KEY, '=', table)])
+        return arrow_table.to_pandas().drop(columns=[self.TABLE_KEY])[cols]
+
+    def tables(self, filepath):
+        return list(self._layout(filepath).keys())
+
+
+BACKENDS = {
+    ExcelBackend.name: ExcelBackend,
+    JsonlBackend.name: JsonlBackend,
+    ParquetBackend.name: ParquetBackend,
+}
+
+# 按后缀识别 (长后缀优先)
+KNOWN_SUFFIXES = [JsonlBackend.ext, ParquetBackend.ext, ExcelBackend.ext]
+
+
+def get_backend(fmt=None):
+    """
+    根据配置返回存储后端，parquet 依赖缺失时降级为 jsonl
+    """
+    fmt = (fmt or Config.STORAGE_FORMAT or "jsonl").lower()
+    if fmt not in BACKENDS:
+        logger.warning(f"未知存储格式 '{fmt}'，使用 jsonl")
+        fmt = "jsonl"
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("未安装 pyarrow，Parquet 不可用，降级为 jsonl (pip install pyarrow)")
+            fmt = "jsonl"
+    return BACKENDS[fmt]()
+
+
+def backend_for(filepath):
+    """
+    根据文件后缀选择读取后端
+    """
+    lower = filepath.lower()
+    for backend_cls in BACKENDS.values():
+        if lower.endswith(backend_cls.ext):
+            return backend_cls()
+    raise ValueError(f"不支持的文件格式: {filepath}")
+
+
+# 合并数据集中单个公司记录的引用: "<分片路径>#<偏移>:<长度>"
+MEMBER_REF = re.compile(r"^(?P<path>.+\.jsonl\.gz)#(?P<offset>\d+):(?P<length>\d+)$")
+
+
+def member_ref(filepath, offset, length):
+    return f"{filepath}#{offset}:{length}"
+
+
+def parse_member_ref(ref):
+    """
+    解析分片引用，返回 (path, offset, length)；普通文件路径返回 None
+    """
+    match = MEMBER_REF.match(str(ref))
+    if not match:
+        return None
+    return match.group("path"), int(match.group("offset")), int(match.group("length"))
+
+
+def append_member(filepath, tables):
+    """
+    将若干张表作为一个独立的 gzip member 追加到分片文件末尾
+    多个 member 拼接仍是合法的 gzip 文件，也可按偏移量单独解压
+    返回 (offset, length)
+    """
+    payload = JsonlBackend().encode(tables).encode('utf-8')
+    data = gzip.compress(payload, compresslevel=Config.JSONL_COMPRESS_LEVEL)
+    with open(filepath, 'ab') as f:
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        f.write(data)
+    return offset, len(data)
+
+
+def read_member(filepath, offset, length, table=None, columns=None):
+    with open(filepath, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    lines = gzip.decompress(data).decode('utf-8').splitlines()
+    return JsonlBackend().decode(lines, table, columns)
+
+
+def member_tables(filepath, offset, length):
+    with open(filepath, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    names = []
+    for line in gzip.decompress(data).decode('utf-8').splitlines():
+        record = json.loads(line) if JsonlBackend.COLUMNS_KEY in line else {}
+        if JsonlBackend.COLUMNS_KEY in record:
+            names.append(record[JsonlBackend.TABLE_KEY])
+    return names
+
+
+def read_table(filepath, table=None, columns=None):
+    """
+    读取输出文件中的一张表 (自动识别 xlsx / jsonl.gz / parquet / 数据集分片引用)
+    table=None 时读取第一张表；columns 为列名列表或按列名判断的函数，None 表示全部列
+    """
+    member = parse_member_ref(filepath)
+    if member:
+        return read_member(*member, table=table, columns=columns)
+    return backend_for(filepath).read(filepath, table, columns)
+
+
+def table_names(filepath):
+    member = parse_member_ref(filepath)
+    if member:
+        return member_tables(*member)
+    return backend_for(filepath).tables(filepath)
+
+
+def split_output_name(filename):
+    """
+    解析输出文件名: "公司_raw.jsonl.gz" -> ("公司", "raw")
+    无法识别时返回 (None, None)
+    """
+    basename = os.path.basename(filename)
+    for kind in OUTPUT_KINDS:
+        for ext in KNOWN_SUFFIXES:
+            suffix = f"_{kind}{ext}"
+            if basename.endswith(suffix):
+                return basename[:-len(suffix)], kind
+    return None, None
+
+
+def output_filenames(company_name, kind):
+    """
+    某公司某类输出在所有格式下可能的文件名
+    """
+    return [f"{company_name}_{kind}{ext}" for ext in KNOWN_SUFFIXES]
+
+
+def export_excel(filepath, out_path=None):
+    """
+    将 jsonl / parquet 文件 (或数据集分片记录) 按需渲染为 Excel 视图 (每张表一个 Sheet)
+    返回生成的 .xlsx 路径
+    """
+    if parse_member_ref(filepath):
+        if out_path is None:
+            raise ValueError("导出数据集分片记录时必须指定 out_path")
+    else:
+        backend = backend_for(filepath)
+        if isinstance(backend, ExcelBackend):
+            return filepath
+        if out_path is None:
+            out_path = filepath[:-len(backend.ext)] + ExcelBackend.ext
+
+    tables = {}
+    for table in table_names(filepath):
+        tables[table] = read_table(filepath, table)
+    ExcelBackend().write(out_path, tables)
+    return out_path
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import logging
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 sys.path，以便导入模块
+current_file = Path(__file__).resolve()
+project_root = current_file.parent.parent
+sys.path.insert(0, str(project_root))
+
+from fofa_finder.config import Config
+from fofa_finder.modules.storage import export_excel, split_output_name, ExcelBackend
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def export_path(target: Path, force: bool = False):
+    """
+    将单个文件或目录下所有 jsonl/parquet 输出渲染为 Excel 视图。
+    已存在且比源文件新的 .xlsx 会被跳过。
+    """
+    if target.is_file():
+        files = [target]
+    else:
+        files = [p for p in target.rglob("*") if p.is_file()]
+
+    exported = 0
+    for path in files:
+        _, kind = split_output_name(path.name)
+        if kind is None or path.name.endswith(ExcelBackend.ext):
+            continue
+
+        name = path.name
+        for ext in (".jsonl.gz", ".parquet"):
+            if name.endswith(ext):
+                name = name[:-len(ext)] + ExcelBackend.ext
+        xlsx_path = path.with_name(name)
+        if not force and xlsx_path.exists() and xlsx_path.stat().st_mtime >= path.stat().st_mtime:
+            continue
+
+        export_excel(str(path), str(xlsx_path))
+
+        logger.info(f"已生成: {xlsx_path}")
+        exported += 1
+
+    logger.info(f"共生成 {exported} 个 Excel 文件")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render jsonl/parquet output files as Excel on demand.")
+    parser.add_argument("target", nargs="?", help="File or directory to export (default: output dir)")
+    parser.add_argument("--force", action="store_true", help="Re-export even if the .xlsx is up to date")
+    args = parser.parse_args()
+
+    target_path = Path(args.target).resolve() if args.target else Path(Config.OUTPUT_DIR)
+
+    if target_path.exists():
+        export_path(target_path, args.force)
+    else:
+        logger.error(f"找不到目标路径: {target_path}")
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import os
+import logging
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 sys.path，以便导入模块
+current_file = Path(__file__).resolve()
+project_root = current_file.parent.parent
+sys.path.insert(0, str(project_root))
+
+from fofa_finder.modules.dataset import RunDataset
+from fofa_finder.modules.reporter import build_markdown, REPORT_TABLE
+from fofa_finder.modules.storage import export_excel
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def sanitize(name):
+    for char in r'<>:"/\|?*':
+        name = name.replace(char, '_')
+    return name
+
+def render_company(dataset: RunDataset, company: str, out_dir: Path, fmt: str):
+    """
+    从合并数据集中渲染单个公司的 Excel (raw + analysis) 或 Markdown 简报。
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    safe_name = sanitize(company)
+    rendered = []
+
+    if fmt in ("xlsx", "all"):
+        for kind in ("raw", "analysis"):
+            entry = dataset.lookup(company, kind)
+            if entry is None:
+                continue
+            target = out_dir / f"{safe_name}_{kind}.xlsx"
+            export_excel(dataset.ref(entry), str(target))
+            rendered.append(target)
+
+    if fmt in ("md", "all"):
+        entry = dataset.lookup(company, "report")
+        if entry is not None:
+            row = dataset.read(company, "report", REPORT_TABLE).iloc[0]
+            target = out_dir / f"{safe_name}_analysis.md"
+            target.write_text(build_markdown(company, row["Summary"], row["Strategy"], row["Generated"]), encoding="utf-8")
+            rendered.append(target)
+
+    if not rendered:
+        logger.warning(f"数据集中未找到公司: {company}")
+    for path in rendered:
+        logger.info(f"已生成: {path}")
+    return rendered
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render per-company Excel/Markdown from a consolidated session dataset.")
+    parser.add_argument("dataset_dir", help="Path to output/realtime/<timestamp>/dataset")
+    parser.add_argument("companies", nargs="*", help="Company names to render (default: list companies)")
+    parser.add_argument("--all", action="store_true", help="Render every company in the dataset")
+    parser.add_argument("--format", choices=["xlsx", "md", "all"], default="all", help="Output format")
+    parser.add_argument("--out", help="Output directory (default: <dataset_dir>/rendered)")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.dataset_dir, "company_index.jsonl")):
+        logger.error(f"找不到数据集索引: {args.dataset_dir}")
+        sys.exit(1)
+
+    dataset = RunDataset(args.dataset_dir)
+    out_dir = Path(args.out) if args.out else Path(args.dataset_dir) / "rendered"
+    targets = dataset.companies() if args.all else args.companies
+
+    if not targets:
+        for name in dataset.companies():
+            print(name)
+    else:
+        for company in targets:
+            render_company(dataset, company, out_dir, args.format)